@@ -0,0 +1,311 @@
+"""
+Реестр банков вопросов: по банку на предмет в data/<предмет>/.
+
+Банк — папка с questions.txt и/или tasks.txt (тот же формат `id|текст|ответ`,
+те же .pack из `python -m app.pack data/<предмет>/questions.txt`) и,
+по желанию, title.txt с названием раздела в первой строке.
+Картинки банка указываются, как и в основном банке, путём от data/:
+img:<предмет>/tables/table_01.png.
+
+Список банков обновляется вместе с контентом: stage() обходит data/
+в потоке build_content, commit() подменяет список на цикле событий
+(set_content), как и поисковый индекс.
+
+Основной банк (data/questions.txt, data/tasks.txt) остаётся в CONTENT
+и номером 0; найденные банки нумеруются с 1. Номера запоминаются
+в cache/banks.json и не меняются ни при повторном обходе, ни после
+рестарта: новые банки получают следующие номера — кнопки в старых
+сообщениях продолжают вести туда же.
+
+Банк загружается при первом обращении (в потоке) и держится в памяти,
+пока суммарный вес загруженных банков не превысит бюджет; дальше
+выгружаются давно не открывавшиеся (LRU). Вес банка — размер его
+файлов на диске: грубая, но монотонная оценка занимаемой памяти.
+Если файлы банка поменялись, он перезагружается при следующем обращении;
+stat() файлов загруженного банка — не чаще раза в verify_interval секунд.
+
+Номер банка и id записи кодируются в кнопке одним числом (bank_ref
+в app/callbacks.py), поэтому id в банках должны быть меньше BANK_STRIDE.
+"""
+import asyncio
+import itertools
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+from .callbacks import BANK_STRIDE
+from .content import ContentSnapshot, ContentStore, load_store
+from .file_cache import file_lock, read_json_dict, write_json_atomic
+from .pack import pack_path_for
+
+
+BANK_FILES = ("questions.txt", "tasks.txt")
+TITLE_FILE = "title.txt"
+
+
+class BankInfo(NamedTuple):
+    number: int
+    slug: str
+    title: str
+    path: Path
+    empty: bool  # файлы банка пустые — в меню не показываем
+
+
+class _Resident(NamedTuple):
+    snapshot: ContentSnapshot
+    signature: tuple
+    weight: int
+
+
+def _signature(path: Path) -> tuple:
+    """
+    (mtime, размер) файлов банка и их .pack — по ним видно, что банк поменялся.
+    """
+    signature = []
+    for name in BANK_FILES:
+        for file_path in (path / name, pack_path_for(path / name)):
+            try:
+                st = file_path.stat()
+            except OSError:
+                signature.append(None)
+            else:
+                signature.append((st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+def _weight(signature: tuple) -> int:
+    return sum(item[1] for item in signature if item is not None)
+
+
+class BankRegistry:
+    def __init__(
+        self,
+        data_dir: Path,
+        compilers,
+        budget_bytes: int = 64 * 1024 * 1024,
+        numbers_path: Path | None = None,
+        verify_interval: float = 5.0,
+    ):
+        """
+        compilers(номер банка) -> (компилятор вопросов, компилятор задач):
+        кнопки в планах записей должны знать, из какого они банка.
+        numbers_path — где хранить номера банков (None — только в памяти).
+        """
+        self.data_dir = data_dir
+        self.numbers_path = numbers_path
+        self.compilers = compilers
+        self.budget_bytes = budget_bytes
+        self.verify_interval = verify_interval
+        self.loads = 0
+        self.hits = 0
+        self.evictions = 0
+        self._banks: dict[int, BankInfo] = {}
+        self._numbers: dict[str, int] = {}
+        self._staged: tuple[int, dict[str, int], dict[int, BankInfo]] | None = None
+        self._resident: OrderedDict[int, _Resident] = OrderedDict()
+        # когда (monotonic) файлы загруженного банка последний раз сверялись
+        self._verified: dict[int, float] = {}
+        self._loading: dict[int, asyncio.Future] = {}
+        self._versions = itertools.count(1)
+
+    # ---------- СПИСОК БАНКОВ ----------
+
+    def stage(self, snapshot: ContentSnapshot):
+        """
+        Обходит data/ для снимка snapshot (в потоке build_content):
+        каталоги, названия, номера новых банков. Сам список не меняется
+        до commit() — его читают хендлеры на цикле событий.
+        """
+        self._staged = (snapshot.version, *self._scan())
+
+    def commit(self, snapshot: ContentSnapshot):
+        """
+        Подменяет список банков на подготовленный stage() для этого снимка
+        (или обходит data/ сейчас, если stage не вызывали). Загруженные
+        снимки не трогаются — банк, которого больше нет, просто не отдаётся
+        и со временем вытесняется.
+        """
+        staged = self._staged
+        self._staged = None
+        if staged is None or staged[0] != snapshot.version:
+            staged = (snapshot.version, *self._scan())
+        _, numbers, found = staged
+        # при первой загрузке (версия 1) список не печатаем, дальше — если поменялся
+        if snapshot.version > 1 and found.keys() != self._banks.keys():
+            print("📚 Банки:", ", ".join(found[number].title for number in sorted(found)) or "нет")
+        self._numbers = numbers
+        self._banks = found
+
+    def discover(self) -> tuple[BankInfo, ...]:
+        """
+        Обход и подмена списка за один вызов — для скриптов и тестов,
+        где нет отдельного потока загрузки.
+        """
+        self._numbers, self._banks = self._scan()
+        return self.banks()
+
+    def _scan(self) -> tuple[dict[str, int], dict[int, BankInfo]]:
+        paths = []
+        if self.data_dir.is_dir():
+            paths = [
+                path
+                for path in sorted(self.data_dir.iterdir())
+                if path.is_dir() and any((path / name).exists() for name in BANK_FILES)
+            ]
+
+        # файл номеров общий для воркеров: номера, выданные другими процессами,
+        # важнее своих, а новые выдаются под блокировкой файла
+        numbers = {**self._numbers, **self._load_numbers()}
+        if any(path.name not in numbers for path in paths):
+            numbers = self._assign_numbers(numbers, [path.name for path in paths])
+
+        found = {}
+        for path in paths:
+            number = numbers[path.name]
+            found[number] = BankInfo(number, path.name, _read_title(path), path, _is_empty(path))
+        return numbers, found
+
+    def banks(self) -> tuple[BankInfo, ...]:
+        return tuple(self._banks[number] for number in sorted(self._banks))
+
+    def menu(self) -> tuple[tuple[int, str], ...]:
+        """
+        (номер, название) для кнопок главного меню — хэшируемо, годится в ключ кэша клавиатур.
+        Банки с пустыми файлами пропускаются (кнопки из старых сообщений
+        по номеру продолжают работать).
+        """
+        return tuple((info.number, info.title) for info in self.banks() if not info.empty)
+
+    def info(self, number: int) -> BankInfo | None:
+        return self._banks.get(number)
+
+    def find(self, slug: str) -> BankInfo | None:
+        number = self._numbers.get(slug)
+        return self._banks.get(number) if number is not None else None
+
+    def _load_numbers(self) -> dict[str, int]:
+        if self.numbers_path is None:
+            return {}
+        data = read_json_dict(self.numbers_path, "⚠️ Номера банков не читаются, нумеруем заново:")
+        return {slug: number for slug, number in data.items() if isinstance(number, int) and number > 0}
+
+    def _assign_numbers(self, numbers: dict[str, int], slugs: list[str]) -> dict[str, int]:
+        if self.numbers_path is None:
+            return _number_new(numbers, slugs)
+        with file_lock(self.numbers_path):
+            numbers = _number_new({**numbers, **self._load_numbers()}, slugs)
+            write_json_atomic(self.numbers_path, numbers)
+        return numbers
+
+    # ---------- ЗАГРУЗКА ----------
+
+    async def get(self, number: int) -> ContentSnapshot | None:
+        """
+        Снимок банка; загружает его в потоке, если он не в памяти или устарел.
+        """
+        info = self._banks.get(number)
+        if info is None:
+            return None
+
+        resident = self._resident.get(number)
+        if resident is not None and self._is_fresh(number, info, resident):
+            self._resident.move_to_end(number)
+            self.hits += 1
+            return resident.snapshot
+
+        loading = self._loading.get(number)
+        if loading is None:
+            loading = self._loading[number] = asyncio.ensure_future(asyncio.to_thread(self._load, info))
+        try:
+            resident = await asyncio.shield(loading)
+        finally:
+            if self._loading.get(number) is loading and loading.done():
+                del self._loading[number]
+
+        self._resident[number] = resident
+        self._resident.move_to_end(number)
+        self._verified[number] = time.monotonic()
+        self._evict()
+        return resident.snapshot
+
+    def _is_fresh(self, number: int, info: BankInfo, resident: _Resident) -> bool:
+        now = time.monotonic()
+        if now - self._verified.get(number, -self.verify_interval) < self.verify_interval:
+            return True
+        if resident.signature != _signature(info.path):
+            return False
+        self._verified[number] = now
+        return True
+
+    def _load(self, info: BankInfo) -> _Resident:
+        signature = _signature(info.path)
+        question_compiler, task_compiler = self.compilers(info.number)
+        snapshot = ContentSnapshot(
+            next(self._versions),
+            _load_bank_store(info.path / "questions.txt", question_compiler),
+            _load_bank_store(info.path / "tasks.txt", task_compiler),
+        )
+        self.loads += 1
+        for store in (snapshot.questions, snapshot.tasks):
+            if store and store.ids[-1] >= BANK_STRIDE:
+                print(f"⚠️ Банк «{info.title}»: id больше {BANK_STRIDE - 1} не откроются по кнопкам")
+        print(
+            f"📚 Банк «{info.title}» загружен: вопросов {len(snapshot.questions)}, "
+            f"задач {len(snapshot.tasks)}"
+        )
+        return _Resident(snapshot, signature, _weight(signature))
+
+    def _evict(self):
+        total = sum(resident.weight for resident in self._resident.values())
+        # последний открытый банк не выгружаем, даже если он один больше бюджета
+        while total > self.budget_bytes and len(self._resident) > 1:
+            number, resident = self._resident.popitem(last=False)
+            self._verified.pop(number, None)
+            total -= resident.weight
+            self.evictions += 1
+            info = self._banks.get(number)
+            print(f"📚 Банк «{info.title if info else number}» выгружен из памяти")
+
+    def stats(self) -> dict:
+        return {
+            "banks": len(self._banks),
+            "resident": len(self._resident),
+            "resident_bytes": sum(resident.weight for resident in self._resident.values()),
+            "loads": self.loads,
+            "hits": self.hits,
+            "evictions": self.evictions,
+        }
+
+
+def _number_new(numbers: dict[str, int], slugs: list[str]) -> dict[str, int]:
+    for slug in slugs:
+        if slug not in numbers:
+            numbers[slug] = max(numbers.values(), default=0) + 1
+    return numbers
+
+
+def _load_bank_store(source: Path, compiler) -> ContentStore:
+    # банку не обязательно иметь и вопросы, и задачи
+    if not source.exists():
+        return ContentStore([], compiler=compiler)
+    return load_store(source, compiler)
+
+
+def _is_empty(path: Path) -> bool:
+    for name in BANK_FILES:
+        try:
+            if (path / name).stat().st_size > 0:
+                return False
+        except OSError:
+            pass
+    return True
+
+
+def _read_title(path: Path) -> str:
+    try:
+        with (path / TITLE_FILE).open("r", encoding="utf-8-sig") as f:
+            title = f.readline().strip()
+    except OSError:
+        title = ""
+    return title or path.name
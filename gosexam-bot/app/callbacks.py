@@ -0,0 +1,215 @@
+"""
+Компактный формат callback_data и таблица обработчиков.
+
+Формат (версия 1):  "1" + код действия (1 символ) + [id в base36]
+    "1o2s"  — открыть вопрос 100
+    "1z"    — начать тест
+Разбор — один срез строки и один поиск в словаре, вместо цепочки
+F.data == ... / startswith(...) / regexp(...) фильтров на каждый апдейт.
+
+Кнопки в старом формате ("q_open_5", "task_answer_7", "quiz_start" …)
+остаются в уже отправленных сообщениях — decode() понимает и их.
+"""
+from aiogram.types import CallbackQuery
+
+
+CODEC_VERSION = "1"
+
+# ---------- КОДЫ ДЕЙСТВИЙ ----------
+
+START_MENU = "H"        # главное меню (то же, что /start)
+MANAGEMENT_MENU = "M"
+SECTION_OP = "O"
+
+QUESTIONS_MENU = "Q"
+QUESTIONS_PAGE = "l"    # id = номер страницы
+QUESTIONS_JUMP = "j"
+QUESTIONS_BACK = "q"    # id = вопрос: страница списка, где он стоит
+QUESTION_OPEN = "o"
+QUESTION_ANSWER = "a"
+QUESTION_NEXT = "n"
+
+TASKS_MENU = "T"
+TASKS_PAGE = "L"        # id = номер страницы
+TASKS_JUMP = "J"
+TASKS_BACK = "S"        # id = задача: страница списка, где она стоит
+TASK_OPEN = "t"
+TASK_ANSWER = "s"
+TASK_NEXT = "x"
+
+QUIZ_START = "z"       # id = пул (app/quiz.py), без id — вопросы
+QUIZ_SHOW = "w"        # id = элемент теста: вопрос или -id задачи
+QUIZ_RIGHT = "r"
+QUIZ_WRONG = "f"
+QUIZ_CANCEL = "c"
+
+REVIEW_NEXT = "v"
+REVIEW_SHOW = "h"       # id = вопрос
+REVIEW_RIGHT = "g"      # id = вопрос
+REVIEW_WRONG = "b"      # id = вопрос
+
+# Банки из data/<предмет>/ (app/banks.py): id = bank_ref(номер банка, значение)
+BANK_MENU = "B"         # id = номер банка
+BANK_QUESTIONS_PAGE = "p"
+BANK_QUESTIONS_JUMP = "m"
+BANK_QUESTIONS_BACK = "E"
+BANK_QUESTION_OPEN = "e"
+BANK_QUESTION_ANSWER = "i"
+BANK_QUESTION_NEXT = "k"
+BANK_TASKS_PAGE = "P"
+BANK_TASKS_JUMP = "A"
+BANK_TASKS_BACK = "D"
+BANK_TASK_OPEN = "d"
+BANK_TASK_ANSWER = "u"
+BANK_TASK_NEXT = "y"
+
+ACTIONS = frozenset(
+    (
+        START_MENU, MANAGEMENT_MENU, SECTION_OP,
+        QUESTIONS_MENU, QUESTIONS_PAGE, QUESTIONS_JUMP, QUESTIONS_BACK,
+        QUESTION_OPEN, QUESTION_ANSWER, QUESTION_NEXT,
+        TASKS_MENU, TASKS_PAGE, TASKS_JUMP, TASKS_BACK, TASK_OPEN, TASK_ANSWER, TASK_NEXT,
+        QUIZ_START, QUIZ_SHOW, QUIZ_RIGHT, QUIZ_WRONG, QUIZ_CANCEL,
+        REVIEW_NEXT, REVIEW_SHOW, REVIEW_RIGHT, REVIEW_WRONG,
+        BANK_MENU, BANK_QUESTIONS_PAGE, BANK_QUESTIONS_JUMP, BANK_QUESTIONS_BACK, BANK_QUESTION_OPEN,
+        BANK_QUESTION_ANSWER, BANK_QUESTION_NEXT, BANK_TASKS_PAGE, BANK_TASKS_JUMP, BANK_TASKS_BACK,
+        BANK_TASK_OPEN, BANK_TASK_ANSWER, BANK_TASK_NEXT,
+    )
+)
+
+# Номер банка и значение (id записи / страница) в одном числе:
+# bank_ref(3, 17) = 3 * BANK_STRIDE + 17. Банк 0 — основной data/*.txt.
+BANK_STRIDE = 1 << 20
+
+
+def bank_ref(bank: int, value: int = 0) -> int:
+    return bank * BANK_STRIDE + value
+
+
+def split_bank_ref(ref: int | None) -> tuple[int, int]:
+    return divmod(ref or 0, BANK_STRIDE)
+
+
+# ---------- СТАРЫЙ ФОРМАТ ----------
+
+_LEGACY_EXACT = {
+    "section_management": (MANAGEMENT_MENU, None),
+    "back_to_management": (MANAGEMENT_MENU, None),
+    "section_op": (SECTION_OP, None),
+    "mgmt_questions": (QUESTIONS_MENU, None),
+    "back_questions_menu": (QUESTIONS_MENU, None),
+    "questions_list": (QUESTIONS_PAGE, 0),
+    "questions_jump": (QUESTIONS_JUMP, None),
+    "mgmt_tasks": (TASKS_MENU, None),
+    "back_tasks_menu": (TASKS_MENU, None),
+    "tasks_list": (TASKS_PAGE, 0),
+    "tasks_jump": (TASKS_JUMP, None),
+    "quiz_start": (QUIZ_START, None),
+    "quiz_right": (QUIZ_RIGHT, None),
+    "quiz_wrong": (QUIZ_WRONG, None),
+    "quiz_cancel": (QUIZ_CANCEL, None),
+}
+
+# "<префикс>_<число>"
+_LEGACY_PREFIX = {
+    "questions_page": QUESTIONS_PAGE,
+    "q_open": QUESTION_OPEN,
+    "q_answer": QUESTION_ANSWER,
+    "q_next": QUESTION_NEXT,
+    "tasks_page": TASKS_PAGE,
+    "task": TASK_OPEN,
+    "task_answer": TASK_ANSWER,
+    "task_next": TASK_NEXT,
+    "quiz_show": QUIZ_SHOW,
+}
+
+_DIGITS36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+
+# =========================
+#          КОДЕК
+# =========================
+
+def _base36(value: int) -> str:
+    if value < 0:
+        return "-" + _base36(-value)
+    if value < 36:
+        return _DIGITS36[value]
+    digits = []
+    while value:
+        value, rem = divmod(value, 36)
+        digits.append(_DIGITS36[rem])
+    return "".join(reversed(digits))
+
+
+def encode(action: str, arg: int | None = None) -> str:
+    """
+    callback_data для кнопки: encode(QUESTION_OPEN, 5) -> "1o5".
+    """
+    if arg is None:
+        return CODEC_VERSION + action
+    return CODEC_VERSION + action + _base36(arg)
+
+
+def decode(data: str | None) -> tuple[str, int | None] | None:
+    """
+    (код действия, id или None) либо None, если строка не распознана.
+    """
+    if not data:
+        return None
+
+    if data[0] == CODEC_VERSION and len(data) >= 2 and data[1] in ACTIONS:
+        tail = data[2:]
+        if not tail:
+            return data[1], None
+        try:
+            return data[1], int(tail, 36)
+        except ValueError:
+            return None
+
+    decoded = _LEGACY_EXACT.get(data)
+    if decoded is not None:
+        return decoded
+    head, _, tail = data.rpartition("_")
+    action = _LEGACY_PREFIX.get(head)
+    if action is not None and tail.isdigit():
+        return action, int(tail)
+    return None
+
+
+# =========================
+#     ТАБЛИЦА ОБРАБОТЧИКОВ
+# =========================
+
+class CallbackTable:
+    """
+    { код действия: async handler(call, arg) }.
+    Один хендлер aiogram на все callback-и вызывает dispatch().
+    """
+
+    def __init__(self):
+        self._handlers = {}
+
+    def on(self, action: str):
+        """
+        Декоратор: @CALLBACKS.on(QUESTION_OPEN)
+        """
+        def decorator(handler):
+            if action in self._handlers:
+                raise ValueError(f"Обработчик для {action!r} уже зарегистрирован")
+            self._handlers[action] = handler
+            return handler
+
+        return decorator
+
+    def handler_for(self, action: str):
+        return self._handlers.get(action)
+
+    async def dispatch(self, call: CallbackQuery):
+        decoded = decode(call.data)
+        handler = self._handlers.get(decoded[0]) if decoded else None
+        if handler is None:
+            # устаревшая/неизвестная кнопка — просто гасим «часики»
+            await call.answer()
+            return
+        await handler(call, decoded[1])
@@ -0,0 +1,218 @@
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+from .pack import open_fresh_pack
+
+
+# =========================
+#   ПУТИ И ФАЙЛЫ DATA/
+# =========================
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / "data"
+
+QUESTIONS_FILE = DATA_DIR / "questions.txt"
+TASKS_FILE = DATA_DIR / "tasks.txt"
+
+
+# =========================
+#   ЗАГРУЗКА ИЗ TXT
+# =========================
+
+def load_entries(path: Path):
+    """
+    Читает файл формата `id|текст|ответ` (по строке на запись).
+    Строки без трёх полей или с нечисловым id пропускаются.
+    Возвращает список словарей {"id", "text", "answer"}, отсортированный по id.
+    """
+    entries = []
+    if not path.exists():
+        print(f"⚠️ {path.name} не найден по пути:", path)
+        return entries
+
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.rstrip("\n")
+            if not line:
+                continue
+            parts = line.split("|", 2)
+            if len(parts) != 3:
+                continue
+            id_str, text, answer = parts
+            try:
+                entry_id = int(id_str)
+            except ValueError:
+                continue
+            entries.append(
+                {
+                    "id": entry_id,
+                    "text": text.strip(),
+                    "answer": answer.strip(),
+                }
+            )
+    entries.sort(key=lambda e: e["id"])
+    return entries
+
+
+def load_store(source: Path, compiler=None) -> "ContentStore":
+    """
+    Строит индекс из скомпилированного пакета (source.pack), если он свежий,
+    иначе — из самого .txt. В первом случае ответы не читаются в память,
+    а декодируются из mmap по запросу.
+    """
+    pack = open_fresh_pack(source)
+    if pack is not None:
+        return ContentStore(pack.entries(), compiler=compiler, answers=pack)
+    return ContentStore(load_entries(source), compiler=compiler)
+
+
+def load_questions(compiler=None) -> "ContentStore":
+    questions = load_store(QUESTIONS_FILE, compiler)
+    print(f"❓ Загружено вопросов: {len(questions)}{questions.origin_note()}")
+    return questions
+
+
+def load_tasks(compiler=None) -> "ContentStore":
+    tasks = load_store(TASKS_FILE, compiler)
+    print(f"📊 Загружено задач: {len(tasks)}{tasks.origin_note()}")
+    return tasks
+
+
+# =========================
+#   ИНДЕКС ЗАПИСЕЙ
+# =========================
+
+class ContentStore:
+    """
+    Неизменяемый индекс записей (вопросов или задач), строится один раз при загрузке.
+
+    - get(id)  — запись по id за O(1)
+    - next(id) — следующая запись по возрастанию id (с циклом),
+      тоже за O(1) по заранее посчитанной таблице
+    - plans[id] — результат compiler.entry(entry) для каждой записи
+      (готовые к отправке планы условия, см. app/render.py)
+    - answer(id) / answer_plans(id) — ответ и его план; собираются лениво
+      при первом показе и держатся в небольшом LRU
+    Итерация идёт по записям в порядке возрастания id.
+
+    answers — источник ответов с методом answer(id) (например, ContentPack);
+    если не задан, ответ берётся из entry["answer"].
+    """
+
+    ANSWER_PLANS_CACHE_SIZE = 512
+
+    def __init__(self, entries: list[dict], compiler=None, answers=None):
+        entries = sorted(entries, key=lambda e: e["id"])
+
+        by_id: dict[int, dict] = {}
+        for entry in entries:
+            # при дублях id побеждает первая строка файла, как и раньше
+            by_id.setdefault(entry["id"], entry)
+
+        self.entries = tuple(by_id.values())
+        self.ids = tuple(by_id)
+        self.by_id = by_id
+
+        count = len(self.ids)
+        self._next = {self.ids[i]: self.ids[(i + 1) % count] for i in range(count)}
+
+        self.compiler = compiler
+        self.answers = answers
+        self.plans = {}
+        if compiler is not None:
+            self.plans = {entry["id"]: compiler.entry(entry) for entry in self.entries}
+        self._answer_plans: OrderedDict[int, object] = OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __bool__(self):
+        return bool(self.entries)
+
+    def get(self, entry_id: int) -> dict | None:
+        return self.by_id.get(entry_id)
+
+    def answer(self, entry_id: int) -> str | None:
+        if self.answers is not None:
+            return self.answers.answer(entry_id)
+        entry = self.by_id.get(entry_id)
+        return entry["answer"] if entry else None
+
+    def answer_plans(self, entry_id: int):
+        """
+        План ответа (compiler.answer(entry, answer)); None, если записи нет.
+        """
+        plans = self._answer_plans.get(entry_id)
+        if plans is not None:
+            self._answer_plans.move_to_end(entry_id)
+            return plans
+
+        entry = self.by_id.get(entry_id)
+        if entry is None or self.compiler is None:
+            return None
+
+        plans = self.compiler.answer(entry, self.answer(entry_id) or "")
+        self._answer_plans[entry_id] = plans
+        if len(self._answer_plans) > self.ANSWER_PLANS_CACHE_SIZE:
+            self._answer_plans.popitem(last=False)
+        return plans
+
+    def origin_note(self) -> str:
+        if self.answers is not None and hasattr(self.answers, "path"):
+            return f" (из {self.answers.path.name})"
+        return ""
+
+    def next(self, current_id: int | None = None) -> dict | None:
+        """
+        Следующая запись по id (с циклом).
+        Если current_id is None или такого id нет — вернёт первую.
+        """
+        if not self.ids:
+            return None
+        next_id = self._next.get(current_id, self.ids[0])
+        return self.by_id[next_id]
+
+
+# =========================
+#   СНИМОК КОНТЕНТА
+# =========================
+
+class ContentSnapshot(NamedTuple):
+    """
+    Согласованный набор индексов вопросов и задач одной версии.
+    Хендлер берёт снимок один раз в начале обработки и работает только с ним,
+    поэтому горячая перезагрузка посреди запроса ничего не ломает.
+    """
+    version: int
+    questions: ContentStore
+    tasks: ContentStore
+
+
+def load_content(version: int = 1, question_compiler=None, task_compiler=None) -> ContentSnapshot:
+    return ContentSnapshot(
+        version=version,
+        questions=load_questions(question_compiler),
+        tasks=load_tasks(task_compiler),
+    )
+
+
+def diff_stores(old: ContentStore, new: ContentStore):
+    """
+    Сравнивает две версии индекса.
+    Возвращает (added, removed, changed) — отсортированные списки id.
+    """
+    old_ids = set(old.ids)
+    new_ids = set(new.ids)
+    added = sorted(new_ids - old_ids)
+    removed = sorted(old_ids - new_ids)
+    changed = sorted(
+        entry_id
+        for entry_id in old_ids & new_ids
+        if old.get(entry_id)["text"] != new.get(entry_id)["text"]
+        or old.answer(entry_id) != new.answer(entry_id)
+    )
+    return added, removed, changed
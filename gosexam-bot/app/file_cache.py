@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: без межпроцессной блокировки, остаётся слияние
+    fcntl = None
+
+
+class FileIdCache:
+    """
+    Постоянный кэш file_id для картинок из data/.
+
+    Телеграм после первой загрузки файла возвращает file_id, по которому
+    тот же файл можно отправлять повторно без загрузки. Кэш хранит
+    file_id по относительному пути картинки вместе с отпечатком файла
+    (mtime, размер, sha1) и лежит в JSON на диске, чтобы переживать рестарты.
+
+    Если PNG поменялся (другой sha1) — запись выбрасывается и файл
+    загружается заново.
+
+    Цикл событий диск почти не трогает:
+    - stat() картинки — не чаще раза в verify_interval секунд на файл;
+    - sha1 (при смене mtime и при put) считается в потоке;
+    - JSON пишется «позади» (write-behind, как сессии в app/sessions.py):
+      изменения копятся в _changed и раз в flush_interval секунд
+      сбрасываются одним файлом в потоке; close() — финальный сброс.
+
+    В многопроцессном режиме один файл пишут все воркеры: каждый при
+    сохранении перечитывает его и накладывает только свои изменения
+    (_changed), а пишет через собственный временный файл — чужие file_id
+    не затираются, а заодно подхватываются.
+    """
+
+    def __init__(self, path: Path, base_dir: Path, flush_interval: float = 5.0, verify_interval: float = 5.0):
+        self.path = path
+        self.base_dir = base_dir.resolve()
+        self.flush_interval = flush_interval
+        self.verify_interval = verify_interval
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.flushes = 0
+        # { "tables/table_01.png": {"file_id": ..., "sha1": ..., "mtime_ns": ..., "size": ...} }
+        # None — файл ещё не читался (см. _loaded)
+        self._entries: dict[str, dict] | None = None
+        # изменения с последнего сохранения: { ключ: запись или None (удалена) }
+        self._changed: dict[str, dict | None] = {}
+        # когда (monotonic) файл последний раз сверялся с записью
+        self._verified: dict[str, float] = {}
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    # ---------- ПУБЛИЧНОЕ API ----------
+
+    async def get(self, file_path: Path) -> str | None:
+        """
+        Возвращает file_id для файла или None, если файл ещё не загружался
+        либо изменился с момента загрузки.
+        """
+        key = self._key(file_path)
+        entry = self._loaded().get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        now = time.monotonic()
+        if now - self._verified.get(key, -self.verify_interval) < self.verify_interval:
+            self.hits += 1
+            return entry["file_id"]
+
+        try:
+            st = file_path.stat()
+        except OSError:
+            self.misses += 1
+            return None
+
+        if entry["mtime_ns"] == st.st_mtime_ns and entry["size"] == st.st_size:
+            self._verified[key] = now
+            self.hits += 1
+            return entry["file_id"]
+
+        # mtime/размер поменялись — сверяем содержимое (в потоке)
+        sha1 = await asyncio.to_thread(_sha1, file_path)
+        if self._entries.get(key) is not entry:
+            # пока считали, запись заменили или удалили
+            return await self.get(file_path)
+        if entry["sha1"] == sha1:
+            entry["mtime_ns"] = st.st_mtime_ns
+            entry["size"] = st.st_size
+            self._changed[key] = entry
+            self._verified[key] = now
+            self.hits += 1
+            return entry["file_id"]
+
+        self._entries.pop(key, None)
+        self._verified.pop(key, None)
+        self._changed[key] = None
+        self.invalidations += 1
+        self.misses += 1
+        return None
+
+    async def put(self, file_path: Path, file_id: str):
+        """
+        Запоминает file_id, который вернул Телеграм после загрузки файла.
+        """
+        try:
+            st = file_path.stat()
+            sha1 = await asyncio.to_thread(_sha1, file_path)
+        except OSError:
+            return
+
+        key = self._key(file_path)
+        self._loaded()[key] = self._changed[key] = {
+            "file_id": file_id,
+            "sha1": sha1,
+            "mtime_ns": st.st_mtime_ns,
+            "size": st.st_size,
+        }
+        self._verified[key] = time.monotonic()
+
+    def forget(self, file_path: Path):
+        """
+        Удаляет запись (например, если Телеграм отверг file_id).
+        """
+        key = self._key(file_path)
+        self._verified.pop(key, None)
+        if self._loaded().pop(key, None) is not None:
+            self._changed[key] = None
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries or {}),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "dirty": len(self._changed),
+            "flushes": self.flushes,
+        }
+
+    # ---------- ЗАПИСЬ НА ДИСК ----------
+
+    async def start(self):
+        if self._task is None and self.flush_interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def flush(self):
+        """
+        Сбрасывает накопленные изменения в JSON (в потоке).
+        """
+        async with self._flush_lock:
+            if not self._changed:
+                return
+            changed, self._changed = self._changed, {}
+            try:
+                entries = await asyncio.to_thread(self._save, changed)
+            except OSError as e:
+                # вернём в очередь — более свежие изменения важнее
+                self._changed = {**changed, **self._changed}
+                print("⚠️ Не удалось сохранить кэш file_id:", repr(e))
+                return
+            # то, что изменилось, пока писали, поверх прочитанного с диска
+            for key, entry in self._changed.items():
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+            self._entries = entries
+            self.flushes += 1
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # ---------- ВНУТРЕННЕЕ ----------
+
+    def _key(self, file_path: Path) -> str:
+        return relative_key(file_path, self.base_dir)
+
+    def _loaded(self) -> dict[str, dict]:
+        # файл читается при первом обращении, а не при импорте handlers
+        if self._entries is None:
+            self._entries = read_json_dict(self.path, "⚠️ Кэш file_id повреждён, начинаем с пустого:")
+        return self._entries
+
+    def _save(self, changed: dict[str, dict | None]) -> dict[str, dict]:
+        # выполняется в потоке: свежая версия с диска (её могли дописать
+        # другие воркеры) + свои изменения
+        with file_lock(self.path):
+            entries = read_json_dict(self.path, "⚠️ Кэш file_id повреждён, перезаписываем:")
+            for key, entry in changed.items():
+                if entry is None:
+                    entries.pop(key, None)
+                else:
+                    entries[key] = entry
+            write_json_atomic(self.path, entries)
+        return entries
+
+
+@contextmanager
+def file_lock(path: Path):
+    """
+    Межпроцессная блокировка на время «прочитать — дополнить — записать»
+    (flock на соседнем path.lock; где flock нет — без блокировки).
+    """
+    if fcntl is None:
+        yield
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path.with_name(path.name + ".lock"), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_json_dict(path: Path, warning: str) -> dict:
+    """
+    JSON-объект из файла; {} — если файла нет или он не читается.
+    """
+    if not path.exists():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        print(warning, path)
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def write_json_atomic(path: Path, data):
+    """
+    Пишет во временный файл и атомарно подменяет: при падении процесса
+    не остаётся полузаписанного JSON. Временный файл свой у каждого
+    процесса, поэтому воркеры не пишут в один и тот же.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp_path.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+def relative_key(file_path: Path, base_dir: Path) -> str:
+    """
+    Ключ картинки — путь относительно base_dir (уже resolve()).
+    Пути из планов отправки уже абсолютные и нормализованные
+    (app/render.py, resolve_images), для них ключ считается без
+    обращений к диску; остальные приводятся через resolve().
+    """
+    if file_path.is_absolute():
+        try:
+            return file_path.relative_to(base_dir).as_posix()
+        except ValueError:
+            pass
+    file_path = file_path.resolve()
+    try:
+        return file_path.relative_to(base_dir).as_posix()
+    except ValueError:
+        return file_path.as_posix()
+
+
+def _sha1(file_path: Path) -> str:
+    h = hashlib.sha1()
+    with file_path.open("rb") as f:
+        for block in iter(lambda: f.read(65536), b""):
+            h.update(block)
+    return h.hexdigest()
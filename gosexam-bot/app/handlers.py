@@ -2,406 +2,514 @@ from aiogram import Router, F
 from aiogram.types import (
     Message,
     CallbackQuery,
+    InlineQuery,
     FSInputFile,
-    InlineKeyboardMarkup,
-    InlineKeyboardButton,
+    InputMediaPhoto,
 )
 from aiogram.filters import Command
 from aiogram.filters.command import CommandObject
 from aiogram.exceptions import TelegramBadRequest
 
 from pathlib import Path
-import random
-import re
+import asyncio
+import time
 
 from .keyboards import (
     start_keyboard,
     management_keyboard,
     questions_menu_keyboard,
-    questions_list_keyboard,
-    question_actions_keyboard,
+    questions_list_pages,
     tasks_menu_keyboard,
-    tasks_list_keyboard,
-    task_actions_keyboard,
+    tasks_list_pages,
     main_menu_reply_keyboard,
+    quiz_question_keyboard,
+    quiz_grade_keyboard,
+    search_results_keyboard,
+    review_question_keyboard,
+    review_grade_keyboard,
+    bank_menu_keyboard,
+    bank_list_pages,
+    PagedList,
 )
+from . import callbacks as cb
+from .banks import BankRegistry
+from .callbacks import CallbackTable, split_bank_ref
+from .file_cache import FileIdCache
+from .content import BASE_DIR, DATA_DIR, QUESTIONS_FILE, TASKS_FILE, ContentSnapshot, load_content
+from .inline import InlineResultCache, INLINE_CACHE_TIME
+from .lanes import UserLaneMiddleware, UserLanes
+from .outbox import BULK, INTERACTIVE, outbound_priority
+from .pack import pack_path_for
+from .reload import ContentWatcher
+from .images import ImageVariants
+from .quiz import POOL_QUESTIONS, POOL_TITLES, QuizEngine, is_task
+from .review import DAY, MemoryReviewStore
+from .search import SearchIndex, QUESTION
+from .sessions import MemorySessionStore, QuizState
+from .render import AnswerPlans, EntryPlans, RenderPlan, build_plan, bank_compilers, QUESTION_COMPILER, TASK_COMPILER
 
 router = Router()
+CALLBACKS = CallbackTable()
 
-# =========================
-#   ПУТИ И ФАЙЛЫ DATA/
-# =========================
+CACHE_DIR = BASE_DIR / "cache"
+FILE_IDS = FileIdCache(CACHE_DIR / "file_ids.json", base_dir=DATA_DIR)
+# Пересжатые без потерь PNG (python -m app.images): загружаем их вместо исходников
+IMAGES = ImageVariants(CACHE_DIR / "images", base_dir=DATA_DIR)
 
-BASE_DIR = Path(__file__).resolve().parents[1]
-DATA_DIR = BASE_DIR / "data"
+MAX_MEDIA_GROUP = 10  # максимум фото в одном альбоме (sendMediaGroup)
 
-QUESTIONS_FILE = DATA_DIR / "questions.txt"
-TASKS_FILE = DATA_DIR / "tasks.txt"
+# Полнотекстовый поиск по формулировкам и ответам (/search и просто текст).
+# Обновляется вместе с контентом: дельта считается в build_content,
+# применяется в set_content.
+SEARCH = SearchIndex()
+# Готовые ответы на inline-запросы (@bot такт линии) поверх SEARCH
+INLINE_RESULTS = InlineResultCache(SEARCH)
 
-IMG_PATTERN = re.compile(r"(img:[^\s]+)")
-MAX_TG_MESSAGE = 4000  # безопасный лимит для текста
 
+def build_content(version: int = 1) -> ContentSnapshot:
+    """
+    Загружает вопросы и задачи, компилирует планы отправки
+    и готовит обновление поискового индекса, пулов теста и списка банков.
+    Вызывается из load_initial_content() и ContentWatcher (в отдельном потоке).
+    """
+    snapshot = load_content(version, QUESTION_COMPILER, TASK_COMPILER)
+    SEARCH.stage(snapshot)
+    QUIZ.stage(snapshot)
+    BANKS.stage(snapshot)
+    return snapshot
 
-# =========================
-#   ЗАГРУЗКА ВОПРОСОВ
-# =========================
 
-def load_questions():
-    questions = []
-    if not QUESTIONS_FILE.exists():
-        print("⚠️ questions.txt не найден по пути:", QUESTIONS_FILE)
-        return questions
-
-    with QUESTIONS_FILE.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.rstrip("\n")
-            if not line:
-                continue
-            parts = line.split("|", 2)
-            if len(parts) != 3:
-                continue
-            qid_str, q_text, q_answer = parts
-            try:
-                qid = int(qid_str)
-            except ValueError:
-                continue
-            questions.append(
-                {
-                    "id": qid,
-                    "text": q_text.strip(),
-                    "answer": q_answer.strip(),
-                }
-            )
-    questions.sort(key=lambda q: q["id"])
-    print(f"❓ Загружено вопросов: {len(questions)}")
-    return questions
+# Подбор элементов теста знаний: пулы на версию контента + недавние у пользователя.
+# Длину теста и глубину «не повторять недавние» задаёт bot.py через set_quiz_options().
+QUIZ = QuizEngine()
 
 
-# =========================
-#   ЗАГРУЗКА ЗАДАЧ
-# =========================
+def set_quiz_options(length: int, avoid_recent: int):
+    QUIZ.configure(length, avoid_recent)
 
-def load_tasks():
-    tasks = []
-    if not TASKS_FILE.exists():
-        print("⚠️ tasks.txt не найден по пути:", TASKS_FILE)
-        return tasks
-
-    with TASKS_FILE.open("r", encoding="utf-8") as f:
-        for line in f:
-            line = line.rstrip("\n")
-            if not line:
-                continue
-            parts = line.split("|", 2)
-            if len(parts) != 3:
-                continue
-            tid_str, t_text, t_answer = parts
-            try:
-                tid = int(tid_str)
-            except ValueError:
-                continue
-            tasks.append(
-                {
-                    "id": tid,
-                    "text": t_text.strip(),
-                    "answer": t_answer.strip(),
-                }
-            )
-    tasks.sort(key=lambda t: t["id"])
-    print(f"📊 Загружено задач: {len(tasks)}")
-    return tasks
 
+# Банки по предметам из data/<предмет>/: список обходится в build_content
+# и подменяется в set_content (ContentWatcher следит и за каталогами data/*/),
+# сами банки грузятся при первом открытии и выгружаются по LRU сверх бюджета.
+# Бюджет памяти задаёт bot.py через set_banks_budget().
+BANKS = BankRegistry(DATA_DIR, bank_compilers, numbers_path=CACHE_DIR / "banks.json")
 
-QUESTIONS = load_questions()
-TASKS = load_tasks()
 
-# Состояния теста знаний (пункт 3)
-# { user_id: {"ids": [q_id1, ...], "index": 0, "correct": 0} }
-QUIZ_STATES: dict[int, dict] = {}
+def set_banks_budget(budget_bytes: int):
+    BANKS.budget_bytes = budget_bytes
 
 
-# =========================
-#    ВСПОМОГАТЕЛЬНЫЕ
-# =========================
-
-def split_text_and_images(raw: str):
+def set_cache_dir(cache_dir: Path):
     """
-    Ищет в строке маркеры img:tables/....png
-    Возвращает:
-    - чистый текст без этих маркеров
-    - список относительных путей к картинкам (например, "tables/table_01.png")
+    Переносит кэши (file_id, варианты картинок, номера банков) в другой
+    каталог — для нагрузочных тестов, чтобы фейковые file_id не попали
+    в боевой cache/. Вызывать до load_initial_content().
     """
-    if not raw:
-        return "", []
+    global CACHE_DIR, FILE_IDS, IMAGES, BANKS
+    CACHE_DIR = cache_dir
+    FILE_IDS = FileIdCache(cache_dir / "file_ids.json", base_dir=DATA_DIR)
+    IMAGES = ImageVariants(cache_dir / "images", base_dir=DATA_DIR)
+    BANKS = BankRegistry(DATA_DIR, bank_compilers, BANKS.budget_bytes, numbers_path=cache_dir / "banks.json")
 
-    images = []
 
-    def replacer(match: re.Match):
-        token = match.group(1)  # img:tables/table_01.png
-        rel_path = token.split("img:")[1]  # tables/table_01.png
-        images.append(rel_path)
-        return ""  # удаляем маркер из текста
+# Текущий снимок контента. Хендлеры берут его один раз в начале обработки,
+# ContentWatcher подменяет целиком через set_content().
+# При импорте контент не читается: первый снимок ставит load_initial_content(),
+# и апдейты начинают приниматься только после неё.
+CONTENT: ContentSnapshot | None = None
 
-    clean_text = IMG_PATTERN.sub(replacer, raw).strip()
-    return clean_text, images
 
+def get_content() -> ContentSnapshot:
+    return CONTENT
 
-async def send_photo(message_or_call, file_path: Path):
-    """
-    Отправка изображения с диска (aiogram 3: FSInputFile) через answer_photo.
-    """
-    photo = FSInputFile(path=str(file_path))
-    if isinstance(message_or_call, Message):
-        await message_or_call.answer_photo(photo)
-    else:
-        await message_or_call.message.answer_photo(photo)
+
+def set_content(snapshot: ContentSnapshot):
+    global CONTENT
+    SEARCH.commit(snapshot)
+    QUIZ.commit(snapshot)
+    BANKS.commit(snapshot)
+    CONTENT = snapshot
 
 
-async def send_long_text(send_func, text: str):
+async def load_initial_content() -> ContentSnapshot:
     """
-    Отправляет текст кусками, чтобы не превышать лимит Телеграма.
-    send_func — это message.answer или call.message.answer.
+    Первая загрузка контента: разбор файлов, планы и поисковый индекс
+    собираются в потоке, цикл событий тем временем подключается
+    к Телеграму и открывает хранилища.
     """
-    if not text:
-        return
-
-    for i in range(0, len(text), MAX_TG_MESSAGE):
-        chunk = text[i : i + MAX_TG_MESSAGE]
-        await send_func(chunk)
+    snapshot = await asyncio.to_thread(build_content)
+    set_content(snapshot)
+    return snapshot
 
 
-def get_next_question(current_id: int | None = None):
+def content_watcher(interval: float) -> ContentWatcher:
     """
-    Возвращает следующий вопрос по id (по возрастанию, с циклом).
-    Если current_id is None — вернёт первый.
+    Горячая перезагрузка контента этого процесса. Запускают и bot.py,
+    и каждый воркер многопроцессного режима: у воркера свой снимок.
     """
-    if not QUESTIONS:
-        return None
+    return ContentWatcher(
+        [
+            QUESTIONS_FILE,
+            TASKS_FILE,
+            pack_path_for(QUESTIONS_FILE),
+            pack_path_for(TASKS_FILE),
+        ],
+        build=build_content,
+        publish=set_content,
+        current=get_content,
+        interval=interval,
+        dirs=[DATA_DIR],
+    )
+
+
+# Постраничные клавиатуры списков: { "questions"/"tasks": (версия контента, PagedList) }.
+# Страницы строятся лениво и живут до следующей перезагрузки контента.
+_LIST_PAGES: dict[str, tuple[int, PagedList]] = {}
 
-    ids = [q["id"] for q in QUESTIONS]
-    ids.sort()
 
-    if current_id is None:
-        next_id = ids[0]
+def list_pages(kind: str, content: ContentSnapshot) -> PagedList:
+    cached = _LIST_PAGES.get(kind)
+    if cached is not None and cached[0] == content.version:
+        return cached[1]
+    if kind == "questions":
+        pages = questions_list_pages(content.questions.ids)
     else:
-        try:
-            idx = ids.index(current_id)
-        except ValueError:
-            next_id = ids[0]
-        else:
-            next_id = ids[(idx + 1) % len(ids)]
+        pages = tasks_list_pages(content.tasks.ids)
+    _LIST_PAGES[kind] = (content.version, pages)
+    return pages
 
-    return next((q for q in QUESTIONS if q["id"] == next_id), None)
 
+# То же для банков: { (номер банка, "questions"/"tasks"): (версия снимка банка, PagedList) }
+_BANK_PAGES: dict[tuple[int, str], tuple[int, PagedList]] = {}
 
-def get_next_task(current_id: int | None = None):
-    """
-    Возвращает следующую задачу по id (по возрастанию, с циклом).
-    """
-    if not TASKS:
-        return None
 
-    ids = [t["id"] for t in TASKS]
-    ids.sort()
+def bank_pages(number: int, kind: str, content: ContentSnapshot) -> PagedList:
+    cached = _BANK_PAGES.get((number, kind))
+    if cached is not None and cached[0] == content.version:
+        return cached[1]
+    store = content.questions if kind == "questions" else content.tasks
+    pages = bank_list_pages(number, kind, store.ids)
+    _BANK_PAGES[(number, kind)] = (content.version, pages)
+    return pages
 
-    if current_id is None:
-        next_id = ids[0]
-    else:
-        try:
-            idx = ids.index(current_id)
-        except ValueError:
-            next_id = ids[0]
-        else:
-            next_id = ids[(idx + 1) % len(ids)]
 
-    return next((t for t in TASKS if t["id"] == next_id), None)
+# Состояния теста знаний (пункт 3)
+# { user_id: QuizState(ids, index, correct) }, с TTL и LRU-лимитом.
+# По умолчанию в памяти; bot.py может подменить на SQLite через set_quiz_sessions().
+QUIZ_SESSIONS: MemorySessionStore = MemorySessionStore()
+
+
+def set_quiz_sessions(store: MemorySessionStore):
+    global QUIZ_SESSIONS
+    QUIZ_SESSIONS = store
+
+
+# Расписания интервального повторения: { user_id: карточки вопросов + куча сроков }.
+# Пополняются оценками из теста и из режима повторения.
+# bot.py подменяет на SQLite-хранилище через set_review_store().
+REVIEWS: MemoryReviewStore = MemoryReviewStore()
+
+
+def set_review_store(store: MemoryReviewStore):
+    global REVIEWS
+    REVIEWS = store
+
+
+# Навигация «на месте»: текстовые записи показываются редактированием
+# сообщения с нажатой кнопкой (текст + клавиатура одним вызовом),
+# а не новыми сообщениями. Включается из bot.py (config.NAV_EDIT_IN_PLACE).
+EDIT_IN_PLACE = False
+
+
+def set_edit_in_place(enabled: bool):
+    global EDIT_IN_PLACE
+    EDIT_IN_PLACE = enabled
 
 
 # =========================
-#          QUESTIONS
+#    ВСПОМОГАТЕЛЬНЫЕ
 # =========================
 
-async def send_question(message_or_call, question: dict):
+async def send_photo(message_or_call, file_path: Path):
     """
-    Отправляет текст вопроса + клавиатуру действий.
+    Отправка изображения через answer_photo.
+    Если файл уже загружался — шлём по file_id из FILE_IDS,
+    иначе загружаем с диска (aiogram 3: FSInputFile) — оптимизированный
+    вариант из IMAGES, если он собран, — и запоминаем file_id.
     """
-    q_text, q_images = split_text_and_images(question["text"])
-
     if isinstance(message_or_call, Message):
-        send = message_or_call.answer
+        message = message_or_call
     else:
-        send = message_or_call.message.answer
+        message = message_or_call.message
 
-    header = f"Вопрос {question['id']}:"
-    if q_text:
-        full_text = f"{header}\n\n{q_text}"
-    else:
-        full_text = header
+    file_id = await FILE_IDS.get(file_path)
+    if file_id:
+        try:
+            await message.answer_photo(file_id)
+            return
+        except TelegramBadRequest:
+            # file_id больше не принимается (другой бот / протух) — перезагружаем
+            FILE_IDS.forget(file_path)
 
-    await send_long_text(send, full_text)
+    sent = await message.answer_photo(FSInputFile(path=str(IMAGES.path_for(file_path))))
+    if sent.photo:
+        await FILE_IDS.put(file_path, sent.photo[-1].file_id)
 
-    for img_rel_path in q_images:
-        file_path = DATA_DIR / img_rel_path
-        if file_path.exists():
-            await send_photo(message_or_call, file_path)
 
-    await send(
-        "Выберите действие:",
-        reply_markup=question_actions_keyboard(question["id"], show_answer_button=True),
-    )
+async def send_photos(message_or_call, file_paths: tuple[Path, ...], caption: str | None = None):
+    """
+    Отправляет картинки альбомами (sendMediaGroup) по 2–10 штук.
+    Одиночная картинка (или хвост из одной) уходит обычным send_photo.
+    caption — подпись к первому альбому.
+    Если альбом не удалось отправить — откатываемся на отправку по одной.
+    """
+    if isinstance(message_or_call, Message):
+        message = message_or_call
+    else:
+        message = message_or_call.message
+
+    for start in range(0, len(file_paths), MAX_MEDIA_GROUP):
+        group = file_paths[start : start + MAX_MEDIA_GROUP]
+        group_caption = caption if start == 0 else None
+
+        if len(group) == 1:
+            if group_caption:
+                await message.answer(group_caption)
+            await send_photo(message, group[0])
+            continue
+
+        file_ids = [await FILE_IDS.get(file_path) for file_path in group]
+        media = [
+            InputMediaPhoto(
+                media=file_id or FSInputFile(path=str(IMAGES.path_for(file_path))),
+                caption=group_caption if i == 0 else None,
+            )
+            for i, (file_path, file_id) in enumerate(zip(group, file_ids))
+        ]
+
+        try:
+            sent = await message.answer_media_group(media)
+        except TelegramBadRequest:
+            # например, один из file_id больше не принимается —
+            # забываем их и шлём по одной (send_photo сам перезагрузит файл)
+            for file_path, file_id in zip(group, file_ids):
+                if file_id:
+                    FILE_IDS.forget(file_path)
+            if group_caption:
+                await message.answer(group_caption)
+            for file_path in group:
+                await send_photo(message, file_path)
+            continue
+
+        for file_path, file_id, sent_message in zip(group, file_ids, sent):
+            if not file_id and sent_message.photo:
+                await FILE_IDS.put(file_path, sent_message.photo[-1].file_id)
+
+
+async def edit_or_answer(call: CallbackQuery, text: str, reply_markup=None):
+    """
+    Редактирует сообщение с кнопкой; если нельзя (например, это фото) —
+    отправляет новое. «Сообщение не изменилось» — не ошибка.
+    """
+    try:
+        await call.message.edit_text(text, reply_markup=reply_markup)
+    except TelegramBadRequest as e:
+        if "message is not modified" in str(e):
+            return
+        await call.message.answer(text, reply_markup=reply_markup)
 
 
-async def send_question_answer(call: CallbackQuery, question: dict):
+async def show_list_page(call: CallbackQuery, kind: str, page: int = 0, entry_id: int | None = None):
     """
-    Отправляет ответ на вопрос + картинки
-    и под ответом рисует клавиатуру БЕЗ 'Показать ответ'.
+    Показывает страницу списка вопросов или задач.
+    entry_id — вместо номера страницы: та, на которой стоит запись
+    (кнопка «К списку» под вопросом/задачей).
     """
-    ans_text, ans_images = split_text_and_images(question["answer"])
+    content = CONTENT
+    store = content.questions if kind == "questions" else content.tasks
+    if not store:
+        await show_empty_list(call, kind)
+        return
 
-    header = f"Ответ на вопрос {question['id']}:"
-    if ans_text:
-        full_text = f"{header}\n\n{ans_text}"
-    else:
-        full_text = header
+    pages = list_pages(kind, content)
+    if entry_id is not None:
+        page = pages.page_of(entry_id)
+    await show_pages(call, pages, page)
 
-    await send_long_text(call.message.answer, full_text)
 
-    for img_rel_path in ans_images:
-        file_path = DATA_DIR / img_rel_path
-        if file_path.exists():
-            await send_photo(call, file_path)
+async def show_empty_list(call: CallbackQuery, kind: str):
+    empty = "Список вопросов пока пуст." if kind == "questions" else "Список задач пока пуст."
+    await call.message.answer(empty)
+    await call.answer()
 
-    await call.message.answer(
-        "Выберите действие:",
-        reply_markup=question_actions_keyboard(question["id"], show_answer_button=False),
-    )
 
+async def show_pages(call: CallbackQuery, pages: PagedList, page: int):
+    page = pages.clamp(page)
+    await edit_or_answer(call, pages.caption(page), pages.page(page))
     await call.answer()
 
 
-# =========================
-#            TASKS
-# =========================
+async def show_list_jump(call: CallbackQuery, kind: str):
+    """
+    Экран «перейти к странице».
+    """
+    await show_jump(call, list_pages(kind, CONTENT))
+
+
+async def show_jump(call: CallbackQuery, pages: PagedList):
+    await edit_or_answer(call, f"{pages.title}: выбери страницу", pages.jump())
+    await call.answer()
+
 
-async def send_task(message_or_call, task: dict):
+async def show_plan(message_or_call, plan: RenderPlan, replace: bool = True):
     """
-    Отправляет условие задачи + картинки + клавиатуру действий.
+    Показ записи с учётом режима навигации.
+    В режиме EDIT_IN_PLACE запись из одного сообщения без картинок:
+    - replace=True  — заменяет сообщение с нажатой кнопкой (edit_message_text);
+    - replace=False — уходит одним новым сообщением вместе с клавиатурой.
+    Картинки, длинный текст или сообщение, которое нельзя отредактировать
+    (например, фото), — обычный send_plan.
     """
-    q_text, q_images = split_text_and_images(task["text"])
+    if not (EDIT_IN_PLACE and plan.single_message and isinstance(message_or_call, CallbackQuery)):
+        await send_plan(message_or_call, plan)
+        return
+
+    message = message_or_call.message
+    if replace and message is not None:
+        try:
+            await message.edit_text(plan.chunks[0], reply_markup=plan.keyboard)
+            return
+        except TelegramBadRequest as e:
+            if "message is not modified" in str(e):
+                return
+    await message.answer(plan.chunks[0], reply_markup=plan.keyboard)
 
+
+async def send_plan(message_or_call, plan: RenderPlan):
+    """
+    Проигрывает готовый план (см. app/render.py): текст кусками,
+    картинки альбомами, затем сообщение с клавиатурой.
+    Ничего не разбирается и не проверяется на диске — всё сделано при загрузке.
+    Первое сообщение уходит с обычным приоритетом, остальные — с BULK
+    (app/outbox.py): под нагрузкой хвост длинного ответа пропускает вперёд
+    первые сообщения других пользователей.
+    """
     if isinstance(message_or_call, Message):
         send = message_or_call.answer
     else:
         send = message_or_call.message.answer
 
-    header = f"Задача {task['id']}:"
-    if q_text:
-        full_text = f"{header}\n\n{q_text}"
-    else:
-        full_text = header
+    chunks = plan.chunks
+    if chunks:
+        await send(chunks[0])
 
-    await send_long_text(send, full_text)
+    with outbound_priority(BULK if chunks else INTERACTIVE):
+        for chunk in chunks[1:]:
+            await send(chunk)
 
-    for img_rel_path in q_images:
-        file_path = DATA_DIR / img_rel_path
-        if file_path.exists():
-            await send_photo(message_or_call, file_path)
+        if plan.images:
+            await send_photos(message_or_call, plan.images, caption=plan.caption)
 
-    await send(
-        "Выберите действие:",
-        reply_markup=task_actions_keyboard(task["id"], show_answer_button=True),
-    )
+        if plan.keyboard is not None:
+            await send(plan.prompt, reply_markup=plan.keyboard)
 
 
-async def send_task_answer(call: CallbackQuery, task: dict):
+# =========================
+#          QUESTIONS
+# =========================
+
+async def send_question(message_or_call, plans: EntryPlans):
     """
-    Отправляет решение задачи + картинки
-    и под решением рисует клавиатуру БЕЗ 'Показать решение'.
+    Отправляет текст вопроса + клавиатуру действий.
     """
-    ans_text, ans_images = split_text_and_images(task["answer"])
+    await show_plan(message_or_call, plans.body)
 
-    header = f"Решение задачи {task['id']}:"
-    if ans_text:
-        full_text = f"{header}\n\n{ans_text}"
-    else:
-        full_text = header
 
-    await send_long_text(call.message.answer, full_text)
+async def send_question_answer(call: CallbackQuery, plans: AnswerPlans):
+    """
+    Отправляет ответ на вопрос + картинки
+    и под ответом рисует клавиатуру БЕЗ 'Показать ответ'.
+    Вопрос остаётся в чате — ответ всегда новым сообщением.
+    """
+    await show_plan(call, plans.plan, replace=False)
+    await call.answer()
+
 
-    for img_rel_path in ans_images:
-        file_path = DATA_DIR / img_rel_path
-        if file_path.exists():
-            await send_photo(call, file_path)
+# =========================
+#            TASKS
+# =========================
+
+async def send_task(message_or_call, plans: EntryPlans):
+    """
+    Отправляет условие задачи + картинки + клавиатуру действий.
+    """
+    await show_plan(message_or_call, plans.body)
 
-    await call.message.answer(
-        "Выберите действие:",
-        reply_markup=task_actions_keyboard(task["id"], show_answer_button=False),
-    )
 
+async def send_task_answer(call: CallbackQuery, plans: AnswerPlans):
+    """
+    Отправляет решение задачи + картинки
+    и под решением рисует клавиатуру БЕЗ 'Показать решение'.
+    Условие остаётся в чате — решение всегда новым сообщением.
+    """
+    await show_plan(call, plans.plan, replace=False)
     await call.answer()
 
 
 # =========================
-#      ТЕСТ ЗНАНИЙ (5 ВОПРОСОВ)
+#        ТЕСТ ЗНАНИЙ
 # =========================
 
+def quiz_item_plans(item: int):
+    """
+    (заголовок, планы условия) элемента теста: вопроса или задачи (id < 0).
+    """
+    if is_task(item):
+        return f"Задача {-item}", CONTENT.tasks.plans.get(-item)
+    return f"Вопрос {item}", CONTENT.questions.plans.get(item)
+
+
 async def quiz_send_question(call: CallbackQuery, user_id: int):
-    state = QUIZ_STATES.get(user_id)
+    state = QUIZ_SESSIONS.get(user_id)
     if not state:
         await call.message.answer("Тест не найден. Запусти его заново.")
         return
 
-    idx = state["index"]
-    ids = state["ids"]
+    idx = state.index
+    ids = state.ids
     total = len(ids)
 
     if idx >= total:
         await call.message.answer("Тест уже завершён.")
         return
 
-    qid = ids[idx]
-    question = next((q for q in QUESTIONS if q["id"] == qid), None)
-    if not question:
+    item = ids[idx]
+    title, plans = quiz_item_plans(item)
+    if not plans:
         await call.message.answer("Вопрос теста не найден, пропускаем.")
-        state["index"] += 1
+        state.index += 1
+        QUIZ_SESSIONS.set(user_id, state)
+        if state.index >= total:
+            return await quiz_finish(call, user_id)
         return await quiz_send_question(call, user_id)
 
-    q_text, q_images = split_text_and_images(question["text"])
-
-    header = f"🧪 Тест знаний\nВопрос {idx + 1} из {total}\n\nВопрос {qid}:"
-    if q_text:
-        full_text = f"{header}\n\n{q_text}"
-    else:
-        full_text = header
-
-    await send_long_text(call.message.answer, full_text)
-
-    for img_rel_path in q_images:
-        file_path = DATA_DIR / img_rel_path
-        if file_path.exists():
-            await send_photo(call, file_path)
-
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="✅ Показать ответ", callback_data=f"quiz_show_{qid}")],
-            [InlineKeyboardButton(text="❌ Завершить тест", callback_data="quiz_cancel")],
-        ]
-    )
+    header = f"🧪 Тест знаний\nВопрос {idx + 1} из {total}\n\n{title}:"
+    await send_plan(call, build_plan(header, plans.text, plans.images))
 
     await call.message.answer(
         "Когда будешь готов, нажми «Показать ответ».",
-        reply_markup=kb,
+        reply_markup=quiz_question_keyboard(item),
     )
 
 
 async def quiz_finish(call: CallbackQuery, user_id: int):
-    state = QUIZ_STATES.pop(user_id, None)
+    state = QUIZ_SESSIONS.pop(user_id)
     if not state:
         await call.message.answer("Тест не найден.")
         return
 
-    total = len(state["ids"])
-    correct = state["correct"]
+    total = len(state.ids)
+    correct = state.correct
     wrong = total - correct
 
     await call.message.answer(
@@ -411,19 +519,33 @@ async def quiz_finish(call: CallbackQuery, user_id: int):
     )
 
 
-async def quiz_register_answer(call: CallbackQuery, is_correct: bool):
+async def quiz_register_answer(call: CallbackQuery, is_correct: bool, position: int | None = None):
+    """
+    position — номер вопроса в тесте, под которым нажата оценка.
+    Повторное нажатие (двойной тап, старая кнопка) этот вопрос уже не
+    застанет текущим и ничего не засчитает; None — кнопка из старых
+    сообщений без номера.
+    """
     user_id = call.from_user.id
-    state = QUIZ_STATES.get(user_id)
+    state = QUIZ_SESSIONS.get(user_id)
     if not state:
         await call.answer("Тест не найден.", show_alert=True)
         return
 
+    if position is not None and position != state.index:
+        await call.answer("Этот вопрос уже оценён.")
+        return
+
     if is_correct:
-        state["correct"] += 1
+        state.correct += 1
+    if state.index < len(state.ids) and not is_task(state.ids[state.index]):
+        await REVIEWS.load(user_id)
+        REVIEWS.grade(user_id, state.ids[state.index], is_correct)
 
-    state["index"] += 1
+    state.index += 1
+    QUIZ_SESSIONS.set(user_id, state)
 
-    if state["index"] >= len(state["ids"]):
+    if state.index >= len(state.ids):
         await quiz_finish(call, user_id)
     else:
         await quiz_send_question(call, user_id)
@@ -431,6 +553,46 @@ async def quiz_register_answer(call: CallbackQuery, is_correct: bool):
     await call.answer()
 
 
+# =========================
+#   ИНТЕРВАЛЬНОЕ ПОВТОРЕНИЕ
+# =========================
+
+def format_wait(seconds: float) -> str:
+    if seconds < 3600:
+        return f"через {max(1, round(seconds / 60))} мин"
+    if seconds < DAY:
+        return f"через {round(seconds / 3600)} ч"
+    return f"через {round(seconds / DAY)} дн."
+
+
+async def review_send_next(call: CallbackQuery):
+    """
+    Показывает следующую карточку: сначала те, у которых подошёл срок,
+    потом ещё не изученные вопросы.
+    """
+    user_id = call.from_user.id
+    questions = CONTENT.questions
+    await REVIEWS.load(user_id)
+    qid, due = REVIEWS.next_card(user_id, questions)
+
+    if qid is None:
+        if due is None:
+            text = "Пока нет вопросов для повторения."
+        else:
+            text = f"🔁 Всё повторено ✅\nСледующее повторение {format_wait(due - time.time())}."
+        await call.message.answer(text, reply_markup=questions_menu_keyboard())
+        return
+
+    plans = questions.plans[qid]
+    card = REVIEWS.schedule(user_id).cards.get(qid)
+    status = "новый вопрос" if card is None else "повторение"
+    header = f"🔁 Повторение: {status}\n\nВопрос {qid}:"
+    await show_plan(
+        call,
+        build_plan(header, plans.text, plans.images, "Вспомни ответ и нажми «Показать ответ».", review_question_keyboard(qid)),
+    )
+
+
 # =========================
 #         ХЕНДЛЕРЫ
 # =========================
@@ -441,6 +603,7 @@ async def start_command(message: Message, command: CommandObject):
     Обработка /start и deep-link /start <payload>.
     """
     payload = (command.args or "").strip()
+    content = CONTENT
 
     # включаем снизу кнопку "Меню" (reply-клавиатура)
     await message.answer(
@@ -476,9 +639,9 @@ async def start_command(message: Message, command: CommandObject):
         except (IndexError, ValueError):
             pass
         else:
-            task = next((t for t in TASKS if t["id"] == tid), None)
-            if task:
-                await send_task(message, task)
+            plans = content.tasks.plans.get(tid)
+            if plans:
+                await send_task(message, plans)
                 return
 
     # Сразу открыть конкретный вопрос: ?start=question_3
@@ -488,15 +651,15 @@ async def start_command(message: Message, command: CommandObject):
         except (IndexError, ValueError):
             pass
         else:
-            question = next((q for q in QUESTIONS if q["id"] == qid), None)
-            if question:
-                await send_question(message, question)
+            plans = content.questions.plans.get(qid)
+            if plans:
+                await send_question(message, plans)
                 return
 
     # Обычный /start или непонятный payload -> главное меню
     await message.answer(
         "Привет! Бот запущен ✅\nВыбери раздел:",
-        reply_markup=start_keyboard(),
+        reply_markup=start_keyboard(BANKS.menu()),
     )
 
 
@@ -505,14 +668,75 @@ async def start_command(message: Message, command: CommandObject):
 async def menu_button_handler(message: Message):
     await message.answer(
         "Привет! Бот запущен ✅\nВыбери раздел:",
-        reply_markup=start_keyboard(),
+        reply_markup=start_keyboard(BANKS.menu()),
+    )
+
+
+# ---------- ПОИСК ----------
+
+async def answer_search(message: Message, query: str):
+    query = query.strip()
+    if not query:
+        await message.answer("Напиши, что искать: /search такт линии")
+        return
+
+    content = CONTENT
+    hits = SEARCH.search(query)
+    if not hits:
+        await message.answer("Ничего не нашлось 🤷 Попробуй другие слова.")
+        return
+
+    lines = [f"🔎 Нашлось по запросу «{query[:50]}»:"]
+    for hit in hits:
+        if hit.kind == QUESTION:
+            plans = content.questions.plans.get(hit.id)
+            label = f"Вопрос {hit.id}"
+        else:
+            plans = content.tasks.plans.get(hit.id)
+            label = f"Задача {hit.id}"
+        snippet = " ".join(plans.text.split())[:80] if plans else ""
+        lines.append(f"• {label}: {snippet}")
+
+    await message.answer("\n".join(lines), reply_markup=search_results_keyboard(hits))
+
+
+@router.message(Command("search"))
+async def search_command(message: Message, command: CommandObject):
+    await answer_search(message, command.args or "")
+
+
+# Любой другой текст (не команда) — тоже поиск
+@router.message(F.text & ~F.text.startswith("/"))
+async def search_text(message: Message):
+    await answer_search(message, message.text)
+
+
+# Inline-режим: @bot <запрос> в любом чате
+@router.inline_query()
+async def inline_search(query: InlineQuery):
+    me = await query.bot.me()
+    results, next_offset = INLINE_RESULTS.page(CONTENT, query.query, query.offset, me.username)
+    await query.answer(
+        results,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+        next_offset=next_offset,
     )
 
 
 # --- Главное меню (INLINE) ---
 
-@router.callback_query(F.data == "section_management")
-async def cb_section_management(call: CallbackQuery):
+@CALLBACKS.on(cb.START_MENU)
+async def cb_start_menu(call: CallbackQuery, arg):
+    await call.message.edit_text(
+        "Выбери раздел:",
+        reply_markup=start_keyboard(BANKS.menu()),
+    )
+    await call.answer()
+
+
+@CALLBACKS.on(cb.MANAGEMENT_MENU)
+async def cb_management_menu(call: CallbackQuery, arg):
     await call.message.edit_text(
         "Раздел 🧠 Менеджмент.\nВыбери направление:",
         reply_markup=management_keyboard(),
@@ -520,19 +744,24 @@ async def cb_section_management(call: CallbackQuery):
     await call.answer()
 
 
-@router.callback_query(F.data == "section_op")
-async def cb_section_op(call: CallbackQuery):
+# Кнопка из старых сообщений: теперь это банк data/op/, если он есть
+@CALLBACKS.on(cb.SECTION_OP)
+async def cb_section_op(call: CallbackQuery, arg):
+    info = BANKS.find("op")
+    if info is not None:
+        await cb_bank_menu(call, info.number)
+        return
     await call.message.edit_text(
         "Раздел 📁 Управление персоналом пока пуст 🙂",
-        reply_markup=start_keyboard(),
+        reply_markup=start_keyboard(BANKS.menu()),
     )
     await call.answer()
 
 
 # ---------- ВОПРОСЫ (QUESTIONS) ----------
 
-@router.callback_query(F.data == "mgmt_questions")
-async def cb_mgmt_questions(call: CallbackQuery):
+@CALLBACKS.on(cb.QUESTIONS_MENU)
+async def cb_questions_menu(call: CallbackQuery, arg):
     await call.message.edit_text(
         "Раздел ❓ Вопросы (теория).\nЧто тебе нужно?",
         reply_markup=questions_menu_keyboard(),
@@ -540,57 +769,37 @@ async def cb_mgmt_questions(call: CallbackQuery):
     await call.answer()
 
 
-@router.callback_query(F.data == "back_questions_menu")
-async def cb_back_questions_menu(call: CallbackQuery):
-    await call.message.edit_text(
-        "Раздел ❓ Вопросы (теория).\nЧто тебе нужно?",
-        reply_markup=questions_menu_keyboard(),
-    )
-    await call.answer()
+@CALLBACKS.on(cb.QUESTIONS_PAGE)
+async def cb_questions_page(call: CallbackQuery, page):
+    await show_list_page(call, "questions", page or 0)
 
 
-@router.callback_query(F.data == "questions_list")
-async def cb_questions_list(call: CallbackQuery):
-    if not QUESTIONS:
-        await call.message.answer("Список вопросов пока пуст.")
-        await call.answer()
-        return
-
-    short_q = [{"id": q["id"], "text": q["text"]} for q in QUESTIONS]
-    kb = questions_list_keyboard(short_q)
+@CALLBACKS.on(cb.QUESTIONS_JUMP)
+async def cb_questions_jump(call: CallbackQuery, arg):
+    await show_list_jump(call, "questions")
 
-    try:
-        await call.message.edit_text(
-            "Список вопросов:",
-            reply_markup=kb,
-        )
-    except TelegramBadRequest:
-        await call.message.answer(
-            "Список вопросов:",
-            reply_markup=kb,
-        )
 
-    await call.answer()
+@CALLBACKS.on(cb.QUESTIONS_BACK)
+async def cb_questions_back(call: CallbackQuery, qid):
+    await show_list_page(call, "questions", entry_id=qid or 0)
 
 
-# ТЕСТ ЗНАНИЙ (пункт 3) — старт
-@router.callback_query(F.data == "quiz_start")
-async def cb_quiz_start(call: CallbackQuery):
-    if not QUESTIONS:
+# ТЕСТ ЗНАНИЙ (пункт 3) — старт; arg — пул (POOL_*), по умолчанию вопросы
+@CALLBACKS.on(cb.QUIZ_START)
+async def cb_quiz_start(call: CallbackQuery, pool):
+    pool = POOL_QUESTIONS if pool not in POOL_TITLES else pool
+    user_id = call.from_user.id
+    items = QUIZ.start(user_id, CONTENT, pool)
+    if not items:
         await call.message.answer("Пока нет вопросов для теста.")
         await call.answer()
         return
 
-    user_id = call.from_user.id
-    ids = [q["id"] for q in QUESTIONS]
-    random.shuffle(ids)
-    ids = ids[: min(5, len(ids))]  # максимум 5 вопросов
-
-    QUIZ_STATES[user_id] = {"ids": ids, "index": 0, "correct": 0}
+    QUIZ_SESSIONS.set(user_id, QuizState(items))
 
     await call.message.answer(
-        "Запускаем тест знаний 🧪\n"
-        "Тебе будет показано 5 вопросов (или меньше, если их меньше в базе).\n"
+        f"Запускаем тест знаний 🧪 ({POOL_TITLES[pool]})\n"
+        f"Тебе будет показано {QUIZ.length} вопросов (или меньше, если их меньше в базе).\n"
         "Отвечай сам, затем жми «Показать ответ» и оценивай, правильно ли ответил.",
     )
 
@@ -598,136 +807,150 @@ async def cb_quiz_start(call: CallbackQuery):
     await call.answer()
 
 
-@router.callback_query(F.data.startswith("quiz_show_"))
-async def cb_quiz_show_answer(call: CallbackQuery):
+@CALLBACKS.on(cb.QUIZ_SHOW)
+async def cb_quiz_show_answer(call: CallbackQuery, item):
     user_id = call.from_user.id
-    state = QUIZ_STATES.get(user_id)
+    state = QUIZ_SESSIONS.get(user_id)
     if not state:
         await call.answer("Тест не найден.", show_alert=True)
         return
 
-    try:
-        qid = int(call.data.split("_")[2])
-    except (IndexError, ValueError):
+    if item is None:
         await call.answer("Некорректный id вопроса.", show_alert=True)
         return
 
-    question = next((q for q in QUESTIONS if q["id"] == qid), None)
-    if not question:
+    if is_task(item):
+        plans = CONTENT.tasks.answer_plans(-item)
+        title = f"задача {-item}"
+    else:
+        plans = CONTENT.questions.answer_plans(item)
+        title = f"вопрос {item}"
+    if not plans:
         await call.answer("Вопрос не найден.", show_alert=True)
         return
 
-    ans_text, ans_images = split_text_and_images(question["answer"])
-
-    idx = state["index"]
-    total = len(state["ids"])
-    header = f"Ответ на тестовый вопрос {idx + 1} из {total} (вопрос {qid}):"
-    if ans_text:
-        full_text = f"{header}\n\n{ans_text}"
-    else:
-        full_text = header
-
-    await send_long_text(call.message.answer, full_text)
-
-    for img_rel_path in ans_images:
-        file_path = DATA_DIR / img_rel_path
-        if file_path.exists():
-            await send_photo(call, file_path)
-
-    kb = InlineKeyboardMarkup(
-        inline_keyboard=[
-            [
-                InlineKeyboardButton(text="✅ Я ответил правильно", callback_data="quiz_right"),
-                InlineKeyboardButton(text="❌ Я ответил неправильно", callback_data="quiz_wrong"),
-            ],
-            [InlineKeyboardButton(text="❌ Завершить тест", callback_data="quiz_cancel")],
-        ]
-    )
+    idx = state.index
+    total = len(state.ids)
+    header = f"Ответ на тестовый вопрос {idx + 1} из {total} ({title}):"
+    await send_plan(call, build_plan(header, plans.text, plans.images))
 
     await call.message.answer(
         "Оцени свой ответ:",
-        reply_markup=kb,
+        reply_markup=quiz_grade_keyboard(idx),
     )
 
     await call.answer()
 
 
-@router.callback_query(F.data == "quiz_right")
-async def cb_quiz_right(call: CallbackQuery):
-    await quiz_register_answer(call, is_correct=True)
+@CALLBACKS.on(cb.QUIZ_RIGHT)
+async def cb_quiz_right(call: CallbackQuery, position):
+    await quiz_register_answer(call, is_correct=True, position=position)
 
 
-@router.callback_query(F.data == "quiz_wrong")
-async def cb_quiz_wrong(call: CallbackQuery):
-    await quiz_register_answer(call, is_correct=False)
+@CALLBACKS.on(cb.QUIZ_WRONG)
+async def cb_quiz_wrong(call: CallbackQuery, position):
+    await quiz_register_answer(call, is_correct=False, position=position)
 
 
-@router.callback_query(F.data == "quiz_cancel")
-async def cb_quiz_cancel(call: CallbackQuery):
-    QUIZ_STATES.pop(call.from_user.id, None)
+@CALLBACKS.on(cb.QUIZ_CANCEL)
+async def cb_quiz_cancel(call: CallbackQuery, arg):
+    QUIZ_SESSIONS.pop(call.from_user.id)
     await call.message.answer("Тест прерван.")
     await call.answer()
 
 
+# ---------- ПОВТОРЕНИЕ ----------
+
+@CALLBACKS.on(cb.REVIEW_NEXT)
+async def cb_review_next(call: CallbackQuery, arg):
+    await review_send_next(call)
+    await call.answer()
+
+
+@CALLBACKS.on(cb.REVIEW_SHOW)
+async def cb_review_show(call: CallbackQuery, qid):
+    plans = CONTENT.questions.answer_plans(qid) if qid is not None else None
+    if not plans:
+        await call.answer("Вопрос не найден.", show_alert=True)
+        return
+
+    await show_plan(
+        call,
+        build_plan(f"Ответ на вопрос {qid}:", plans.text, plans.images, "Оцени себя:", review_grade_keyboard(qid)),
+        replace=False,
+    )
+    await call.answer()
+
+
+async def review_grade(call: CallbackQuery, qid, is_correct: bool):
+    if qid is None or CONTENT.questions.get(qid) is None:
+        await call.answer("Вопрос не найден.", show_alert=True)
+        return
+
+    await REVIEWS.load(call.from_user.id)
+    card = REVIEWS.grade(call.from_user.id, qid, is_correct)
+    await call.answer(f"Вопрос {qid} — снова {format_wait(card.due - time.time())}")
+    await review_send_next(call)
+
+
+@CALLBACKS.on(cb.REVIEW_RIGHT)
+async def cb_review_right(call: CallbackQuery, qid):
+    await review_grade(call, qid, is_correct=True)
+
+
+@CALLBACKS.on(cb.REVIEW_WRONG)
+async def cb_review_wrong(call: CallbackQuery, qid):
+    await review_grade(call, qid, is_correct=False)
+
+
 # Открыть конкретный вопрос из списка
-@router.callback_query(F.data.startswith("q_open_"))
-async def cb_question_open(call: CallbackQuery):
-    data = call.data  # q_open_5
-    try:
-        qid = int(data.split("_")[2])
-    except (IndexError, ValueError):
+@CALLBACKS.on(cb.QUESTION_OPEN)
+async def cb_question_open(call: CallbackQuery, qid):
+    if qid is None:
         await call.answer("Некорректный id вопроса", show_alert=True)
         return
 
-    question = next((q for q in QUESTIONS if q["id"] == qid), None)
-    if not question:
+    plans = CONTENT.questions.plans.get(qid)
+    if not plans:
         await call.answer("Вопрос не найден", show_alert=True)
         return
 
-    await send_question(call, question)
+    await send_question(call, plans)
     await call.answer()
 
 
 # Показать ответ на вопрос
-@router.callback_query(F.data.startswith("q_answer_"))
-async def cb_question_answer(call: CallbackQuery):
-    data = call.data  # q_answer_5
-    try:
-        qid = int(data.split("_")[2])
-    except (IndexError, ValueError):
+@CALLBACKS.on(cb.QUESTION_ANSWER)
+async def cb_question_answer(call: CallbackQuery, qid):
+    if qid is None:
         await call.answer("Некорректный id вопроса", show_alert=True)
         return
 
-    question = next((q for q in QUESTIONS if q["id"] == qid), None)
-    if not question:
+    plans = CONTENT.questions.answer_plans(qid)
+    if not plans:
         await call.answer("Вопрос не найден", show_alert=True)
         return
 
-    await send_question_answer(call, question)
+    await send_question_answer(call, plans)
 
 
 # Следующий вопрос (пункт 5)
-@router.callback_query(F.data.startswith("q_next_"))
-async def cb_question_next(call: CallbackQuery):
-    data = call.data  # q_next_5
-    try:
-        current_id = int(data.split("_")[2])
-    except (IndexError, ValueError):
-        current_id = None
-
-    question = get_next_question(current_id)
+@CALLBACKS.on(cb.QUESTION_NEXT)
+async def cb_question_next(call: CallbackQuery, current_id):
+    questions = CONTENT.questions
+    question = questions.next(current_id)
     if not question:
         await call.answer("Вопросы не найдены", show_alert=True)
         return
 
-    await send_question(call, question)
+    await send_question(call, questions.plans[question["id"]])
     await call.answer()
 
 
 # ---------- ЗАДАЧИ (TASKS) ----------
 
-@router.callback_query(F.data == "mgmt_tasks")
-async def cb_mgmt_tasks(call: CallbackQuery):
+@CALLBACKS.on(cb.TASKS_MENU)
+async def cb_tasks_menu(call: CallbackQuery, arg):
     await call.message.edit_text(
         "Раздел 📊 Задачи (практика).\nЧто выбираем?",
         reply_markup=tasks_menu_keyboard(),
@@ -735,106 +958,262 @@ async def cb_mgmt_tasks(call: CallbackQuery):
     await call.answer()
 
 
-@router.callback_query(F.data == "back_to_management")
-async def cb_back_to_management(call: CallbackQuery):
-    await call.message.edit_text(
-        "Раздел 🧠 Менеджмент.\nВыбери направление:",
-        reply_markup=management_keyboard(),
-    )
+@CALLBACKS.on(cb.TASKS_PAGE)
+async def cb_tasks_page(call: CallbackQuery, page):
+    await show_list_page(call, "tasks", page or 0)
+
+
+@CALLBACKS.on(cb.TASKS_JUMP)
+async def cb_tasks_jump(call: CallbackQuery, arg):
+    await show_list_jump(call, "tasks")
+
+
+@CALLBACKS.on(cb.TASKS_BACK)
+async def cb_tasks_back(call: CallbackQuery, tid):
+    await show_list_page(call, "tasks", entry_id=tid or 0)
+
+
+# Открыть задачу
+@CALLBACKS.on(cb.TASK_OPEN)
+async def cb_task_open(call: CallbackQuery, tid):
+    if tid is None:
+        await call.answer("Некорректный id задачи", show_alert=True)
+        return
+
+    plans = CONTENT.tasks.plans.get(tid)
+    if not plans:
+        await call.answer("Задача не найдена", show_alert=True)
+        return
+
+    await send_task(call, plans)
     await call.answer()
 
 
-@router.callback_query(F.data == "back_tasks_menu")
-async def cb_back_tasks_menu(call: CallbackQuery):
-    await call.message.edit_text(
-        "Раздел 📊 Задачи (практика).\nЧто выбираем?",
-        reply_markup=tasks_menu_keyboard(),
+# Показать решение задачи
+@CALLBACKS.on(cb.TASK_ANSWER)
+async def cb_task_answer(call: CallbackQuery, tid):
+    if tid is None:
+        await call.answer("Некорректный id задачи", show_alert=True)
+        return
+
+    plans = CONTENT.tasks.answer_plans(tid)
+    if not plans:
+        await call.answer("Задача не найдена", show_alert=True)
+        return
+
+    await send_task_answer(call, plans)
+
+
+# Следующая задача (пункт 5)
+@CALLBACKS.on(cb.TASK_NEXT)
+async def cb_task_next(call: CallbackQuery, current_id):
+    tasks = CONTENT.tasks
+    task = tasks.next(current_id)
+    if not task:
+        await call.answer("Задачи не найдены", show_alert=True)
+        return
+
+    await send_task(call, tasks.plans[task["id"]])
+    await call.answer()
+
+
+# ---------- БАНКИ data/<предмет>/ ----------
+
+async def bank_snapshot(call: CallbackQuery, number: int) -> ContentSnapshot | None:
+    """
+    Снимок банка (загружается при первом обращении); None — банка нет,
+    пользователю уже ответили.
+    """
+    content = await BANKS.get(number)
+    if content is None:
+        await call.answer("Раздел не найден", show_alert=True)
+    return content
+
+
+@CALLBACKS.on(cb.BANK_MENU)
+async def cb_bank_menu(call: CallbackQuery, number):
+    info = BANKS.info(number or 0)
+    content = await bank_snapshot(call, number or 0)
+    if content is None:
+        return
+
+    if not content.questions and not content.tasks:
+        text = f"Раздел 📁 {info.title} пока пуст 🙂"
+    else:
+        text = f"Раздел 📁 {info.title}.\nЧто выбираем?"
+    await edit_or_answer(
+        call,
+        text,
+        bank_menu_keyboard(info.number, bool(content.questions), bool(content.tasks)),
     )
     await call.answer()
 
 
-@router.callback_query(F.data == "tasks_list")
-async def cb_tasks_list(call: CallbackQuery):
-    if not TASKS:
-        await call.message.answer("Список задач пока пуст.")
-        await call.answer()
+async def show_bank_page(call: CallbackQuery, kind: str, ref, by_entry: bool = False):
+    """
+    ref = bank_ref(номер банка, страница); by_entry — вместо страницы id записи,
+    показываем страницу, на которой она стоит.
+    """
+    number, page = split_bank_ref(ref)
+    content = await bank_snapshot(call, number)
+    if content is None:
+        return
+    store = content.questions if kind == "questions" else content.tasks
+    if not store:
+        await show_empty_list(call, kind)
         return
+    pages = bank_pages(number, kind, content)
+    if by_entry:
+        page = pages.page_of(page)
+    await show_pages(call, pages, page)
 
-    short_tasks = [{"id": t["id"], "text": t["text"]} for t in TASKS]
-    kb = tasks_list_keyboard(short_tasks)
 
-    try:
-        await call.message.edit_text(
-            "Список задач:",
-            reply_markup=kb,
-        )
-    except TelegramBadRequest:
-        await call.message.answer(
-            "Список задач:",
-            reply_markup=kb,
-        )
+async def show_bank_jump(call: CallbackQuery, kind: str, ref):
+    number, _ = split_bank_ref(ref)
+    content = await bank_snapshot(call, number)
+    if content is None:
+        return
+    await show_jump(call, bank_pages(number, kind, content))
+
+
+@CALLBACKS.on(cb.BANK_QUESTIONS_PAGE)
+async def cb_bank_questions_page(call: CallbackQuery, ref):
+    await show_bank_page(call, "questions", ref)
+
+
+@CALLBACKS.on(cb.BANK_QUESTIONS_JUMP)
+async def cb_bank_questions_jump(call: CallbackQuery, ref):
+    await show_bank_jump(call, "questions", ref)
+
+
+@CALLBACKS.on(cb.BANK_QUESTIONS_BACK)
+async def cb_bank_questions_back(call: CallbackQuery, ref):
+    await show_bank_page(call, "questions", ref, by_entry=True)
+
+
+@CALLBACKS.on(cb.BANK_TASKS_PAGE)
+async def cb_bank_tasks_page(call: CallbackQuery, ref):
+    await show_bank_page(call, "tasks", ref)
+
 
+@CALLBACKS.on(cb.BANK_TASKS_JUMP)
+async def cb_bank_tasks_jump(call: CallbackQuery, ref):
+    await show_bank_jump(call, "tasks", ref)
+
+
+@CALLBACKS.on(cb.BANK_TASKS_BACK)
+async def cb_bank_tasks_back(call: CallbackQuery, ref):
+    await show_bank_page(call, "tasks", ref, by_entry=True)
+
+
+@CALLBACKS.on(cb.BANK_QUESTION_OPEN)
+async def cb_bank_question_open(call: CallbackQuery, ref):
+    number, qid = split_bank_ref(ref)
+    content = await bank_snapshot(call, number)
+    if content is None:
+        return
+
+    plans = content.questions.plans.get(qid)
+    if not plans:
+        await call.answer("Вопрос не найден", show_alert=True)
+        return
+
+    await send_question(call, plans)
     await call.answer()
 
 
-# Открыть задачу
-@router.callback_query(F.data.regexp(r"^task_\d+$"))
-async def cb_task_open(call: CallbackQuery):
-    data = call.data  # task_5
-    try:
-        tid = int(data.split("_")[1])
-    except (IndexError, ValueError):
-        await call.answer("Некорректный id задачи", show_alert=True)
+@CALLBACKS.on(cb.BANK_QUESTION_ANSWER)
+async def cb_bank_question_answer(call: CallbackQuery, ref):
+    number, qid = split_bank_ref(ref)
+    content = await bank_snapshot(call, number)
+    if content is None:
         return
 
-    task = next((t for t in TASKS if t["id"] == tid), None)
-    if not task:
+    plans = content.questions.answer_plans(qid)
+    if not plans:
+        await call.answer("Вопрос не найден", show_alert=True)
+        return
+
+    await send_question_answer(call, plans)
+
+
+@CALLBACKS.on(cb.BANK_QUESTION_NEXT)
+async def cb_bank_question_next(call: CallbackQuery, ref):
+    number, current_id = split_bank_ref(ref)
+    content = await bank_snapshot(call, number)
+    if content is None:
+        return
+
+    question = content.questions.next(current_id)
+    if not question:
+        await call.answer("Вопросы не найдены", show_alert=True)
+        return
+
+    await send_question(call, content.questions.plans[question["id"]])
+    await call.answer()
+
+
+@CALLBACKS.on(cb.BANK_TASK_OPEN)
+async def cb_bank_task_open(call: CallbackQuery, ref):
+    number, tid = split_bank_ref(ref)
+    content = await bank_snapshot(call, number)
+    if content is None:
+        return
+
+    plans = content.tasks.plans.get(tid)
+    if not plans:
         await call.answer("Задача не найдена", show_alert=True)
         return
 
-    await send_task(call, task)
+    await send_task(call, plans)
     await call.answer()
 
 
-# Показать решение задачи
-@router.callback_query(F.data.startswith("task_answer_"))
-async def cb_task_answer(call: CallbackQuery):
-    data = call.data  # task_answer_5
-    try:
-        tid = int(data.split("_")[2])
-    except (IndexError, ValueError):
-        await call.answer("Некорректный id задачи", show_alert=True)
+@CALLBACKS.on(cb.BANK_TASK_ANSWER)
+async def cb_bank_task_answer(call: CallbackQuery, ref):
+    number, tid = split_bank_ref(ref)
+    content = await bank_snapshot(call, number)
+    if content is None:
         return
 
-    task = next((t for t in TASKS if t["id"] == tid), None)
-    if not task:
+    plans = content.tasks.answer_plans(tid)
+    if not plans:
         await call.answer("Задача не найдена", show_alert=True)
         return
 
-    await send_task_answer(call, task)
+    await send_task_answer(call, plans)
 
 
-# Следующая задача (пункт 5)
-@router.callback_query(F.data.startswith("task_next_"))
-async def cb_task_next(call: CallbackQuery):
-    data = call.data  # task_next_5
-    try:
-        current_id = int(data.split("_")[2])
-    except (IndexError, ValueError):
-        current_id = None
+@CALLBACKS.on(cb.BANK_TASK_NEXT)
+async def cb_bank_task_next(call: CallbackQuery, ref):
+    number, current_id = split_bank_ref(ref)
+    content = await bank_snapshot(call, number)
+    if content is None:
+        return
 
-    task = get_next_task(current_id)
+    task = content.tasks.next(current_id)
     if not task:
         await call.answer("Задачи не найдены", show_alert=True)
         return
 
-    await send_task(call, task)
+    await send_task(call, content.tasks.plans[task["id"]])
     await call.answer()
 
 
+# Все inline-кнопки: один фильтр, разбор callback_data и переход по таблице
+@router.callback_query(F.data)
+async def cb_dispatch(call: CallbackQuery):
+    await CALLBACKS.dispatch(call)
+
+
 # =========================
 #  РЕГИСТРАЦИЯ РОУТЕРА
 # =========================
 
+# Апдейты одного пользователя обрабатываются по очереди (app/lanes.py)
+USER_LANES = UserLanes()
+
+
 def register_handlers(dp):
+    dp.update.outer_middleware(UserLaneMiddleware(USER_LANES))
     dp.include_router(router)
@@ -0,0 +1,497 @@
+"""
+Оптимизация PNG из data/ (таблицы и рисунки) без потери качества.
+
+Картинки в data/tables — RGBA 8 бит на канал, хотя в них нет прозрачности
+и почти нет цветов. Сборка пересжимает каждую:
+- убирает альфа-канал, если все пиксели непрозрачны;
+- переводит в оттенки серого, если R == G == B;
+- строит палитру (1/2/4/8 бит), если цветов не больше 256;
+- подбирает фильтры строк и сжатие zlib, оставляет самый маленький вариант;
+- выбрасывает служебные чанки (pHYs, тексты), кроме цветового профиля.
+Результат раскодируется обратно и сверяется с исходными пикселями.
+
+Варианты лежат в cache/images/<sha1 исходника>.png, так что одинаковые
+или вернувшиеся к старой версии файлы не пересжимаются. manifest.json
+связывает путь картинки с вариантом; send_photo берёт вариант через
+ImageVariants.path_for(), а если его нет или исходник поменялся —
+отправляет исходный файл.
+
+Сборка:
+    python -m app.images data/tables
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import zlib
+from collections import Counter
+from pathlib import Path
+
+from .file_cache import relative_key
+
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+KEEP_CHUNKS = (b"sRGB", b"gAMA", b"cHRM", b"iCCP")   # влияют на цвет — сохраняем
+
+# байт на пиксель / каналов для цветовых типов PNG
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+
+MANIFEST_NAME = "manifest.json"
+
+
+class PngError(Exception):
+    pass
+
+
+# =========================
+#   ЧТЕНИЕ PNG
+# =========================
+
+def read_chunks(data: bytes) -> list[tuple[bytes, bytes]]:
+    if not data.startswith(PNG_SIGNATURE):
+        raise PngError("не PNG")
+    chunks = []
+    pos = len(PNG_SIGNATURE)
+    while pos + 8 <= len(data):
+        length, kind = struct.unpack(">I4s", data[pos : pos + 8])
+        body = data[pos + 8 : pos + 8 + length]
+        chunks.append((kind, body))
+        pos += 12 + length
+        if kind == b"IEND":
+            break
+    return chunks
+
+
+def _paeth(a: int, b: int, c: int) -> int:
+    p = a + b - c
+    pa = abs(p - a)
+    pb = abs(p - b)
+    pc = abs(p - c)
+    if pa <= pb and pa <= pc:
+        return a
+    if pb <= pc:
+        return b
+    return c
+
+
+def unfilter(raw: bytes, height: int, stride: int, bpp: int) -> list[bytes]:
+    """
+    Сырые данные IDAT -> список строк без байта фильтра.
+    """
+    rows = []
+    prev = bytes(stride)
+    pos = 0
+    for _ in range(height):
+        kind = raw[pos]
+        row = bytearray(raw[pos + 1 : pos + 1 + stride])
+        pos += 1 + stride
+        if kind == 1:
+            for i in range(bpp, stride):
+                row[i] = (row[i] + row[i - bpp]) & 0xFF
+        elif kind == 2:
+            row = bytearray((x + y) & 0xFF for x, y in zip(row, prev))
+        elif kind == 3:
+            for i in range(stride):
+                left = row[i - bpp] if i >= bpp else 0
+                row[i] = (row[i] + ((left + prev[i]) >> 1)) & 0xFF
+        elif kind == 4:
+            for i in range(stride):
+                if i >= bpp:
+                    row[i] = (row[i] + _paeth(row[i - bpp], prev[i], prev[i - bpp])) & 0xFF
+                else:
+                    row[i] = (row[i] + prev[i]) & 0xFF
+        elif kind != 0:
+            raise PngError(f"неизвестный фильтр строки {kind}")
+        prev = bytes(row)
+        rows.append(prev)
+    return rows
+
+
+def decode_rgba(data: bytes) -> tuple[int, int, list[bytes]]:
+    """
+    (ширина, высота, строки RGBA). Поддерживаются неинтерлейсные PNG
+    с 8 битами на канал и палитровые 1/2/4/8 бит — всё, что пишет encode().
+    """
+    chunks = read_chunks(data)
+    width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+    if interlace or color not in CHANNELS or (depth != 8 and color != 3):
+        raise PngError(f"неподдерживаемый PNG: depth={depth} color={color} interlace={interlace}")
+
+    body = {kind: payload for kind, payload in chunks if kind != b"IDAT"}
+    raw = zlib.decompress(b"".join(payload for kind, payload in chunks if kind == b"IDAT"))
+    channels = CHANNELS[color]
+    stride = (width * channels * depth + 7) // 8
+    rows = unfilter(raw, height, stride, max(1, channels * depth // 8))
+
+    if color == 6:
+        return width, height, rows
+    if color == 2:
+        out = []
+        for row in rows:
+            rgba = bytearray(b"\xff" * (width * 4))
+            rgba[0::4], rgba[1::4], rgba[2::4] = row[0::3], row[1::3], row[2::3]
+            out.append(bytes(rgba))
+        return width, height, out
+    if color in (0, 4):
+        out = []
+        for row in rows:
+            gray = row[0::channels]
+            rgba = bytearray(b"\xff" * (width * 4))
+            rgba[0::4] = rgba[1::4] = rgba[2::4] = gray
+            if color == 4:
+                rgba[3::4] = row[1::2]
+            out.append(bytes(rgba))
+        return width, height, out
+
+    palette = body[b"PLTE"]
+    alphas = body.get(b"tRNS", b"")
+    colors = [
+        palette[i * 3 : i * 3 + 3] + bytes((alphas[i] if i < len(alphas) else 255,))
+        for i in range(len(palette) // 3)
+    ]
+    mask = (1 << depth) - 1
+    out = []
+    for row in rows:
+        indexes = []
+        for byte in row:
+            for shift in range(8 - depth, -1, -depth):
+                indexes.append((byte >> shift) & mask)
+        out.append(b"".join(colors[i] for i in indexes[:width]))
+    return width, height, out
+
+
+# =========================
+#   ЗАПИСЬ PNG
+# =========================
+
+def _chunk(kind: bytes, body: bytes) -> bytes:
+    return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+
+def _filter_row(kind: int, row: bytes, prev: bytes, bpp: int) -> bytes:
+    if kind == 0:
+        return row
+    if kind == 2:
+        return bytes((x - y) & 0xFF for x, y in zip(row, prev))
+    out = bytearray(len(row))
+    for i, x in enumerate(row):
+        left = row[i - bpp] if i >= bpp else 0
+        if kind == 1:
+            out[i] = (x - left) & 0xFF
+        elif kind == 3:
+            out[i] = (x - ((left + prev[i]) >> 1)) & 0xFF
+        else:
+            upleft = prev[i - bpp] if i >= bpp else 0
+            out[i] = (x - _paeth(left, prev[i], upleft)) & 0xFF
+    return bytes(out)
+
+
+def _signed_sum(row: bytes) -> int:
+    return sum(x if x < 128 else 256 - x for x in row)
+
+
+def _filtered_streams(rows: list[bytes], bpp: int, adaptive: bool):
+    """
+    Кандидаты данных IDAT: без фильтров, Up и (для truecolor/серого)
+    адаптивный выбор фильтра по минимальной сумме модулей.
+    """
+    yield b"".join(b"\x00" + row for row in rows)
+
+    prev = bytes(len(rows[0])) if rows else b""
+    up = []
+    best = []
+    for row in rows:
+        up_row = _filter_row(2, row, prev, bpp)
+        up.append(b"\x02" + up_row)
+        if adaptive:
+            candidates = [(0, row), (2, up_row)] + [(k, _filter_row(k, row, prev, bpp)) for k in (1, 3, 4)]
+            kind, data = min(candidates, key=lambda c: _signed_sum(c[1]))
+            best.append(bytes((kind,)) + data)
+        prev = row
+    yield b"".join(up)
+    if adaptive:
+        yield b"".join(best)
+
+
+def _compress(stream: bytes) -> bytes:
+    best = None
+    for strategy in (zlib.Z_DEFAULT_STRATEGY, zlib.Z_FILTERED):
+        packer = zlib.compressobj(9, zlib.DEFLATED, 15, 9, strategy)
+        data = packer.compress(stream) + packer.flush()
+        if best is None or len(data) < len(best):
+            best = data
+    return best
+
+
+def encode(width: int, height: int, rgba_rows: list[bytes], extra_chunks=()) -> bytes:
+    """
+    Минимальный PNG для строк RGBA: самый узкий цветовой тип без потерь
+    и лучший из нескольких вариантов фильтрации.
+    """
+    opaque = all(row[3::4].count(255) == width for row in rgba_rows)
+    gray = all(row[0::4] == row[1::4] == row[2::4] for row in rgba_rows)
+
+    counts = Counter()
+    for row in rgba_rows:
+        counts.update(row[i : i + 4] for i in range(0, len(row), 4))
+        if len(counts) > 256:
+            break
+
+    palette_chunks = []
+    if len(counts) <= 256:
+        # палитра: сначала цвета с прозрачностью (короче tRNS), потом по частоте
+        colors = sorted(counts, key=lambda c: (c[3] == 255, -counts[c]))
+        index = {color: i for i, color in enumerate(colors)}
+        depth = next(d for d in (1, 2, 4, 8) if len(colors) <= 1 << d)
+        per_byte = 8 // depth
+        rows = []
+        for row in rgba_rows:
+            indexes = [index[row[i : i + 4]] for i in range(0, len(row), 4)]
+            if depth == 8:
+                rows.append(bytes(indexes))
+                continue
+            packed = bytearray((width + per_byte - 1) // per_byte)
+            for i, value in enumerate(indexes):
+                packed[i // per_byte] |= value << (8 - depth * (i % per_byte + 1))
+            rows.append(bytes(packed))
+        color, bpp = 3, 1
+        palette_chunks.append(_chunk(b"PLTE", b"".join(c[:3] for c in colors)))
+        alphas = bytes(c[3] for c in colors if c[3] != 255)
+        if alphas:
+            palette_chunks.append(_chunk(b"tRNS", alphas))
+    elif gray:
+        depth = 8
+        if opaque:
+            color, bpp = 0, 1
+            rows = [row[0::4] for row in rgba_rows]
+        else:
+            color, bpp = 4, 2
+            rows = []
+            for row in rgba_rows:
+                out = bytearray(width * 2)
+                out[0::2], out[1::2] = row[0::4], row[3::4]
+                rows.append(bytes(out))
+    elif opaque:
+        depth = 8
+        color, bpp = 2, 3
+        rows = []
+        for row in rgba_rows:
+            out = bytearray(width * 3)
+            out[0::3], out[1::3], out[2::3] = row[0::4], row[1::4], row[2::4]
+            rows.append(bytes(out))
+    else:
+        depth, color, bpp = 8, 6, 4
+        rows = rgba_rows
+
+    idat = min(
+        (_compress(stream) for stream in _filtered_streams(rows, bpp, adaptive=color != 3)),
+        key=len,
+    )
+    header = struct.pack(">IIBBBBB", width, height, depth, color, 0, 0, 0)
+    return b"".join(
+        [PNG_SIGNATURE, _chunk(b"IHDR", header), *extra_chunks, *palette_chunks, _chunk(b"IDAT", idat), _chunk(b"IEND", b"")]
+    )
+
+
+def optimize_png(data: bytes) -> bytes | None:
+    """
+    Пересжатый PNG с теми же пикселями или None, если меньше не получилось
+    (или формат не поддерживается).
+    """
+    try:
+        width, height, rows = decode_rgba(data)
+    except (PngError, zlib.error, struct.error, IndexError, KeyError):
+        return None
+
+    chunks = dict(read_chunks(data))
+    if b"sRGB" in chunks:
+        keep = [b"sRGB"]         # sRGB перекрывает gAMA/cHRM
+    else:
+        keep = [kind for kind in KEEP_CHUNKS if kind in chunks]
+    extra = [_chunk(kind, chunks[kind]) for kind in keep]
+
+    optimized = encode(width, height, rows, extra)
+    if len(optimized) >= len(data):
+        return None
+    if decode_rgba(optimized)[2] != rows:
+        raise PngError("оптимизированный PNG не совпадает с исходным")
+    return optimized
+
+
+# =========================
+#   ВАРИАНТЫ ДЛЯ ОТПРАВКИ
+# =========================
+
+class ImageVariants:
+    """
+    Манифест оптимизированных вариантов картинок:
+    { "tables/table_01.png": {"sha1", "mtime_ns", "size", "variant", "variant_size"} }.
+    path_for() — горячий путь, без чтения файла: сверяются только mtime и размер.
+    """
+
+    def __init__(self, cache_dir: Path, base_dir: Path):
+        self.cache_dir = cache_dir
+        self.base_dir = base_dir.resolve()
+        self.manifest_path = cache_dir / MANIFEST_NAME
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        # None — манифест ещё не читался (см. _loaded)
+        self._entries: dict[str, dict] | None = None
+
+    def path_for(self, file_path: Path) -> Path:
+        """
+        Что загружать в Телеграм вместо file_path.
+        """
+        entry = self._loaded().get(self._key(file_path))
+        if entry is None or not entry.get("variant"):
+            self.misses += 1
+            return file_path
+        try:
+            st = file_path.stat()
+        except OSError:
+            self.misses += 1
+            return file_path
+        if entry["mtime_ns"] != st.st_mtime_ns or entry["size"] != st.st_size:
+            # исходник поменялся после сборки — шлём его, пока не пересоберут
+            self.stale += 1
+            return file_path
+        variant = self.cache_dir / entry["variant"]
+        if not variant.exists():
+            self.misses += 1
+            return file_path
+        self.hits += 1
+        return variant
+
+    def build(self, paths: list[Path]) -> list[tuple[str, int, int]]:
+        """
+        Оптимизирует картинки (с кэшем по sha1 содержимого).
+        Возвращает [(ключ, исходный размер, размер варианта)].
+        """
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._loaded()
+        report = []
+        for file_path in paths:
+            key = self._key(file_path)
+            st = file_path.stat()
+            entry = self._entries.get(key)
+            if (
+                entry is not None
+                and entry["mtime_ns"] == st.st_mtime_ns
+                and entry["size"] == st.st_size
+                and (not entry["variant"] or (self.cache_dir / entry["variant"]).exists())
+            ):
+                report.append((key, entry["size"], entry["variant_size"] or entry["size"]))
+                continue
+
+            data = file_path.read_bytes()
+            sha1 = hashlib.sha1(data).hexdigest()
+            name = f"{sha1}.png"
+            variant = self.cache_dir / name
+            if variant.exists():
+                variant_size = variant.stat().st_size
+            else:
+                optimized = optimize_png(data)
+                if optimized is None:
+                    name, variant_size = None, None
+                else:
+                    tmp_path = variant.with_suffix(".tmp")
+                    tmp_path.write_bytes(optimized)
+                    os.replace(tmp_path, variant)
+                    variant_size = len(optimized)
+
+            self._entries[key] = {
+                "sha1": sha1,
+                "mtime_ns": st.st_mtime_ns,
+                "size": st.st_size,
+                "variant": name,
+                "variant_size": variant_size,
+            }
+            report.append((key, st.st_size, variant_size or st.st_size))
+
+        self._save()
+        return report
+
+    def stats(self) -> dict:
+        return {
+            "variants": sum(1 for e in (self._entries or {}).values() if e.get("variant")),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+        }
+
+    # ---------- ВНУТРЕННЕЕ ----------
+
+    def _key(self, file_path: Path) -> str:
+        return relative_key(file_path, self.base_dir)
+
+    def _loaded(self) -> dict[str, dict]:
+        # манифест читается при первой отправке картинки, а не при импорте handlers
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _load(self) -> dict[str, dict]:
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with self.manifest_path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            print("⚠️ Манифест картинок повреждён, шлём исходники:", self.manifest_path)
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    def _save(self):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(".tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def format_report(report: list[tuple[str, int, int]]) -> str:
+    lines = []
+    for key, size, variant_size in report:
+        saved = size - variant_size
+        lines.append(f"   {key}: {size} → {variant_size} байт (−{saved * 100 // size if size else 0}%)")
+    total = sum(size for _, size, _ in report)
+    total_variant = sum(variant_size for _, _, variant_size in report)
+    lines.append(
+        f"🖼 Итого: {total} → {total_variant} байт, сэкономлено {total - total_variant}"
+        f" ({(total - total_variant) * 100 // total if total else 0}%)"
+    )
+    return "\n".join(lines)
+
+
+# =========================
+#   CLI
+# =========================
+
+def main(argv: list[str]) -> int:
+    from .content import BASE_DIR, DATA_DIR
+
+    targets = [Path(arg) for arg in argv] or [DATA_DIR / "tables"]
+    paths = []
+    for target in targets:
+        if target.is_dir():
+            paths.extend(sorted(target.rglob("*.png")))
+        elif target.exists():
+            paths.append(target)
+        else:
+            print(f"❌ {target} не найден")
+            return 1
+
+    variants = ImageVariants(BASE_DIR / "cache" / "images", base_dir=DATA_DIR)
+    try:
+        report = variants.build(paths)
+    except PngError as e:
+        print(f"❌ {e}")
+        return 1
+    print(format_report(report))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,110 @@
+"""
+Inline-режим: @bot такт линии в любом чате — карточки вопросов и задач.
+
+Результаты берутся из поискового индекса (app/search.py). Готовые списки
+InlineQueryResultArticle кэшируются в LRU по нормализованному запросу
+(те же термы, что видит поиск), поэтому популярные запросы не ищутся
+и не собираются заново. Отдаются страницами по INLINE_PAGE_SIZE через
+next_offset; cache_time просит Телеграм кэшировать ответ у себя.
+"""
+from collections import OrderedDict
+
+from aiogram.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
+
+from .content import ContentSnapshot
+from .render import MAX_TG_MESSAGE
+from .search import QUESTION, SearchIndex, tokenize
+
+
+INLINE_PAGE_SIZE = 50       # больше Телеграм в одном ответе не принимает
+INLINE_MAX_RESULTS = 200    # сколько результатов запроса вообще листаем
+INLINE_CACHE_SIZE = 1024    # запросов в LRU
+INLINE_CACHE_TIME = 300     # секунд кэша на стороне Телеграма
+
+
+def build_article(content: ContentSnapshot, kind: str, entry_id: int, bot_username: str | None):
+    if kind == QUESTION:
+        plans = content.questions.plans.get(entry_id)
+        title = f"Вопрос {entry_id}"
+        payload = f"question_{entry_id}"
+    else:
+        plans = content.tasks.plans.get(entry_id)
+        title = f"Задача {entry_id}"
+        payload = f"task_{entry_id}"
+    if plans is None:
+        return None
+
+    text = f"{title}:\n\n{plans.text}" if plans.text else f"{title}:"
+    if plans.images:
+        text += "\n\n🖼 Таблицы и рисунки — в боте."
+    if len(text) > MAX_TG_MESSAGE:
+        text = text[: MAX_TG_MESSAGE - 1] + "…"
+
+    keyboard = None
+    if bot_username:
+        keyboard = InlineKeyboardMarkup(
+            inline_keyboard=[
+                [InlineKeyboardButton(text="Открыть в боте", url=f"https://t.me/{bot_username}?start={payload}")]
+            ]
+        )
+
+    return InlineQueryResultArticle(
+        id=f"{kind}{entry_id}",
+        title=title,
+        description=" ".join(plans.text.split())[:120],
+        input_message_content=InputTextMessageContent(message_text=text),
+        reply_markup=keyboard,
+    )
+
+
+class InlineResultCache:
+    """
+    LRU: (версия контента, имя бота, нормализованный запрос) -> кортеж статей.
+    После перезагрузки контента старые ключи просто вытесняются.
+    """
+
+    def __init__(self, index: SearchIndex, max_size: int = INLINE_CACHE_SIZE):
+        self.index = index
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._cache: OrderedDict[tuple, tuple] = OrderedDict()
+
+    def results(self, content: ContentSnapshot, query: str, bot_username: str | None) -> tuple:
+        terms = tuple(sorted(set(tokenize(query))))
+        if not terms:
+            return ()
+
+        key = (content.version, bot_username, terms)
+        results = self._cache.get(key)
+        if results is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return results
+
+        self.misses += 1
+        hits = self.index.search(query, limit=INLINE_MAX_RESULTS)
+        articles = (build_article(content, hit.kind, hit.id, bot_username) for hit in hits)
+        results = tuple(article for article in articles if article is not None)
+
+        self._cache[key] = results
+        if len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return results
+
+    def page(self, content: ContentSnapshot, query: str, offset: str, bot_username: str | None):
+        """
+        (статьи страницы, next_offset) для ответа на inline-запрос.
+        """
+        start = int(offset) if offset.isdigit() else 0
+        results = self.results(content, query, bot_username)
+        end = start + INLINE_PAGE_SIZE
+        return list(results[start:end]), (str(end) if end < len(results) else "")
+
+    def stats(self) -> dict:
+        return {"queries": len(self._cache), "hits": self.hits, "misses": self.misses}
@@ -1,3 +1,11 @@
+import json
+import weakref
+from bisect import bisect_left
+from collections import OrderedDict
+from functools import wraps
+
+from aiohttp import FormData
+from aiogram.client.session.aiohttp import AiohttpSession
 from aiogram.types import (
     InlineKeyboardMarkup,
     InlineKeyboardButton,
@@ -5,6 +13,11 @@ from aiogram.types import (
     KeyboardButton,
 )
 
+from . import callbacks as cb
+from .callbacks import bank_ref, encode
+from .quiz import POOL_MIXED, POOL_QUESTIONS, POOL_TASKS
+from .search import QUESTION
+
 
 # ---------- ВСПОМОГАТЕЛЬНАЯ ФУНКЦИЯ ДЛЯ РЯДОВ ----------
 
@@ -24,8 +37,286 @@ def _rows_from_buttons(buttons, per_row: int = 2):
     return rows
 
 
+# ---------- РЕЕСТР КЛАВИАТУР ----------
+
+class KeyboardRegistry:
+    """
+    Кэш готовых клавиатур, чтобы на каждый апдейт не собирать
+    pydantic-модели заново:
+    - static(name, build) — статические меню, строятся один раз и живут вечно;
+    - get(key, build)     — клавиатуры под конкретный id, LRU на max_cached штук;
+    - prepared(build)     — клавиатуры, которые держит кто-то другой (планы
+      отправки записей, app/render.py): в LRU не попадают и не вытесняются.
+
+    Для каждой такой клавиатуры сразу считается JSON (serialized),
+    его отдаёт в запрос PreparedMarkupSession вместо model_dump + json.dumps.
+    JSON живёт, пока жива сама клавиатура (weakref.finalize), а не пока она
+    в LRU: вытеснение из LRU не отнимает JSON у планов, которые её держат.
+
+    Клавиатуры общие для всех апдейтов — менять их после получения нельзя.
+    """
+
+    def __init__(self, max_cached: int = 4096):
+        self.max_cached = max_cached
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        self._static: dict[str, object] = {}
+        self._cached: OrderedDict[tuple, object] = OrderedDict()
+        # id(клавиатуры) -> (weakref на клавиатуру, JSON); запись убирает finalize
+        self._json: dict[int, tuple[weakref.ref, str]] = {}
+
+    def static(self, name: str, build):
+        markup = self._static.get(name)
+        if markup is None:
+            self.misses += 1
+            markup = self._static[name] = build()
+            self._prepare(markup)
+        else:
+            self.hits += 1
+        return markup
+
+    def get(self, key: tuple, build):
+        markup = self._cached.get(key)
+        if markup is not None:
+            self.hits += 1
+            self._cached.move_to_end(key)
+            return markup
+
+        self.misses += 1
+        markup = self._cached[key] = build()
+        self._prepare(markup)
+        while len(self._cached) > self.max_cached:
+            self._cached.popitem(last=False)
+            self.evicted += 1
+        return markup
+
+    def prepared(self, build):
+        markup = build()
+        self._prepare(markup)
+        return markup
+
+    def serialized(self, markup) -> str | None:
+        """
+        Готовый JSON клавиатуры, если она из реестра, иначе None.
+        """
+        if markup is None:
+            return None
+        entry = self._json.get(id(markup))
+        if entry is None or entry[0]() is not markup:
+            return None
+        return entry[1]
+
+    def stats(self) -> dict:
+        return {
+            "static": len(self._static),
+            "cached": len(self._cached),
+            "serialized": len(self._json),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evicted": self.evicted,
+        }
+
+    def _prepare(self, markup):
+        # то же, что делает aiogram при отправке: None-поля выбрасываются
+        key = id(markup)
+        self._json[key] = (weakref.ref(markup), json.dumps(markup.model_dump(warnings=False, exclude_none=True)))
+        weakref.finalize(markup, self._forget, key, self._json[key][0])
+
+    def _forget(self, key: int, ref: weakref.ref):
+        entry = self._json.get(key)
+        if entry is not None and entry[0] is ref:
+            del self._json[key]
+
+
+KEYBOARDS = KeyboardRegistry()
+
+
+def static_keyboard(build):
+    """
+    Декоратор: клавиатура без аргументов строится один раз.
+    """
+    @wraps(build)
+    def wrapper():
+        return KEYBOARDS.static(build.__name__, build)
+
+    return wrapper
+
+
+def cached_keyboard(build):
+    """
+    Декоратор: клавиатура кэшируется по аргументам (LRU в KEYBOARDS).
+    """
+    @wraps(build)
+    def wrapper(*args, **kwargs):
+        key = (build.__name__, args, tuple(sorted(kwargs.items())))
+        return KEYBOARDS.get(key, lambda: build(*args, **kwargs))
+
+    return wrapper
+
+
+def prepared_keyboard(build):
+    """
+    Декоратор: клавиатура строится на каждый вызов (без LRU) и сразу
+    сериализуется. Для клавиатур, которые хранятся в планах записей.
+    """
+    @wraps(build)
+    def wrapper(*args, **kwargs):
+        return KEYBOARDS.prepared(lambda: build(*args, **kwargs))
+
+    return wrapper
+
+
+class PreparedMarkupSession(AiohttpSession):
+    """
+    AiohttpSession, которая кладёт в запрос заранее посчитанный JSON
+    клавиатуры из реестра. Остальные поля — как в AiohttpSession.
+    """
+
+    def __init__(self, registry: KeyboardRegistry | None = None, **kwargs):
+        super().__init__(**kwargs)
+        self.registry = registry or KEYBOARDS
+
+    def build_form_data(self, bot, method) -> FormData:
+        prepared = self.registry.serialized(getattr(method, "reply_markup", None))
+        if prepared is None:
+            return super().build_form_data(bot, method)
+
+        form = FormData(quote_fields=False)
+        files = {}
+        for key, value in method.model_dump(warnings=False, exclude={"reply_markup"}).items():
+            value = self.prepare_value(value, bot=bot, files=files)
+            if not value:
+                continue
+            form.add_field(key, value)
+        form.add_field("reply_markup", prepared)
+        for key, value in files.items():
+            form.add_field(key, value.read(bot), filename=value.filename or key)
+        return form
+
+
+# ---------- ПОСТРАНИЧНЫЕ СПИСКИ ----------
+
+LIST_PAGE_SIZE = 20     # кнопок с id на странице (10 рядов по 2)
+JUMP_PER_ROW = 6        # номеров страниц в ряду на экране «перейти к странице»
+MAX_JUMP_BUTTONS = 60   # больше номеров не рисуем — показываем каждую k-ю страницу
+
+
+class PagedList:
+    """
+    Список вопросов/задач, разбитый на страницы по LIST_PAGE_SIZE.
+    ids — по возрастанию (ContentStore.ids): страница записи ищется бинпоиском.
+
+    Разметка каждой страницы и экрана выбора страницы строится один раз
+    при первом запросе и дальше отдаётся из кэша. Объект живёт столько же,
+    сколько версия контента (см. list_pages в handlers.py).
+
+    Колбэки (коды из app/callbacks.py): open_action + id — открыть запись,
+    page_action + n — страница n (с нуля), jump_action — выбор страницы,
+    back_action (+ back_arg) — назад в меню.
+    Для банков из data/<предмет>/ ref = bank_ref(номер, 0) прибавляется
+    к id и номеру страницы, чтобы кнопка знала, из какого она банка.
+    """
+
+    def __init__(
+        self,
+        ids,
+        title: str,
+        label: str,
+        open_action: str,
+        page_action: str,
+        jump_action: str,
+        back_action: str,
+        page_size: int = LIST_PAGE_SIZE,
+        ref: int = 0,
+        back_arg: int | None = None,
+    ):
+        self.ids = tuple(ids)
+        self.title = title
+        self.label = label
+        self.open_action = open_action
+        self.page_action = page_action
+        self.jump_action = jump_action
+        self.back_action = back_action
+        self.page_size = page_size
+        self.ref = ref
+        self.back_arg = back_arg
+        self.pages = max(1, -(-len(self.ids) // page_size))
+        self._pages: dict[int, InlineKeyboardMarkup] = {}
+        self._jump: InlineKeyboardMarkup | None = None
+
+    def clamp(self, page: int) -> int:
+        return min(max(page, 0), self.pages - 1)
+
+    def page_of(self, entry_id: int) -> int:
+        pos = bisect_left(self.ids, entry_id)
+        if pos < len(self.ids) and self.ids[pos] == entry_id:
+            return pos // self.page_size
+        return 0
+
+    def caption(self, page: int) -> str:
+        if self.pages == 1:
+            return f"{self.title}:"
+        return f"{self.title} (стр. {page + 1} из {self.pages}):"
+
+    def page(self, page: int) -> InlineKeyboardMarkup:
+        page = self.clamp(page)
+        markup = self._pages.get(page)
+        if markup is None:
+            markup = self._pages[page] = self._build_page(page)
+        return markup
+
+    def jump(self) -> InlineKeyboardMarkup:
+        if self._jump is None:
+            self._jump = self._build_jump()
+        return self._jump
+
+    def _build_page(self, page: int) -> InlineKeyboardMarkup:
+        start = page * self.page_size
+        buttons = [
+            InlineKeyboardButton(text=f"{self.label} {entry_id}", callback_data=encode(self.open_action, self.ref + entry_id))
+            for entry_id in self.ids[start : start + self.page_size]
+        ]
+        rows = _rows_from_buttons(buttons, per_row=2)
+
+        if self.pages > 1:
+            nav = []
+            if page > 0:
+                nav.append(InlineKeyboardButton(text="⏮", callback_data=self._page_data(0)))
+                nav.append(InlineKeyboardButton(text="◀️", callback_data=self._page_data(page - 1)))
+            nav.append(
+                InlineKeyboardButton(
+                    text=f"{page + 1}/{self.pages}", callback_data=encode(self.jump_action, self.ref or None)
+                )
+            )
+            if page < self.pages - 1:
+                nav.append(InlineKeyboardButton(text="▶️", callback_data=self._page_data(page + 1)))
+                nav.append(InlineKeyboardButton(text="⏭", callback_data=self._page_data(self.pages - 1)))
+            rows.append(nav)
+
+        rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=encode(self.back_action, self.back_arg))])
+        return InlineKeyboardMarkup(inline_keyboard=rows)
+
+    def _build_jump(self) -> InlineKeyboardMarkup:
+        step = max(1, -(-self.pages // MAX_JUMP_BUTTONS))
+        numbers = list(range(0, self.pages, step))
+        if numbers[-1] != self.pages - 1:
+            numbers.append(self.pages - 1)
+        buttons = [
+            InlineKeyboardButton(text=str(page + 1), callback_data=self._page_data(page))
+            for page in numbers
+        ]
+        rows = _rows_from_buttons(buttons, per_row=JUMP_PER_ROW)
+        rows.append([InlineKeyboardButton(text="⬅️ К списку", callback_data=self._page_data(0))])
+        return InlineKeyboardMarkup(inline_keyboard=rows)
+
+    def _page_data(self, page: int) -> str:
+        return encode(self.page_action, self.ref + page)
+
+
 # ---------- REPLY-КЛАВИАТУРА "МЕНЮ" (слева снизу) ----------
 
+@static_keyboard
 def main_menu_reply_keyboard():
     """
     Постоянная кнопка снизу слева: 'Меню'
@@ -41,63 +332,70 @@ def main_menu_reply_keyboard():
 
 # ---------- START MENU (INLINE) ----------
 
-def start_keyboard():
-    return InlineKeyboardMarkup(
-        inline_keyboard=[
-            [InlineKeyboardButton(text="🧠 Менеджмент", callback_data="section_management")],
-            [InlineKeyboardButton(text="📁 Управление персоналом", callback_data="section_op")],
-        ]
-    )
+@cached_keyboard
+def start_keyboard(banks: tuple[tuple[int, str], ...] = ()):
+    """
+    banks: (номер, название) банков из data/<предмет>/ (BankRegistry.menu()).
+    Пока банков нет — прежняя кнопка «Управление персоналом».
+    """
+    rows = [[InlineKeyboardButton(text="🧠 Менеджмент", callback_data=encode(cb.MANAGEMENT_MENU))]]
+    if banks:
+        for number, title in banks:
+            rows.append([InlineKeyboardButton(text=f"📁 {title}", callback_data=encode(cb.BANK_MENU, number))])
+    else:
+        rows.append([InlineKeyboardButton(text="📁 Управление персоналом", callback_data=encode(cb.SECTION_OP))])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
 
 # ---------- MANAGEMENT MENU ----------
 
+@static_keyboard
 def management_keyboard():
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="❓ Вопросы (теория)", callback_data="mgmt_questions")],
-            [InlineKeyboardButton(text="📊 Задачи (практика)", callback_data="mgmt_tasks")],
+            [InlineKeyboardButton(text="❓ Вопросы (теория)", callback_data=encode(cb.QUESTIONS_MENU))],
+            [InlineKeyboardButton(text="📊 Задачи (практика)", callback_data=encode(cb.TASKS_MENU))],
+            [InlineKeyboardButton(text="🧪 Общий тест (вопросы + задачи)", callback_data=encode(cb.QUIZ_START, POOL_MIXED))],
         ]
     )
 
 
 # ---------- QUESTIONS MENU ----------
 
+@static_keyboard
 def questions_menu_keyboard():
     """
     Меню раздела вопросов:
     - список вопросов
-    - тест на 5 вопросов (оценка знаний)
+    - тест по вопросам (оценка знаний)
+    - интервальное повторение
     """
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="📋 Список вопросов", callback_data="questions_list")],
-            [InlineKeyboardButton(text="🧪 Оценка знаний (5 вопросов)", callback_data="quiz_start")],
-            [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_management")],
+            [InlineKeyboardButton(text="📋 Список вопросов", callback_data=encode(cb.QUESTIONS_PAGE, 0))],
+            [InlineKeyboardButton(text="🧪 Оценка знаний", callback_data=encode(cb.QUIZ_START, POOL_QUESTIONS))],
+            [InlineKeyboardButton(text="🔁 Повторение по расписанию", callback_data=encode(cb.REVIEW_NEXT))],
+            [InlineKeyboardButton(text="⬅️ Назад", callback_data=encode(cb.MANAGEMENT_MENU))],
         ]
     )
 
 
-def questions_list_keyboard(questions: list):
+def questions_list_pages(ids) -> PagedList:
     """
-    questions: список словарей вида {"id": 1, "text": "..."}
+    ids: id вопросов по возрастанию (в этом порядке и показываются).
     """
-    buttons = [
-        InlineKeyboardButton(
-            text=f"Вопрос {q['id']}",
-            callback_data=f"q_open_{q['id']}"
-        )
-        for q in questions
-    ]
-
-    rows = _rows_from_buttons(buttons, per_row=2)
-    rows.append(
-        [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_questions_menu")]
+    return PagedList(
+        ids,
+        title="Список вопросов",
+        label="Вопрос",
+        open_action=cb.QUESTION_OPEN,
+        page_action=cb.QUESTIONS_PAGE,
+        jump_action=cb.QUESTIONS_JUMP,
+        back_action=cb.QUESTIONS_MENU,
     )
 
-    return InlineKeyboardMarkup(inline_keyboard=rows)
-
 
+@prepared_keyboard
 def question_actions_keyboard(question_id: int, show_answer_button: bool = True):
     """
     Клавиатура под вопросом:
@@ -108,14 +406,14 @@ def question_actions_keyboard(question_id: int, show_answer_button: bool = True)
 
     if show_answer_button:
         rows.append(
-            [InlineKeyboardButton(text="✅ Показать ответ", callback_data=f"q_answer_{question_id}")]
+            [InlineKeyboardButton(text="✅ Показать ответ", callback_data=encode(cb.QUESTION_ANSWER, question_id))]
         )
 
     rows.append(
-        [InlineKeyboardButton(text="➡️ Следующий вопрос", callback_data=f"q_next_{question_id}")]
+        [InlineKeyboardButton(text="➡️ Следующий вопрос", callback_data=encode(cb.QUESTION_NEXT, question_id))]
     )
     rows.append(
-        [InlineKeyboardButton(text="⬅️ К списку вопросов", callback_data="questions_list")]
+        [InlineKeyboardButton(text="⬅️ К списку вопросов", callback_data=encode(cb.QUESTIONS_BACK, question_id))]
     )
 
     return InlineKeyboardMarkup(inline_keyboard=rows)
@@ -123,40 +421,39 @@ def question_actions_keyboard(question_id: int, show_answer_button: bool = True)
 
 # ---------- TASKS MENU ----------
 
+@static_keyboard
 def tasks_menu_keyboard():
     """
     Меню раздела задач:
     - список задач
+    - тест по задачам
     (случайная задача убрана по твоему пункту 4)
     """
     return InlineKeyboardMarkup(
         inline_keyboard=[
-            [InlineKeyboardButton(text="📋 Список задач", callback_data="tasks_list")],
-            [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_to_management")],
+            [InlineKeyboardButton(text="📋 Список задач", callback_data=encode(cb.TASKS_PAGE, 0))],
+            [InlineKeyboardButton(text="🧪 Тест по задачам", callback_data=encode(cb.QUIZ_START, POOL_TASKS))],
+            [InlineKeyboardButton(text="⬅️ Назад", callback_data=encode(cb.MANAGEMENT_MENU))],
         ]
     )
 
 
-def tasks_list_keyboard(tasks: list):
+def tasks_list_pages(ids) -> PagedList:
     """
-    tasks: список словарей вида {"id": 1, "text": "..."}
+    ids: id задач по возрастанию (в этом порядке и показываются).
     """
-    buttons = [
-        InlineKeyboardButton(
-            text=f"Задача {t['id']}",
-            callback_data=f"task_{t['id']}"
-        )
-        for t in tasks
-    ]
-
-    rows = _rows_from_buttons(buttons, per_row=2)
-    rows.append(
-        [InlineKeyboardButton(text="⬅️ Назад", callback_data="back_tasks_menu")]
+    return PagedList(
+        ids,
+        title="Список задач",
+        label="Задача",
+        open_action=cb.TASK_OPEN,
+        page_action=cb.TASKS_PAGE,
+        jump_action=cb.TASKS_JUMP,
+        back_action=cb.TASKS_MENU,
     )
 
-    return InlineKeyboardMarkup(inline_keyboard=rows)
-
 
+@prepared_keyboard
 def task_actions_keyboard(task_id: int, show_answer_button: bool = True):
     """
     Клавиатура под задачей:
@@ -168,14 +465,165 @@ def task_actions_keyboard(task_id: int, show_answer_button: bool = True):
 
     if show_answer_button:
         rows.append(
-            [InlineKeyboardButton(text="✅ Показать решение", callback_data=f"task_answer_{task_id}")]
+            [InlineKeyboardButton(text="✅ Показать решение", callback_data=encode(cb.TASK_ANSWER, task_id))]
         )
 
     rows.append(
-        [InlineKeyboardButton(text="➡️ Следующая задача", callback_data=f"task_next_{task_id}")]
+        [InlineKeyboardButton(text="➡️ Следующая задача", callback_data=encode(cb.TASK_NEXT, task_id))]
+    )
+    rows.append(
+        [InlineKeyboardButton(text="⬅️ К списку задач", callback_data=encode(cb.TASKS_BACK, task_id))]
+    )
+
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+# ---------- БАНКИ data/<предмет>/ ----------
+
+@cached_keyboard
+def bank_menu_keyboard(number: int, has_questions: bool, has_tasks: bool):
+    """
+    Меню банка: списки вопросов и задач (только непустые) и возврат в главное меню.
+    """
+    rows = []
+    if has_questions:
+        rows.append(
+            [InlineKeyboardButton(text="📋 Список вопросов", callback_data=encode(cb.BANK_QUESTIONS_PAGE, bank_ref(number)))]
+        )
+    if has_tasks:
+        rows.append(
+            [InlineKeyboardButton(text="📋 Список задач", callback_data=encode(cb.BANK_TASKS_PAGE, bank_ref(number)))]
+        )
+    rows.append([InlineKeyboardButton(text="⬅️ Назад", callback_data=encode(cb.START_MENU))])
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def bank_list_pages(number: int, kind: str, ids) -> PagedList:
+    """
+    Список вопросов (kind="questions") или задач банка number.
+    """
+    if kind == "questions":
+        title, label = "Список вопросов", "Вопрос"
+        actions = (cb.BANK_QUESTION_OPEN, cb.BANK_QUESTIONS_PAGE, cb.BANK_QUESTIONS_JUMP)
+    else:
+        title, label = "Список задач", "Задача"
+        actions = (cb.BANK_TASK_OPEN, cb.BANK_TASKS_PAGE, cb.BANK_TASKS_JUMP)
+    open_action, page_action, jump_action = actions
+    return PagedList(
+        ids,
+        title=title,
+        label=label,
+        open_action=open_action,
+        page_action=page_action,
+        jump_action=jump_action,
+        back_action=cb.BANK_MENU,
+        ref=bank_ref(number),
+        back_arg=number,
     )
+
+
+@prepared_keyboard
+def bank_question_actions_keyboard(number: int, question_id: int, show_answer_button: bool = True):
+    """
+    Как question_actions_keyboard, но кнопки ведут в банк number.
+    """
+    ref = bank_ref(number, question_id)
+    rows = []
+    if show_answer_button:
+        rows.append([InlineKeyboardButton(text="✅ Показать ответ", callback_data=encode(cb.BANK_QUESTION_ANSWER, ref))])
+    rows.append([InlineKeyboardButton(text="➡️ Следующий вопрос", callback_data=encode(cb.BANK_QUESTION_NEXT, ref))])
     rows.append(
-        [InlineKeyboardButton(text="⬅️ К списку задач", callback_data="tasks_list")]
+        [InlineKeyboardButton(text="⬅️ К списку вопросов", callback_data=encode(cb.BANK_QUESTIONS_BACK, ref))]
     )
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
 
+@prepared_keyboard
+def bank_task_actions_keyboard(number: int, task_id: int, show_answer_button: bool = True):
+    """
+    Как task_actions_keyboard, но кнопки ведут в банк number.
+    """
+    ref = bank_ref(number, task_id)
+    rows = []
+    if show_answer_button:
+        rows.append([InlineKeyboardButton(text="✅ Показать решение", callback_data=encode(cb.BANK_TASK_ANSWER, ref))])
+    rows.append([InlineKeyboardButton(text="➡️ Следующая задача", callback_data=encode(cb.BANK_TASK_NEXT, ref))])
+    rows.append(
+        [InlineKeyboardButton(text="⬅️ К списку задач", callback_data=encode(cb.BANK_TASKS_BACK, ref))]
+    )
     return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+# ---------- ПОИСК ----------
+
+def search_results_keyboard(hits):
+    """
+    hits: список app.search.Hit — по кнопке «открыть» на каждую найденную запись.
+    Клавиатура своя на каждый запрос, поэтому не кэшируется.
+    """
+    buttons = [
+        InlineKeyboardButton(
+            text=f"{'Вопрос' if hit.kind == QUESTION else 'Задача'} {hit.id}",
+            callback_data=encode(cb.QUESTION_OPEN if hit.kind == QUESTION else cb.TASK_OPEN, hit.id),
+        )
+        for hit in hits
+    ]
+    return InlineKeyboardMarkup(inline_keyboard=_rows_from_buttons(buttons, per_row=2))
+
+
+# ---------- ТЕСТ ЗНАНИЙ ----------
+
+@cached_keyboard
+def quiz_question_keyboard(item: int):
+    """
+    Под тестовым вопросом: [Показать ответ] + [Завершить тест]
+    item — элемент теста (id вопроса или -id задачи, см. app/quiz.py)
+    """
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✅ Показать ответ", callback_data=encode(cb.QUIZ_SHOW, item))],
+            [InlineKeyboardButton(text="❌ Завершить тест", callback_data=encode(cb.QUIZ_CANCEL))],
+        ]
+    )
+
+
+@cached_keyboard
+def quiz_grade_keyboard(position: int | None = None):
+    """
+    Под ответом в тесте: самооценка + [Завершить тест]
+    position — номер вопроса в тесте: оценка засчитывается один раз
+    """
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Я ответил правильно", callback_data=encode(cb.QUIZ_RIGHT, position)),
+                InlineKeyboardButton(text="❌ Я ответил неправильно", callback_data=encode(cb.QUIZ_WRONG, position)),
+            ],
+            [InlineKeyboardButton(text="❌ Завершить тест", callback_data=encode(cb.QUIZ_CANCEL))],
+        ]
+    )
+
+
+# ---------- ПОВТОРЕНИЕ ----------
+
+@cached_keyboard
+def review_question_keyboard(question_id: int):
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [InlineKeyboardButton(text="✅ Показать ответ", callback_data=encode(cb.REVIEW_SHOW, question_id))],
+            [InlineKeyboardButton(text="⬅️ Закончить", callback_data=encode(cb.QUESTIONS_MENU))],
+        ]
+    )
+
+
+@cached_keyboard
+def review_grade_keyboard(question_id: int):
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(text="✅ Вспомнил", callback_data=encode(cb.REVIEW_RIGHT, question_id)),
+                InlineKeyboardButton(text="❌ Не вспомнил", callback_data=encode(cb.REVIEW_WRONG, question_id)),
+            ],
+            [InlineKeyboardButton(text="⬅️ Закончить", callback_data=encode(cb.QUESTIONS_MENU))],
+        ]
+    )
@@ -0,0 +1,124 @@
+"""
+Последовательная обработка апдейтов одного пользователя.
+
+Диспетчер (polling, вебхук) обрабатывает апдейты параллельно, и быстрый
+двойной тап по «Я ответил правильно» запускал quiz_register_answer дважды
+одновременно: оба читали одно состояние теста, index/correct портились,
+следующий вопрос уходил дважды. Здесь у каждого пользователя (или чата,
+если пользователя в апдейте нет) своя «полоса» — asyncio.Lock: апдейты
+одного человека идут по очереди в порядке прихода, разные люди —
+параллельно, без общей блокировки.
+
+Полоса создаётся при первом апдейте и удаляется, как только её никто
+не держит и не ждёт, поэтому словарь живёт размером с число пользователей,
+у которых прямо сейчас что-то обрабатывается, а не со всю аудиторию.
+
+В режиме вебхука ограничитель одновременных апдейтов (UpdateSlotsMiddleware,
+app/webhook.py) стоит внутри полосы: ждущие апдейты одного пользователя
+не занимают общих слотов. В многопроцессном режиме воркер так же
+выстраивает апдейты пользователя в цепочку до захвата слота
+(см. app/workers.py) — там полоса просто никогда не бывает занята.
+"""
+import asyncio
+import time
+
+from aiogram import BaseMiddleware
+
+from .metrics import METRICS, Metrics
+
+
+class _Lane:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # держит + ждут
+
+
+class UserLanes:
+    def __init__(self):
+        self._lanes: dict[tuple, _Lane] = {}
+        self.serialized = 0
+        self.contended = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_lanes = 0
+
+    def enter(self, key: tuple) -> _Lane:
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = _Lane()
+            if len(self._lanes) > self.peak_lanes:
+                self.peak_lanes = len(self._lanes)
+        lane.users += 1
+        return lane
+
+    def leave(self, key: tuple, lane: _Lane):
+        lane.users -= 1
+        if lane.users == 0 and self._lanes.get(key) is lane:
+            del self._lanes[key]
+
+    def stats(self) -> dict:
+        return {
+            "lanes": len(self._lanes),
+            "peak_lanes": self.peak_lanes,
+            "serialized": self.serialized,
+            "contended": self.contended,
+            "wait_avg_ms": round(self.wait_total / self.contended * 1000, 2) if self.contended else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 2),
+        }
+
+
+def lane_key(data: dict) -> tuple | None:
+    """
+    Пользователь апдейта, иначе чат (их кладёт в data UserContextMiddleware
+    aiogram); None — апдейт ничей (например, опрос канала), его не держим.
+    """
+    user = data.get("event_from_user")
+    if user is not None:
+        return ("user", user.id)
+    chat = data.get("event_chat")
+    if chat is not None:
+        return ("chat", chat.id)
+    return None
+
+
+class UserLaneMiddleware(BaseMiddleware):
+    """
+    Outer-middleware диспетчера (dp.update): хендлеры одного пользователя
+    выполняются строго по одному.
+    """
+
+    def __init__(self, lanes: UserLanes, metrics: Metrics = METRICS):
+        self.lanes = lanes
+        self.metrics = metrics
+
+    async def __call__(self, handler, event, data):
+        key = lane_key(data)
+        if key is None:
+            return await handler(event, data)
+
+        lanes = self.lanes
+        lane = lanes.enter(key)
+        try:
+            lanes.serialized += 1
+            self.metrics.lane_updates.inc(())
+            # users > 1 — кто-то держит полосу или уже стоит в очереди
+            if lane.users > 1:
+                started = time.perf_counter()
+                await lane.lock.acquire()
+                waited = time.perf_counter() - started
+                lanes.contended += 1
+                lanes.wait_total += waited
+                if waited > lanes.wait_max:
+                    lanes.wait_max = waited
+                self.metrics.lane_contended.inc(())
+                self.metrics.lane_wait_seconds.observe((), waited)
+            else:
+                await lane.lock.acquire()
+            try:
+                return await handler(event, data)
+            finally:
+                lane.lock.release()
+        finally:
+            lanes.leave(key, lane)
@@ -0,0 +1,339 @@
+"""
+Метрики бота в текстовом формате Prometheus (GET /metrics на локальном порту).
+
+Что считается:
+- gosexam_updates_total{type, action}        — апдейты по типу и кнопке
+  (action — имя кода из app/callbacks.py, например QUESTION_OPEN);
+- gosexam_handler_seconds{handler}            — гистограмма времени хендлера;
+- gosexam_handler_errors_total{handler}       — исключения в хендлерах;
+- gosexam_api_calls_total{method, handler}    — запросы к Bot API (каждая попытка)
+  и хендлер, из которого они сделаны: сколько вызовов стоит одно нажатие;
+- gosexam_api_seconds{method}                 — гистограмма времени запроса;
+- gosexam_api_upload_bytes_total{method}      — загруженные файлы, байт;
+- gosexam_api_errors_total{method, error}     — ошибки, 429 — error="retry_after";
+- gosexam_user_lane_updates_total             — апдейты, прошедшие через полосу пользователя
+  (app/lanes.py), gosexam_user_lane_contended_total — из них ждавшие
+  предыдущий апдейт того же пользователя, gosexam_user_lane_wait_seconds —
+  сколько ждали;
+- gosexam_outbound_*                          — очередь исходящих (app/outbox.py):
+  глубина, суммарное ожидание, ответы 429 и т.д.;
+- gosexam_quiz_sessions_*                     — сессии теста знаний: живые,
+  истёкшие по TTL, вытесненные по LRU.
+
+Последние два — датчики (gauge) поверх stats() объектов: значения читаются
+в момент запроса /metrics (watch_stats), на горячем пути ничего не делается.
+
+Горячий путь — словарь по кортежу меток и bisect по границам корзин,
+без блокировок: всё происходит в одном цикле событий. Текст собирается
+только при запросе /metrics.
+"""
+import os
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from aiogram.types import BufferedInputFile, CallbackQuery, FSInputFile, InputFile
+from aiohttp import web
+
+from . import callbacks as cb
+from .callbacks import decode
+
+
+# хендлер, внутри которого идёт запрос к API (ставит HandlerMetricsMiddleware)
+_HANDLER: ContextVar[str] = ContextVar("metrics_handler", default="")
+
+# методы, в которых бывают файлы: остальные на загрузку не проверяем
+UPLOAD_METHODS = frozenset(
+    (
+        "sendPhoto", "sendDocument", "sendAudio", "sendVideo", "sendAnimation",
+        "sendVoice", "sendVideoNote", "sendSticker", "sendMediaGroup", "editMessageMedia",
+    )
+)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# код действия -> имя константы ("o" -> "QUESTION_OPEN")
+ACTION_NAMES = {
+    value: name
+    for name, value in vars(cb).items()
+    if name.isupper() and isinstance(value, str) and value in cb.ACTIONS
+}
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...]):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, key: tuple, amount: float = 1):
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for key, value in self.values.items():
+            lines.append(f"{self.name}{_labels(self.labels, key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labels: tuple[str, ...], buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        # { метки: [счётчики корзин..., +Inf, сумма] }
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, key: tuple, value: float):
+        row = self.values.get(key)
+        if row is None:
+            row = self.values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for key, row in self.values.items():
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), row):
+                total += count
+                le = bound if isinstance(bound, str) else f"{bound:g}"
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (le,))} {total}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, key)} {row[-1]:.6f}")
+            lines.append(f"{self.name}_count{_labels(self.labels, key)} {total}")
+        return lines
+
+
+class StatsGauges:
+    """
+    Датчики поверх stats() -> dict: каждое числовое поле —
+    отдельная метрика {prefix}_{поле}, значение берётся при рендере.
+    """
+
+    def __init__(self, prefix: str, help_text: str, stats):
+        self.prefix = prefix
+        self.help_text = help_text
+        self.stats = stats
+
+    def render(self) -> list[str]:
+        lines = []
+        for key, value in self.stats().items():
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            name = f"{self.prefix}_{key}"
+            lines.append(f"# HELP {name} {self.help_text}: {key}")
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value:g}")
+        return lines
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Metrics:
+    def __init__(self):
+        self.started = time.time()
+        self.updates = Counter("gosexam_updates_total", "Апдейты по типу и действию кнопки", ("type", "action"))
+        self.handler_seconds = Histogram("gosexam_handler_seconds", "Время обработки апдейта хендлером", ("handler",))
+        self.handler_errors = Counter("gosexam_handler_errors_total", "Исключения в хендлерах", ("handler",))
+        self.api_calls = Counter("gosexam_api_calls_total", "Запросы к Bot API", ("method", "handler"))
+        self.api_seconds = Histogram("gosexam_api_seconds", "Время запроса к Bot API", ("method",))
+        self.upload_bytes = Counter("gosexam_api_upload_bytes_total", "Загружено файлов в Bot API, байт", ("method",))
+        self.api_errors = Counter("gosexam_api_errors_total", "Ошибки Bot API", ("method", "error"))
+        self.lane_updates = Counter("gosexam_user_lane_updates_total", "Апдейты в очереди пользователя", ())
+        self.lane_contended = Counter(
+            "gosexam_user_lane_contended_total", "Апдейты, ждавшие предыдущий апдейт пользователя", ()
+        )
+        self.lane_wait_seconds = Histogram(
+            "gosexam_user_lane_wait_seconds", "Ожидание предыдущего апдейта пользователя", ()
+        )
+        # { префикс: StatsGauges } — см. watch_stats()
+        self.gauges: dict[str, StatsGauges] = {}
+
+    def render(self) -> str:
+        lines = [
+            "# HELP gosexam_start_time_seconds Время запуска процесса",
+            "# TYPE gosexam_start_time_seconds gauge",
+            f"gosexam_start_time_seconds {self.started:.0f}",
+        ]
+        for metric in (
+            self.updates,
+            self.handler_seconds,
+            self.handler_errors,
+            self.api_calls,
+            self.api_seconds,
+            self.upload_bytes,
+            self.api_errors,
+            self.lane_updates,
+            self.lane_contended,
+            self.lane_wait_seconds,
+            *self.gauges.values(),
+        ):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Metrics()
+
+
+# =========================
+#   MIDDLEWARE
+# =========================
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """
+    Outer-middleware диспетчера (dp.update): тип апдейта и кнопка.
+    """
+
+    def __init__(self, metrics: Metrics = METRICS):
+        self.metrics = metrics
+
+    async def __call__(self, handler, event, data):
+        kind = event.event_type
+        action = ""
+        if kind == "callback_query":
+            decoded = decode(event.callback_query.data)
+            action = ACTION_NAMES.get(decoded[0], decoded[0]) if decoded else "unknown"
+        self.metrics.updates.inc((kind, action))
+        return await handler(event, data)
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """
+    Inner-middleware роутера (message / callback_query / inline_query):
+    время и ошибки хендлера. Для callback-ов aiogram видит один cb_dispatch,
+    поэтому имя берётся из таблицы CallbackTable по коду кнопки.
+    """
+
+    def __init__(self, table, metrics: Metrics = METRICS):
+        self.table = table
+        self.metrics = metrics
+
+    async def __call__(self, handler, event, data):
+        if isinstance(event, CallbackQuery):
+            decoded = decode(event.data)
+            callback = self.table.handler_for(decoded[0]) if decoded else None
+        else:
+            callback = getattr(data.get("handler"), "callback", None)
+        name = getattr(callback, "__name__", "unknown")
+
+        token = _HANDLER.set(name)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.handler_errors.inc((name,))
+            raise
+        finally:
+            self.metrics.handler_seconds.observe((name,), time.perf_counter() - started)
+            _HANDLER.reset(token)
+
+
+class ApiMetricsMiddleware(BaseRequestMiddleware):
+    """
+    Request-middleware сессии бота: каждая попытка запроса к Bot API.
+    Регистрируется после OutboundMiddleware, чтобы повторы после 429
+    тоже считались отдельными вызовами.
+    """
+
+    def __init__(self, metrics: Metrics = METRICS):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        name = method.__api_method__
+        self.metrics.api_calls.inc((name, _HANDLER.get()))
+        if name in UPLOAD_METHODS:
+            uploaded = upload_size(method)
+            if uploaded:
+                self.metrics.upload_bytes.inc((name,), uploaded)
+
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except TelegramRetryAfter:
+            self.metrics.api_errors.inc((name, "retry_after"))
+            raise
+        except TelegramAPIError as e:
+            self.metrics.api_errors.inc((name, type(e).__name__))
+            raise
+        finally:
+            self.metrics.api_seconds.observe((name,), time.perf_counter() - started)
+
+
+def upload_size(method) -> int:
+    """
+    Сколько байт файлов уйдёт в запросе (фото и альбомы); 0 — если файлов нет.
+    """
+    size = 0
+    for value in method.__dict__.values():
+        if isinstance(value, InputFile):
+            size += _file_size(value)
+        elif isinstance(value, list):
+            for item in value:
+                media = getattr(item, "media", None)
+                if isinstance(media, InputFile):
+                    size += _file_size(media)
+    return size
+
+
+def _file_size(file: InputFile) -> int:
+    if isinstance(file, FSInputFile):
+        try:
+            return os.path.getsize(file.path)
+        except OSError:
+            return 0
+    if isinstance(file, BufferedInputFile):
+        return len(file.data)
+    return 0
+
+
+def install_metrics(dp, router, table, session):
+    """
+    Вешает middleware метрик на диспетчер, роутер хендлеров и сессию бота.
+    Сессии — после OutboundMiddleware (см. ApiMetricsMiddleware).
+    """
+    dp.update.outer_middleware(UpdateMetricsMiddleware())
+    for observer in (router.message, router.callback_query, router.inline_query):
+        observer.middleware(HandlerMetricsMiddleware(table))
+    session.middleware(ApiMetricsMiddleware())
+
+
+def watch_stats(prefix: str, help_text: str, stats, metrics: Metrics = METRICS):
+    """
+    Отдаёт числовые поля stats() на /metrics как датчики gosexam_{prefix}_*.
+    Повторный вызов с тем же prefix заменяет источник.
+    """
+    name = f"gosexam_{prefix}"
+    metrics.gauges[name] = StatsGauges(name, help_text, stats)
+
+
+# =========================
+#   HTTP
+# =========================
+
+async def start_metrics_server(host: str, port: int, metrics: Metrics = METRICS) -> web.AppRunner:
+    """
+    Поднимает /metrics; вернувшийся runner закрывается через cleanup().
+    """
+    async def handle(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", handle)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+    print(f"📈 Метрики: http://{host}:{port}/metrics")
+    return runner
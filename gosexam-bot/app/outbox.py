@@ -0,0 +1,300 @@
+"""
+Планировщик исходящих запросов к Bot API.
+
+Все send*/edit*/copy*/forward* запросы с chat_id проходят через token bucket'ы:
+- общий — ~30 сообщений в секунду на бота;
+- на чат — ~1 сообщение в секунду (с небольшим запасом на всплеск),
+  для групп — ~20 в минуту.
+sendMediaGroup стоит столько токенов, сколько в нём картинок.
+Если токенов нет, запрос встаёт в очередь с приоритетом: интерактивные
+ответы пользователю (по умолчанию) идут раньше фоновых (BULK) — это хвосты
+многосообщенческих ответов (send_plan в handlers.py): под нагрузкой каждый
+сначала получает первое сообщение своего ответа, а продолжения идут следом
+(with outbound_priority(BULK): ...).
+TelegramRetryAfter перехватывается: чат (или весь бот) блокируется на
+retry_after секунд, запрос повторяется.
+
+Подключается как request-middleware сессии:
+    bot.session.middleware(OutboundMiddleware(OutboundScheduler()))
+"""
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+
+
+INTERACTIVE = 0
+BULK = 1
+
+_PRIORITY: ContextVar[int] = ContextVar("outbound_priority", default=INTERACTIVE)
+
+# методы, которые Телеграм считает «сообщениями» и лимитирует по чату
+_LIMITED_PREFIXES = ("send", "edit", "copy", "forward")
+
+
+@contextmanager
+def outbound_priority(priority: int):
+    """
+    Приоритет для всех запросов внутри блока (INTERACTIVE или BULK).
+    """
+    token = _PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def wait_time(self, now: float, cost: int = 1) -> float:
+        """
+        Сколько секунд ждать, пока можно потратить cost токенов (0 — можно сейчас).
+        Запрос дороже ёмкости ждёт полного бакета и уходит в долг:
+        следующие запросы ждут, пока долг не погасится.
+        """
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        need = min(cost, self.capacity)
+        if self.tokens >= need:
+            return 0.0
+        return (need - self.tokens) / self.rate
+
+    def consume(self, cost: int = 1):
+        self.tokens -= cost
+
+    def block(self, until: float):
+        # после блокировки можно ровно одно сообщение, дальше — по rate;
+        # токены за время блокировки не копятся
+        self.blocked_until = max(self.blocked_until, until)
+        self.tokens = min(1, self.capacity)
+        self.updated = max(self.updated, self.blocked_until)
+
+    def idle(self, now: float) -> bool:
+        return now >= self.blocked_until and self.wait_time(now) == 0 and self.tokens >= self.capacity
+
+
+class OutboundScheduler:
+    def __init__(
+        self,
+        global_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate: float = 20 / 60,
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+
+        now = time.monotonic()
+        self._global = TokenBucket(global_rate, global_rate, now)
+        self._chats: dict[int | str, TokenBucket] = {}
+        # (приоритет, порядковый номер, chat_id, стоимость, future)
+        self._heap: list[tuple[int, int, int | str, int, asyncio.Future]] = []
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._task: asyncio.Task | None = None
+        self._last_prune = now
+
+        self.granted = 0
+        self.queued = 0
+        self.max_depth = 0
+        self.wait_seconds = 0.0
+        self.retry_after = 0
+
+    # ---------- ПУБЛИЧНОЕ API ----------
+
+    async def acquire(self, chat_id: int | str, priority: int = INTERACTIVE, cost: int = 1):
+        """
+        Ждёт разрешения отправить cost сообщений в chat_id
+        (альбом sendMediaGroup — по сообщению на картинку).
+        """
+        now = time.monotonic()
+        if not self._heap and self._ready(chat_id, cost, now) == 0:
+            self._grant(chat_id, cost)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), chat_id, cost, future))
+        self.queued += 1
+        self.max_depth = max(self.max_depth, len(self._heap))
+        self._ensure_running()
+        self._wakeup.set()
+
+        started = time.monotonic()
+        await future
+        self.wait_seconds += time.monotonic() - started
+
+    def on_retry_after(self, chat_id: int | str | None, retry_after: float):
+        """
+        Телеграм ответил 429: блокируем чат (или весь бот, если чата нет).
+        """
+        self.retry_after += 1
+        now = time.monotonic()
+        until = now + retry_after
+        if chat_id is None:
+            self._global.block(until)
+        else:
+            self._chat(chat_id, now).block(until)
+
+    def depth(self) -> dict:
+        depth = {INTERACTIVE: 0, BULK: 0}
+        for priority, _, _, _, future in self._heap:
+            if not future.done():
+                depth[priority] = depth.get(priority, 0) + 1
+        return depth
+
+    def stats(self) -> dict:
+        depth = self.depth()
+        return {
+            "queue_interactive": depth.get(INTERACTIVE, 0),
+            "queue_bulk": depth.get(BULK, 0),
+            "queue_max": self.max_depth,
+            "granted": self.granted,
+            "queued": self.queued,
+            "wait_seconds": round(self.wait_seconds, 3),
+            "retry_after": self.retry_after,
+            "chats": len(self._chats),
+        }
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # ---------- ВНУТРЕННЕЕ ----------
+
+    def _chat(self, chat_id: int | str, now: float) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            if is_group:
+                bucket = TokenBucket(self.group_rate, 1, now)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    def _ready(self, chat_id: int | str, cost: int, now: float) -> float:
+        return max(self._global.wait_time(now, cost), self._chat(chat_id, now).wait_time(now, cost))
+
+    def _grant(self, chat_id: int | str, cost: int = 1):
+        self._global.consume(cost)
+        self._chats[chat_id].consume(cost)
+        self.granted += 1
+
+    def _ensure_running(self):
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            now = time.monotonic()
+            self._prune(now)
+
+            delay = self._global.wait_time(now)
+            if delay == 0:
+                delay = self._grant_next(now)
+                if delay == 0:
+                    continue
+
+            # ждём либо токен, либо новый запрос (он может быть в свободный чат)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _grant_next(self, now: float) -> float:
+        """
+        Выдаёт разрешение самому приоритетному запросу, чей чат свободен
+        (и на чью стоимость хватает общего бакета).
+        Возвращает 0, если выдал, иначе — сколько ждать до ближайшего.
+        """
+        skipped = []
+        delay = float("inf")
+        try:
+            while self._heap:
+                item = heapq.heappop(self._heap)
+                _, _, chat_id, cost, future = item
+                if future.done():  # отменён вызывающим
+                    continue
+                wait = self._ready(chat_id, cost, now)
+                if wait == 0:
+                    self._grant(chat_id, cost)
+                    future.set_result(None)
+                    return 0.0
+                delay = min(delay, wait)
+                skipped.append(item)
+        finally:
+            for item in skipped:
+                heapq.heappush(self._heap, item)
+        return delay if delay != float("inf") else 0.0
+
+    def _prune(self, now: float):
+        # раз в минуту выбрасываем бакеты простаивающих чатов
+        if now - self._last_prune < 60:
+            return
+        self._last_prune = now
+        waiting = {chat_id for _, _, chat_id, _, _ in self._heap}
+        for chat_id in [c for c, b in self._chats.items() if c not in waiting and b.idle(now)]:
+            del self._chats[chat_id]
+
+
+class OutboundMiddleware(BaseRequestMiddleware):
+    """
+    Request-middleware сессии бота: пропускает лимитируемые методы через
+    OutboundScheduler и повторяет запрос после TelegramRetryAfter.
+    """
+
+    def __init__(self, scheduler: OutboundScheduler, max_retries: int = 3):
+        self.scheduler = scheduler
+        self.max_retries = max_retries
+
+    async def __call__(self, make_request, bot, method):
+        chat_id = getattr(method, "chat_id", None)
+        limited = chat_id is not None and type(method).__name__.lower().startswith(_LIMITED_PREFIXES)
+        # sendMediaGroup: media — список, Телеграм считает каждую картинку сообщением
+        media = getattr(method, "media", None)
+        cost = len(media) if isinstance(media, list) else 1
+
+        attempt = 0
+        while True:
+            if limited:
+                await self.scheduler.acquire(chat_id, _PRIORITY.get(), cost)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.scheduler.on_retry_after(chat_id if limited else None, e.retry_after)
+                if not limited:
+                    await asyncio.sleep(e.retry_after)
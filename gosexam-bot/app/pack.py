@@ -0,0 +1,264 @@
+"""
+Скомпилированный пакет контента (.pack) для data/*.txt.
+
+Формат (little-endian):
+    заголовок  <4sHHIqQ>  magic "GXPK", версия формата, резерв, число записей,
+                          mtime_ns и размер исходного .txt (для проверки свежести)
+    индекс     <iIIII>    на запись: id, смещение/длина текста, смещение/длина ответа
+                          (записи отсортированы по id)
+    данные     UTF-8 строки текстов и ответов подряд
+
+Бот открывает пакет через mmap: тексты вопросов читаются при загрузке
+(они нужны для списков и планов), а ответ декодируется только когда
+его действительно показывают.
+
+Сборка:
+    python -m app.pack data/questions.txt data/tasks.txt
+    python -m app.pack --strict data/questions.txt   # любая битая строка — ошибка
+"""
+import mmap
+import os
+import struct
+import sys
+from pathlib import Path
+
+
+PACK_MAGIC = b"GXPK"
+PACK_VERSION = 1
+PACK_SUFFIX = ".pack"
+
+HEADER = struct.Struct("<4sHHIqQ")
+INDEX_ROW = struct.Struct("<iIIII")
+
+
+class PackError(Exception):
+    """
+    Исходный файл содержит некорректные строки или пакет повреждён.
+    errors — список строк вида "questions.txt:12: причина".
+    """
+
+    def __init__(self, message: str, errors: list[str] | None = None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def pack_path_for(source: Path) -> Path:
+    return source.with_suffix(PACK_SUFFIX)
+
+
+# =========================
+#   КОМПИЛЯЦИЯ
+# =========================
+
+def parse_source(source: Path, strict: bool = False) -> list[tuple[int, str, str]]:
+    """
+    Разбор файла `id|текст|ответ`. Записи те же, что у load_entries()
+    в app/content.py: строки без трёх полей или с нечисловым id пропускаются,
+    при дублях id остаётся первая строка. Пропущенные строки печатаются
+    с номерами; при strict=True вместо этого бросается PackError со всеми ними.
+    Пустые строки допускаются.
+    """
+    rows = []
+    errors = []
+    seen: dict[int, int] = {}
+
+    with source.open("r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.rstrip("\n")
+            if not line.strip():
+                continue
+            where = f"{source.name}:{line_no}"
+            parts = line.split("|", 2)
+            if len(parts) != 3:
+                errors.append(f"{where}: ожидалось 3 поля через '|', найдено {len(parts)}")
+                continue
+            id_str, text, answer = parts
+            try:
+                entry_id = int(id_str)
+            except ValueError:
+                errors.append(f"{where}: id не число: {id_str[:20]!r}")
+                continue
+            if entry_id in seen:
+                errors.append(f"{where}: id {entry_id} уже был в строке {seen[entry_id]}")
+                continue
+            seen[entry_id] = line_no
+            rows.append((entry_id, text.strip(), answer.strip()))
+
+    if errors:
+        message = f"{source.name}: некорректных строк — {len(errors)}"
+        if strict:
+            raise PackError(message, errors)
+        print(f"⚠️ {message}, пропущены:")
+        for error in errors:
+            print("   ", error)
+
+    rows.sort(key=lambda row: row[0])
+    return rows
+
+
+def compile_pack(source: Path, target: Path | None = None, strict: bool = False) -> Path:
+    """
+    Компилирует .txt в .pack рядом с ним (или в target).
+    Возвращает путь к пакету.
+    """
+    target = target or pack_path_for(source)
+    rows = parse_source(source, strict=strict)
+    st = source.stat()
+
+    index = bytearray()
+    blob = bytearray()
+    data_start = HEADER.size + INDEX_ROW.size * len(rows)
+    for entry_id, text, answer in rows:
+        text_bytes = text.encode("utf-8")
+        answer_bytes = answer.encode("utf-8")
+        text_off = data_start + len(blob)
+        blob += text_bytes
+        answer_off = data_start + len(blob)
+        blob += answer_bytes
+        index += INDEX_ROW.pack(entry_id, text_off, len(text_bytes), answer_off, len(answer_bytes))
+
+    header = HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, len(rows), st.st_mtime_ns, st.st_size)
+
+    tmp_path = target.with_suffix(target.suffix + ".tmp")
+    with tmp_path.open("wb") as f:
+        f.write(header)
+        f.write(index)
+        f.write(blob)
+    tmp_path.replace(target)
+    return target
+
+
+# =========================
+#   ЧТЕНИЕ
+# =========================
+
+class ContentPack:
+    """
+    Пакет, открытый через mmap.
+    entries() — записи {"id", "text"} без ответов,
+    answer(id) — ответ, декодируется из mmap по запросу.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        with path.open("rb") as f:
+            # mmap пустого файла — ValueError, поэтому размер проверяется до него
+            if os.fstat(f.fileno()).st_size < HEADER.size:
+                raise PackError(f"{path.name}: файл слишком короткий")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_index()
+        except PackError:
+            self._mm.close()
+            raise
+
+    def _read_index(self):
+        """
+        Читает заголовок и индекс и один раз проверяет все смещения:
+        дальше answer() и entries() читают mmap без проверок.
+        """
+        name = self.path.name
+        size = len(self._mm)
+        magic, version, _, count, src_mtime_ns, src_size = HEADER.unpack_from(self._mm, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise PackError(f"{name}: неизвестный формат пакета")
+        data_start = HEADER.size + INDEX_ROW.size * count
+        if size < data_start:
+            raise PackError(f"{name}: индекс обрезан")
+
+        self.count = count
+        self.source_mtime_ns = src_mtime_ns
+        self.source_size = src_size
+        # id -> номер строки индекса
+        self._rows: dict[int, int] = {}
+        for row in range(count):
+            entry_id, text_off, text_len, answer_off, answer_len = self._row(row)
+            for offset, length in ((text_off, text_len), (answer_off, answer_len)):
+                if offset < data_start or offset + length > size:
+                    raise PackError(f"{name}: запись {entry_id} выходит за пределы файла")
+            if entry_id in self._rows:
+                raise PackError(f"{name}: id {entry_id} в индексе дважды")
+            self._rows[entry_id] = row
+
+    def is_fresh_for(self, source: Path) -> bool:
+        """
+        Пакет собран из текущей версии source (или source вообще нет).
+        """
+        try:
+            st = source.stat()
+        except OSError:
+            return True
+        return st.st_mtime_ns == self.source_mtime_ns and st.st_size == self.source_size
+
+    def entries(self) -> list[dict]:
+        entries = []
+        for entry_id, row in self._rows.items():
+            _, text_off, text_len, _, _ = self._row(row)
+            entries.append({"id": entry_id, "text": self._decode(text_off, text_len)})
+        return entries
+
+    def answer(self, entry_id: int) -> str | None:
+        row = self._rows.get(entry_id)
+        if row is None:
+            return None
+        _, _, _, answer_off, answer_len = self._row(row)
+        return self._decode(answer_off, answer_len)
+
+    def close(self):
+        self._mm.close()
+
+    def _row(self, row: int):
+        return INDEX_ROW.unpack_from(self._mm, HEADER.size + row * INDEX_ROW.size)
+
+    def _decode(self, offset: int, length: int) -> str:
+        return self._mm[offset : offset + length].decode("utf-8")
+
+
+def open_fresh_pack(source: Path) -> ContentPack | None:
+    """
+    Открывает пакет рядом с source, если он есть и собран из текущей версии source.
+    Иначе None — тогда контент читается из .txt.
+    """
+    path = pack_path_for(source)
+    if not path.exists():
+        return None
+    try:
+        pack = ContentPack(path)
+    except (OSError, PackError) as e:
+        print("⚠️ Пакет не читается, используем txt:", e)
+        return None
+    if not pack.is_fresh_for(source):
+        print(f"⚠️ {path.name} устарел относительно {source.name}, используем txt")
+        pack.close()
+        return None
+    return pack
+
+
+# =========================
+#   CLI
+# =========================
+
+def main(argv: list[str]) -> int:
+    strict = "--strict" in argv
+    argv = [arg for arg in argv if arg != "--strict"]
+    if not argv:
+        print("Использование: python -m app.pack [--strict] data/questions.txt [data/tasks.txt ...]")
+        return 2
+
+    failed = False
+    for arg in argv:
+        source = Path(arg)
+        try:
+            target = compile_pack(source, strict=strict)
+        except PackError as e:
+            failed = True
+            print(f"❌ {e}")
+            for error in e.errors:
+                print("   ", error)
+            continue
+        print(f"✅ {source} → {target} ({target.stat().st_size} байт)")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
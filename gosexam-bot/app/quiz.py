@@ -0,0 +1,169 @@
+"""
+Подбор вопросов для теста знаний.
+
+Элемент теста — одно число (так он и лежит в QuizState.ids / array('i')):
+- id > 0  — вопрос с этим id;
+- id < 0  — задача с id = -item.
+Старые сессии, где были только id вопросов, читаются без изменений.
+
+Пулы (вопросы, задачи, всё вместе) собираются один раз на версию контента:
+stage() — в потоке загрузки вместе со снимком, commit() — при его публикации
+(set_content), так что на цикле событий пулы не пересобираются.
+Выборка без повторов — ленивый Фишер–Йетс: перестановка хранится только
+в словаре сделанных обменов, поэтому тест из k элементов стоит O(k),
+а не O(размер пула), как shuffle всего списка.
+
+Пулы — по разделам (POOL_*). Пулов по темам нет: в data/*.txt у записи
+только id|текст|ответ, темы нигде не размечены. Появится разметка —
+тема станет ещё одним ключом в QuizPools.pools из build_pools().
+
+Недавно показанные пользователю элементы (последние avoid_recent) при
+выборке откладываются и берутся, только если без них пула не хватает.
+"""
+import random
+from collections import OrderedDict, deque
+from typing import NamedTuple
+
+from .content import ContentSnapshot
+
+
+QUIZ_LENGTH = 5
+AVOID_RECENT = 50           # сколько последних элементов стараемся не повторять
+MAX_TRACKED_USERS = 100_000 # история «недавних» — LRU по пользователям
+
+# пулы (аргумент кнопки QUIZ_START)
+POOL_QUESTIONS = 0
+POOL_TASKS = 1
+POOL_MIXED = 2
+
+POOL_TITLES = {
+    POOL_QUESTIONS: "по вопросам",
+    POOL_TASKS: "по задачам",
+    POOL_MIXED: "вопросы + задачи",
+}
+
+
+def task_item(task_id: int) -> int:
+    return -task_id
+
+
+def is_task(item: int) -> bool:
+    return item < 0
+
+
+def sample(pool: tuple, k: int, rng: random.Random, avoid=()) -> list:
+    """
+    k разных элементов pool в случайном порядке за O(k + отложенных).
+    Элементы из avoid откладываются и добираются в конце, если не хватило.
+    """
+    n = len(pool)
+    k = min(k, n)
+    swaps: dict[int, int] = {}
+    chosen = []
+    postponed = []
+    i = 0
+    while len(chosen) < k and i < n:
+        j = rng.randrange(i, n)
+        item = swaps.get(j, j)
+        swaps[j] = swaps.get(i, i)
+        i += 1
+        value = pool[item]
+        if value in avoid:
+            postponed.append(value)
+        else:
+            chosen.append(value)
+    chosen.extend(postponed[: k - len(chosen)])
+    return chosen
+
+
+class QuizPools(NamedTuple):
+    version: int
+    pools: dict     # { POOL_*: tuple элементов }
+
+
+def build_pools(content: ContentSnapshot) -> QuizPools:
+    questions = tuple(content.questions.ids)
+    tasks = tuple(task_item(task_id) for task_id in content.tasks.ids)
+    return QuizPools(
+        content.version,
+        {
+            POOL_QUESTIONS: questions,
+            POOL_TASKS: tasks,
+            POOL_MIXED: questions + tasks,
+        },
+    )
+
+
+class QuizEngine:
+    """
+    Пулы по версии контента + история недавних элементов пользователей.
+    """
+
+    def __init__(
+        self,
+        length: int = QUIZ_LENGTH,
+        avoid_recent: int = AVOID_RECENT,
+        max_users: int = MAX_TRACKED_USERS,
+        rng: random.Random | None = None,
+    ):
+        self.length = length
+        self.avoid_recent = avoid_recent
+        self.max_users = max_users
+        self.rng = rng or random.Random()
+        self.started = 0
+        self._pools: QuizPools | None = None
+        self._staged: QuizPools | None = None
+        self._recent: OrderedDict[int, deque] = OrderedDict()
+
+    def configure(self, length: int, avoid_recent: int):
+        self.length = max(1, length)
+        self.avoid_recent = max(0, avoid_recent)
+        for user_id, recent in self._recent.items():
+            self._recent[user_id] = deque(recent, maxlen=self.avoid_recent or None)
+
+    def stage(self, content: ContentSnapshot):
+        """
+        Пулы для нового снимка (в потоке build_content). Текущие пулы
+        не меняются до commit(): хендлеры ещё работают со старым снимком.
+        """
+        self._staged = build_pools(content)
+
+    def commit(self, content: ContentSnapshot):
+        """
+        Подменяет пулы на подготовленные stage() для этого снимка
+        (или собирает их сейчас, если stage не вызывали).
+        """
+        pools = self._staged
+        self._staged = None
+        if pools is None or pools.version != content.version:
+            pools = build_pools(content)
+        self._pools = pools
+
+    def pool(self, content: ContentSnapshot, kind: int) -> tuple:
+        pools = self._pools
+        if pools is None or pools.version != content.version:
+            # снимок, взятый до подмены (или без commit, как в тестах):
+            # собираем для него, не трогая текущие пулы
+            pools = build_pools(content)
+        return pools.pools.get(kind, ())
+
+    def start(self, user_id: int, content: ContentSnapshot, kind: int = POOL_QUESTIONS) -> list[int]:
+        """
+        Элементы нового теста (пустой список, если пул пуст).
+        """
+        pool = self.pool(content, kind)
+        recent = self._recent.get(user_id)
+        items = sample(pool, self.length, self.rng, set(recent) if recent else ())
+        if items and self.avoid_recent:
+            if recent is None:
+                recent = self._recent[user_id] = deque(maxlen=self.avoid_recent)
+                if len(self._recent) > self.max_users:
+                    self._recent.popitem(last=False)
+            else:
+                self._recent.move_to_end(user_id)
+            recent.extend(items)
+        self.started += 1
+        return items
+
+    def stats(self) -> dict:
+        return {"started": self.started, "tracked_users": len(self._recent)}
@@ -0,0 +1,129 @@
+import asyncio
+from pathlib import Path
+
+from .content import ContentSnapshot, diff_stores
+
+
+class ContentWatcher:
+    """
+    Горячая перезагрузка контента без рестарта бота.
+
+    Раз в interval секунд сверяет (mtime, размер) отслеживаемых файлов.
+    Если что-то поменялось — в отдельном потоке заново строит снимок
+    через build(version) и там же считает сводку изменений (сравнение
+    ответов декодирует весь пакет — циклу событий это не по пути),
+    затем отдаёт новый снимок в publish(snapshot) и печатает сводку.
+    Подмена снимка — одно присваивание, поэтому хендлеры, уже взявшие
+    старый снимок, дорабатывают на нём.
+
+    dirs — каталоги, у которых сверяются mtime самого каталога и его
+    подкаталогов: появился data/<предмет>/ или в нём questions.txt —
+    тоже перезагрузка (build заново обходит банки).
+    """
+
+    def __init__(self, paths: list[Path], build, publish, current, interval: float = 2.0, dirs: list[Path] = ()):
+        self.paths = paths
+        self.dirs = dirs
+        self.build = build
+        self.publish = publish
+        self.current = current
+        self.interval = interval
+        self.reloads = 0
+        self.errors = 0
+        self._signature = self._stat()
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def check(self) -> bool:
+        """
+        Один проход проверки. Возвращает True, если контент был перезагружен.
+        """
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+
+        old = self.current()
+        try:
+            new, report = await asyncio.to_thread(self._build, old)
+        except Exception as e:
+            # битый файл посреди записи и т.п. — оставляем старый снимок,
+            # попробуем на следующем проходе
+            self.errors += 1
+            print("⚠️ Не удалось перезагрузить контент:", repr(e))
+            return False
+
+        self._signature = signature
+        self.publish(new)
+        self.reloads += 1
+        print(report)
+        return True
+
+    def _build(self, old: ContentSnapshot) -> tuple[ContentSnapshot, str]:
+        # выполняется в потоке
+        new = self.build(old.version + 1)
+        return new, format_diff(old, new)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.check()
+
+    def _stat(self):
+        signature = [_stat_path(path) for path in self.paths]
+        for directory in self.dirs:
+            signature.append(_stat_path(directory))
+            try:
+                subdirs = sorted(path for path in directory.iterdir() if path.is_dir())
+            except OSError:
+                continue
+            signature.extend((path.name, _stat_path(path)) for path in subdirs)
+        return tuple(signature)
+
+
+def _stat_path(path: Path):
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def format_diff(old: ContentSnapshot, new: ContentSnapshot) -> str:
+    lines = [f"🔄 Контент перезагружен: v{old.version} → v{new.version}"]
+    for title, old_store, new_store in (
+        ("вопросы", old.questions, new.questions),
+        ("задачи", old.tasks, new.tasks),
+    ):
+        added, removed, changed = diff_stores(old_store, new_store)
+        line = f"   {title}: +{len(added)} −{len(removed)} ~{len(changed)}"
+        details = []
+        if added:
+            details.append(f"добавлены {_short_ids(added)}")
+        if removed:
+            details.append(f"удалены {_short_ids(removed)}")
+        if changed:
+            details.append(f"изменены {_short_ids(changed)}")
+        if details:
+            line += " (" + "; ".join(details) + ")"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def _short_ids(ids: list[int], limit: int = 10) -> str:
+    shown = ", ".join(str(i) for i in ids[:limit])
+    if len(ids) > limit:
+        shown += f" … ещё {len(ids) - limit}"
+    return shown
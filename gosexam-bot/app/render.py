@@ -0,0 +1,226 @@
+import os
+import re
+from functools import partial
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from aiogram.types import InlineKeyboardMarkup
+
+from .content import DATA_DIR
+from .keyboards import (
+    bank_question_actions_keyboard,
+    bank_task_actions_keyboard,
+    question_actions_keyboard,
+    task_actions_keyboard,
+)
+
+
+IMG_PATTERN = re.compile(r"(img:[^\s]+)")
+MAX_TG_MESSAGE = 4000  # безопасный лимит для текста
+MAX_TG_CAPTION = 1024  # лимит подписи к фото / альбому
+
+ACTIONS_PROMPT = "Выберите действие:"
+
+
+# =========================
+#   ПЛАНЫ ОТПРАВКИ
+# =========================
+
+class RenderPlan(NamedTuple):
+    """
+    Готовый к отправке вид записи:
+    - chunks   — текстовые сообщения (уже порезаны по MAX_TG_MESSAGE)
+    - caption  — текст, который уходит подписью к альбому (вместо chunks)
+    - images   — пути к картинкам, существование уже проверено
+    - prompt / keyboard — финальное сообщение с клавиатурой (если нужно)
+    """
+    chunks: tuple[str, ...]
+    caption: str | None
+    images: tuple[Path, ...]
+    prompt: str | None = None
+    keyboard: InlineKeyboardMarkup | None = None
+
+    @property
+    def single_message(self) -> bool:
+        """
+        Запись помещается в одно текстовое сообщение без картинок:
+        текст и клавиатуру можно отправить (или отредактировать) одним вызовом.
+        """
+        return not self.images and len(self.chunks) == 1
+
+
+class EntryPlans(NamedTuple):
+    """
+    Всё, что нужно для показа условия записи, посчитанное при загрузке:
+    разобранные текст/картинки и готовый план body.
+    """
+    text: str
+    images: tuple[Path, ...]
+    body: RenderPlan
+
+
+class AnswerPlans(NamedTuple):
+    """
+    То же для ответа. Собирается лениво, при первом показе
+    (см. ContentStore.answer_plans).
+    """
+    text: str
+    images: tuple[Path, ...]
+    plan: RenderPlan
+
+
+class Compiler(NamedTuple):
+    """
+    Пара функций компиляции для одного вида записей (вопросы / задачи).
+    """
+    entry: Callable[[dict], EntryPlans]
+    answer: Callable[[dict, str], AnswerPlans]
+
+
+# =========================
+#    РАЗБОР ТЕКСТА
+# =========================
+
+def split_text_and_images(raw: str):
+    """
+    Ищет в строке маркеры img:tables/....png
+    Возвращает:
+    - чистый текст без этих маркеров
+    - список относительных путей к картинкам (например, "tables/table_01.png")
+    """
+    if not raw:
+        return "", []
+
+    images = []
+
+    def replacer(match: re.Match):
+        token = match.group(1)  # img:tables/table_01.png
+        rel_path = token.split("img:")[1]  # tables/table_01.png
+        images.append(rel_path)
+        return ""  # удаляем маркер из текста
+
+    clean_text = IMG_PATTERN.sub(replacer, raw).strip()
+    return clean_text, images
+
+
+def resolve_images(rel_paths: list[str]) -> tuple[Path, ...]:
+    """
+    Переводит относительные пути в абсолютные и выкидывает несуществующие файлы.
+    Пути нормализуются здесь, один раз на план: по ним кэши картинок
+    (FILE_IDS, IMAGES) считают ключ без resolve() на каждую отправку.
+    """
+    file_paths = (Path(os.path.normpath(DATA_DIR / rel_path)) for rel_path in rel_paths)
+    return tuple(file_path for file_path in file_paths if file_path.exists())
+
+
+def chunk_text(text: str) -> tuple[str, ...]:
+    """
+    Режет текст на куски, чтобы не превышать лимит Телеграма.
+    """
+    if not text:
+        return ()
+    return tuple(text[i : i + MAX_TG_MESSAGE] for i in range(0, len(text), MAX_TG_MESSAGE))
+
+
+def build_plan(
+    header: str,
+    text: str,
+    images: tuple[Path, ...],
+    prompt: str | None = None,
+    keyboard: InlineKeyboardMarkup | None = None,
+) -> RenderPlan:
+    """
+    Собирает план из заголовка, чистого текста и уже проверенных картинок.
+    Если картинок несколько, а текст влезает в подпись —
+    текст уходит подписью к альбому, без отдельного сообщения.
+    """
+    if text:
+        full_text = f"{header}\n\n{text}"
+    else:
+        full_text = header
+
+    if len(images) >= 2 and len(full_text) <= MAX_TG_CAPTION:
+        return RenderPlan((), full_text, images, prompt, keyboard)
+
+    return RenderPlan(chunk_text(full_text), None, images, prompt, keyboard)
+
+
+# =========================
+#    КОМПИЛЯЦИЯ ЗАПИСЕЙ
+# =========================
+
+def _compile_body(entry: dict, header: str, actions_keyboard) -> EntryPlans:
+    text, rel_images = split_text_and_images(entry["text"])
+    images = resolve_images(rel_images)
+    return EntryPlans(
+        text=text,
+        images=images,
+        body=build_plan(
+            header,
+            text,
+            images,
+            ACTIONS_PROMPT,
+            actions_keyboard(entry["id"], show_answer_button=True),
+        ),
+    )
+
+
+def _compile_answer(entry: dict, answer: str, header: str, actions_keyboard) -> AnswerPlans:
+    text, rel_images = split_text_and_images(answer)
+    images = resolve_images(rel_images)
+    return AnswerPlans(
+        text=text,
+        images=images,
+        plan=build_plan(
+            header,
+            text,
+            images,
+            ACTIONS_PROMPT,
+            actions_keyboard(entry["id"], show_answer_button=False),
+        ),
+    )
+
+
+def compile_question(question: dict) -> EntryPlans:
+    return _compile_body(question, f"Вопрос {question['id']}:", question_actions_keyboard)
+
+
+def compile_question_answer(question: dict, answer: str) -> AnswerPlans:
+    return _compile_answer(
+        question, answer, f"Ответ на вопрос {question['id']}:", question_actions_keyboard
+    )
+
+
+def compile_task(task: dict) -> EntryPlans:
+    return _compile_body(task, f"Задача {task['id']}:", task_actions_keyboard)
+
+
+def compile_task_answer(task: dict, answer: str) -> AnswerPlans:
+    return _compile_answer(
+        task, answer, f"Решение задачи {task['id']}:", task_actions_keyboard
+    )
+
+
+QUESTION_COMPILER = Compiler(compile_question, compile_question_answer)
+TASK_COMPILER = Compiler(compile_task, compile_task_answer)
+
+
+def bank_compilers(number: int) -> tuple[Compiler, Compiler]:
+    """
+    Компиляторы вопросов и задач банка number (app/banks.py):
+    те же планы, но кнопки под записью ведут в этот банк.
+    """
+    question_keyboard = partial(bank_question_actions_keyboard, number)
+    task_keyboard = partial(bank_task_actions_keyboard, number)
+    return (
+        Compiler(
+            lambda question: _compile_body(question, f"Вопрос {question['id']}:", question_keyboard),
+            lambda question, answer: _compile_answer(
+                question, answer, f"Ответ на вопрос {question['id']}:", question_keyboard
+            ),
+        ),
+        Compiler(
+            lambda task: _compile_body(task, f"Задача {task['id']}:", task_keyboard),
+            lambda task, answer: _compile_answer(task, answer, f"Решение задачи {task['id']}:", task_keyboard),
+        ),
+    )
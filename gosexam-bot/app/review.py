@@ -0,0 +1,445 @@
+"""
+Интервальное повторение вопросов (SM-2).
+
+Оценки «Я ответил правильно / неправильно» (и из теста знаний, и из режима
+повторения) двигают карточку вопроса по расписанию пользователя:
+- правильно  — интервал 1 день, потом 6 дней, потом интервал × лёгкость;
+- неправильно — карточка возвращается через RELEARN_DELAY, лёгкость падает.
+
+У каждого пользователя — словарь { id вопроса: Card } и куча (due, id)
+с ленивым удалением: следующая карточка к повторению достаётся за O(log n).
+Устаревшие записи кучи выбрасываются при чтении, а если их накопилось
+больше, чем карточек, куча пересобирается.
+
+В памяти держатся только расписания недавно активных пользователей —
+так же, как сессии теста: к расписанию не обращались ttl секунд — оно
+выгружается, пользователей больше max_users — выгружается давнее всех
+тронутое (LRU).
+
+SqliteReviewStore сохраняет расписания в SQLite так же, как сессии теста:
+в памяти сразу, на диск — пачкой раз в flush_interval секунд. Выгруженное
+расписание не теряется: несохранённые изменения дописываются следующим
+сбросом, а при новом обращении пользователь читается из базы (load()).
+"""
+import asyncio
+import heapq
+import sqlite3
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from .sessions import Shard
+
+
+DAY = 24 * 3600
+RELEARN_DELAY = 10 * 60     # неправильный ответ — снова через 10 минут
+MIN_EASE = 1.3
+START_EASE = 2.5
+
+# самооценка -> качество ответа по шкале SM-2 (0..5)
+QUALITY_RIGHT = 4
+QUALITY_WRONG = 2
+
+
+class Card:
+    __slots__ = ("due", "interval", "ease", "reps")
+
+    def __init__(self, due: float, interval: float = 0.0, ease: float = START_EASE, reps: int = 0):
+        self.due = due              # time.time(), когда показать снова
+        self.interval = interval    # текущий интервал, дни
+        self.ease = ease
+        self.reps = reps            # правильных ответов подряд
+
+    def grade(self, quality: int, now: float):
+        """
+        Шаг SM-2.
+        """
+        if quality < 3:
+            self.reps = 0
+            self.interval = 0.0
+            self.due = now + RELEARN_DELAY
+        else:
+            if self.reps == 0:
+                self.interval = 1.0
+            elif self.reps == 1:
+                self.interval = 6.0
+            else:
+                self.interval = round(self.interval * self.ease, 2)
+            self.reps += 1
+            self.due = now + self.interval * DAY
+        self.ease = max(MIN_EASE, self.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+
+class UserSchedule:
+    """
+    Расписание одного пользователя.
+
+    cursor — позиция в ids текущей версии вопросов, до которой все вопросы
+    уже изучены: для ids одной версии карточки только добавляются, поэтому
+    курсор двигается лишь вперёд и поиск «первого неизученного» в сумме
+    проходит список один раз, а не на каждый вызов.
+    """
+
+    __slots__ = ("cards", "heap", "cursor_ids", "cursor", "touched")
+
+    def __init__(self, cards: dict[int, Card] | None = None):
+        self.cards: dict[int, Card] = cards or {}
+        self.heap: list[tuple[float, int]] = [(card.due, qid) for qid, card in self.cards.items()]
+        heapq.heapify(self.heap)
+        self.cursor_ids: tuple[int, ...] | None = None
+        self.cursor = 0
+        self.touched = 0.0          # time.monotonic() последнего обращения
+
+    def push(self, question_id: int, card: Card):
+        self.cards[question_id] = card
+        heapq.heappush(self.heap, (card.due, question_id))
+        if len(self.heap) > 2 * len(self.cards) + 16:
+            self.heap = [(c.due, qid) for qid, c in self.cards.items()]
+            heapq.heapify(self.heap)
+
+    def peek(self) -> tuple[float, int] | None:
+        """
+        (due, id) ближайшей карточки; устаревшие записи кучи выкидываются.
+        """
+        heap = self.heap
+        while heap:
+            due, question_id = heap[0]
+            card = self.cards.get(question_id)
+            if card is not None and card.due == due:
+                return due, question_id
+            heapq.heappop(heap)
+        return None
+
+    def first_new(self, ids: tuple[int, ...]) -> int | None:
+        """
+        Первый по порядку ids вопрос без карточки (None — все изучены).
+        """
+        if self.cursor_ids is not ids:
+            # новая версия контента — один проход заново
+            self.cursor_ids = ids
+            self.cursor = 0
+        cards = self.cards
+        position = self.cursor
+        while position < len(ids) and ids[position] in cards:
+            position += 1
+        self.cursor = position
+        return ids[position] if position < len(ids) else None
+
+
+# =========================
+#   ХРАНИЛИЩЕ РАСПИСАНИЙ
+# =========================
+
+class MemoryReviewStore:
+    """
+    Расписания в памяти процесса: { user_id: UserSchedule }.
+    Порядок в OrderedDict = порядок последнего обращения (как в
+    MemorySessionStore), вытеснение и чистка идут с головы.
+
+    Перед schedule/grade/next_card хендлер вызывает await load(user_id):
+    здесь это пустая операция, SqliteReviewStore по ней подгружает
+    выгруженного пользователя из базы.
+    """
+
+    def __init__(self, ttl: float = DAY, max_users: int = 100_000, sweep_interval: float = 60.0):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.sweep_interval = sweep_interval
+        self.grades = 0
+        self.expired = 0
+        self.evicted = 0
+        self._users: OrderedDict[int, UserSchedule] = OrderedDict()
+        self._sweeper: asyncio.Task | None = None
+
+    async def load(self, user_id: int):
+        pass
+
+    def schedule(self, user_id: int) -> UserSchedule:
+        schedule = self._users.get(user_id)
+        if schedule is None:
+            schedule = UserSchedule()
+            self._put(user_id, schedule)
+        else:
+            self._users.move_to_end(user_id)
+        schedule.touched = time.monotonic()
+        return schedule
+
+    def grade(self, user_id: int, question_id: int, is_correct: bool, now: float | None = None) -> Card:
+        now = time.time() if now is None else now
+        schedule = self.schedule(user_id)
+        card = schedule.cards.get(question_id) or Card(now)
+        card.grade(QUALITY_RIGHT if is_correct else QUALITY_WRONG, now)
+        schedule.push(question_id, card)
+        self.grades += 1
+        self._changed(user_id, question_id)
+        return card
+
+    def next_card(self, user_id: int, questions, now: float | None = None) -> tuple[int | None, float | None]:
+        """
+        questions — ContentStore вопросов.
+        Что показывать пользователю:
+        - (id, None)  — карточка, срок которой наступил, иначе первый ещё не
+          изученный вопрос (по порядку id);
+        - (None, due) — всё изучено, ближайшее повторение в момент due;
+        - (None, None) — вопросов нет.
+        Карточки вопросов, удалённых из базы, выбрасываются.
+        """
+        now = time.time() if now is None else now
+        schedule = self.schedule(user_id)
+
+        top = schedule.peek()
+        while top is not None and top[1] not in questions.by_id:
+            del schedule.cards[top[1]]
+            self._changed(user_id, top[1])
+            top = schedule.peek()
+        if top is not None and top[0] <= now:
+            return top[1], None
+
+        question_id = schedule.first_new(questions.ids)
+        if question_id is not None:
+            return question_id, None
+        return None, (top[0] if top is not None else None)
+
+    def sweep(self) -> int:
+        """
+        Выгружает расписания, к которым не обращались ttl секунд.
+        Возвращает, сколько выгружено.
+        """
+        deadline = time.monotonic() - self.ttl
+        removed = 0
+        while self._users:
+            user_id, schedule = next(iter(self._users.items()))
+            if schedule.touched > deadline:
+                break
+            self._unload(user_id)
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._users),
+            "cards": sum(len(s.cards) for s in self._users.values()),
+            "grades": self.grades,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    def _put(self, user_id: int, schedule: UserSchedule):
+        schedule.touched = time.monotonic()
+        self._users[user_id] = schedule
+        while len(self._users) > self.max_users:
+            self._unload(next(iter(self._users)))
+            self.evicted += 1
+
+    def _unload(self, user_id: int):
+        self._users.pop(user_id, None)
+
+    def _changed(self, user_id: int, question_id: int):
+        pass
+
+    async def start(self):
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+
+class SqliteReviewStore(MemoryReviewStore):
+    """
+    Расписания в памяти + запись в SQLite позади (write-behind).
+
+    Пользователь читается из базы при первом обращении (load()).
+    _dirty — { user_id: id изменённых карточек }. Если пользователь с
+    несохранёнными изменениями выгружается по TTL/LRU, его расписание
+    ждёт сброса в _unsaved; load() до сброса берёт его оттуда, а не из
+    устаревшей базы.
+    shard — как у SqliteSessionStore: только строки пользователей воркера.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = 1.0, shard: Shard | None = None, **limits):
+        super().__init__(**limits)
+        self.path = path
+        self.shard = shard
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self.loads = 0
+        self._dirty: dict[int, set[int]] = {}
+        self._unsaved: dict[int, UserSchedule] = {}
+        self._conn: sqlite3.Connection | None = None
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    async def load(self, user_id: int):
+        if user_id in self._users:
+            return
+        schedule = self._unsaved.get(user_id)
+        if schedule is None and self._conn is not None:
+            rows = await asyncio.to_thread(self._read_user, user_id)
+            if user_id in self._users:
+                # пока читали, пользователя уже загрузил параллельный апдейт
+                return
+            schedule = self._unsaved.get(user_id)
+            if schedule is None:
+                schedule = UserSchedule({qid: Card(*values) for qid, *values in rows})
+                self.loads += 1
+        if schedule is not None:
+            self._unsaved.pop(user_id, None)
+            self._put(user_id, schedule)
+
+    def _changed(self, user_id: int, question_id: int):
+        self._dirty.setdefault(user_id, set()).add(question_id)
+
+    def _unload(self, user_id: int):
+        schedule = self._users.pop(user_id, None)
+        if schedule is not None and user_id in self._dirty:
+            self._unsaved[user_id] = schedule
+
+    async def start(self):
+        self._conn = await asyncio.to_thread(self._open)
+        users = await asyncio.to_thread(self._count_users)
+        print(f"🔁 Пользователей с расписанием повторения в базе: {users}")
+        await super().start()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        await super().close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.to_thread(conn.close)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if not self._dirty or self._conn is None:
+                return
+            dirty, self._dirty = self._dirty, {}
+            # выгруженные остаются в _unsaved, пока строки не записаны
+            unsaved = dict(self._unsaved)
+
+            upserts = []
+            deletes = []
+            for user_id, question_ids in dirty.items():
+                schedule = self._users.get(user_id) or unsaved.get(user_id)
+                cards = schedule.cards if schedule is not None else {}
+                for question_id in question_ids:
+                    card = cards.get(question_id)
+                    if card is None:
+                        if self.shard is None or self.shard.owns(user_id):
+                            deletes.append((user_id, question_id))
+                    else:
+                        upserts.append((user_id, question_id, card.due, card.interval, card.ease, card.reps))
+
+            try:
+                await asyncio.to_thread(self._write, upserts, deletes)
+            except sqlite3.Error as e:
+                for user_id, question_ids in dirty.items():
+                    self._dirty.setdefault(user_id, set()).update(question_ids)
+                print("⚠️ Не удалось сохранить расписание повторения:", repr(e))
+                return
+            for user_id, schedule in unsaved.items():
+                if self._unsaved.get(user_id) is schedule and user_id not in self._dirty:
+                    del self._unsaved[user_id]
+            self.flushes += 1
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update(
+            {
+                "dirty": sum(len(ids) for ids in self._dirty.values()),
+                "unsaved_users": len(self._unsaved),
+                "loads": self.loads,
+                "flushes": self.flushes,
+            }
+        )
+        return stats
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    # ---------- SQLITE (выполняется в потоке) ----------
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS review_cards ("
+            " user_id INTEGER NOT NULL,"
+            " question_id INTEGER NOT NULL,"
+            " due REAL NOT NULL,"
+            " interval REAL NOT NULL,"
+            " ease REAL NOT NULL,"
+            " reps INTEGER NOT NULL,"
+            " PRIMARY KEY (user_id, question_id))"
+        )
+        conn.commit()
+        return conn
+
+    def _count_users(self) -> int:
+        where, params = self.shard.where() if self.shard is not None else ("", ())
+        return self._conn.execute(
+            "SELECT COUNT(DISTINCT user_id) FROM review_cards" + where, params
+        ).fetchone()[0]
+
+    def _read_user(self, user_id: int):
+        return self._conn.execute(
+            "SELECT question_id, due, interval, ease, reps FROM review_cards WHERE user_id = ?", (user_id,)
+        ).fetchall()
+
+    def _write(self, upserts, deletes):
+        with self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT INTO review_cards (user_id, question_id, due, interval, ease, reps)"
+                    " VALUES (?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT(user_id, question_id) DO UPDATE SET"
+                    " due = excluded.due, interval = excluded.interval,"
+                    " ease = excluded.ease, reps = excluded.reps",
+                    upserts,
+                )
+            if deletes:
+                self._conn.executemany(
+                    "DELETE FROM review_cards WHERE user_id = ? AND question_id = ?", deletes
+                )
+
+
+def build_review_store(
+    kind: str,
+    db_path: Path,
+    flush_interval: float = 1.0,
+    shard: Shard | None = None,
+    **limits,
+) -> MemoryReviewStore:
+    """
+    kind: "sqlite" (по умолчанию, расписание переживает рестарт) или "memory".
+    shard — доля пользователей воркера (только для sqlite).
+    limits — ttl / max_users / sweep_interval для MemoryReviewStore.
+    """
+    if kind == "sqlite":
+        return SqliteReviewStore(db_path, flush_interval=flush_interval, shard=shard, **limits)
+    if kind != "memory":
+        print(f"⚠️ Неизвестный REVIEW_STORE={kind!r}, используем memory")
+    return MemoryReviewStore(**limits)
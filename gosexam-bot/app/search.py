@@ -0,0 +1,313 @@
+"""
+Полнотекстовый поиск по вопросам и задачам (формулировка + ответ).
+
+Обратный индекс { терм: { doc: вклад } } строится при загрузке контента,
+ранжирование — BM25. Нормализация под русский: casefold, ё→е,
+стоп-слова и лёгкий стемминг (отрезание типичных окончаний).
+
+Перезагрузка контента обновляет индекс инкрементально:
+- stage(snapshot) — в потоке ContentWatcher'а сравнивает отпечатки записей
+  с текущим индексом и токенизирует только новые/изменённые записи;
+- commit(snapshot) — в цикле событий применяет эту дельту (быстро).
+
+Чтобы запрос с частым словом не перебирал десятки тысяч документов,
+по каждому терму берутся только MAX_POSTINGS_PER_TERM документов
+с наибольшим вкладом (списки сортируются лениво и кэшируются).
+"""
+import heapq
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import NamedTuple
+
+
+K1 = 1.2
+B = 0.75
+TEXT_WEIGHT = 2                 # слово из формулировки весит как два слова из ответа
+MAX_POSTINGS_PER_TERM = 2000
+AVGDL_DRIFT = 0.1               # пересчёт вкладов, если средняя длина ушла больше чем на 10%
+SEARCH_LIMIT = 8
+
+QUESTION = "q"
+TASK = "t"
+
+_WORD = re.compile(r"[0-9a-zа-я]+")
+_IMG_MARKER = re.compile(r"img:\S+")
+
+_STOP_WORDS = frozenset(
+    """
+    а без более бы был была были было быть в вам вас ведь во вот все всего всех вы где да даже
+    для до его ее если есть еще же за здесь и из или им их к как какая какой когда кто ли
+    либо между меня мне может мы на над надо нас не него нее нет ни них но ну о об однако он
+    она они оно от очень по под при про с со так также такой там те тем то того тоже той
+    только том ты у уже хотя чего чем что чтобы эта эти это этого этой этом этот эту я
+    """.split()
+)
+
+# окончания — от длинных к коротким, отрезается первое подошедшее
+_ENDINGS = tuple(
+    sorted(
+        """
+        иями ями ами ией иях ого его ому ему ыми ими ешь ишь ете ите ать ять ить еть
+        ая яя ое ее ые ие ый ий ой ей ую юю ов ев ах ях ом ем ам ям ия ию ии ье ья
+        ть ти ет ут ют ит ат ят ла ло ли ны на но
+        ы и а я о е у ю ь й
+        """.split(),
+        key=len,
+        reverse=True,
+    )
+)
+_MIN_STEM = 3
+# те же окончания, сгруппированные по длине: проверка — срез + поиск в множестве
+_ENDINGS_BY_LENGTH = tuple(
+    (length, frozenset(e for e in _ENDINGS if len(e) == length))
+    for length in sorted({len(e) for e in _ENDINGS}, reverse=True)
+)
+
+
+@lru_cache(maxsize=200_000)  # словарь банка конечен — каждое слово стеммится один раз
+def stem(word: str) -> str:
+    if len(word) <= _MIN_STEM or word.isdigit():
+        return word
+    for length, endings in _ENDINGS_BY_LENGTH:
+        if len(word) - length >= _MIN_STEM and word[-length:] in endings:
+            return word[:-length]
+    return word
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    "Такт линии" -> ["такт", "лин"]
+    """
+    if not text:
+        return []
+    text = _IMG_MARKER.sub(" ", text).casefold().replace("ё", "е")
+    return [stem(word) for word in _WORD.findall(text) if word not in _STOP_WORDS]
+
+
+# =========================
+#          ИНДЕКС
+# =========================
+
+def _impact(tf: int, length: int, avgdl: float) -> float:
+    """
+    Вклад терма в BM25 без idf: idf зависит от числа документов
+    и домножается при поиске.
+    """
+    norm = K1 * (1 - B + B * length / avgdl) if avgdl else K1
+    return tf * (K1 + 1) / (tf + norm)
+
+
+class Hit(NamedTuple):
+    kind: str       # QUESTION / TASK
+    id: int
+    score: float
+
+
+class _Doc(NamedTuple):
+    doc: int
+    fingerprint: int
+    terms: Counter
+    length: int
+
+
+class _State(NamedTuple):
+    """
+    Полностью пересобранный индекс — готовится в потоке, в цикле только подменяется.
+    """
+    docs: dict
+    keys: dict
+    postings: dict
+    total_length: int
+    avgdl: float
+
+
+class IndexDelta(NamedTuple):
+    version: int
+    remove: tuple
+    add: tuple                  # (key, fingerprint, terms, length)
+    rebuilt: _State | None      # не None — средняя длина сильно уехала, индекс собран заново
+
+
+class SearchIndex:
+    def __init__(self):
+        self._docs: dict[tuple[str, int], _Doc] = {}
+        self._keys: dict[int, tuple[str, int]] = {}
+        self._postings: dict[str, dict[int, float]] = {}
+        # терм -> [(вклад, doc)] по убыванию, не длиннее MAX_POSTINGS_PER_TERM
+        self._ranked: dict[str, list[tuple[float, int]]] = {}
+        self._next_doc = 0
+        self._total_length = 0
+        self._avgdl = 0.0
+        self._staged: IndexDelta | None = None
+        self.queries = 0
+        self.rebuilds = 0
+
+    def __len__(self):
+        return len(self._docs)
+
+    # ---------- ОБНОВЛЕНИЕ ----------
+
+    def prepare(self, snapshot) -> IndexDelta:
+        """
+        Дельта между индексом и снимком контента. Индекс не меняет,
+        поэтому может выполняться в потоке, пока хендлеры ищут по старому.
+        Если после дельты средняя длина документа уходит больше чем на
+        AVGDL_DRIFT, здесь же собирается весь индекс заново.
+        """
+        current = {}
+        for kind, store in ((QUESTION, snapshot.questions), (TASK, snapshot.tasks)):
+            for entry in store:
+                answer = store.answer(entry["id"]) or ""
+                current[(kind, entry["id"])] = (hash((entry["text"], answer)), entry["text"], answer)
+
+        remove = tuple(
+            key
+            for key, doc in self._docs.items()
+            if key not in current or current[key][0] != doc.fingerprint
+        )
+        add = []
+        for key, (fingerprint, text, answer) in current.items():
+            doc = self._docs.get(key)
+            if doc is not None and doc.fingerprint == fingerprint:
+                continue
+            terms = Counter()
+            for term in tokenize(text):
+                terms[term] += TEXT_WEIGHT
+            terms.update(tokenize(answer))
+            add.append((key, fingerprint, terms, sum(terms.values())))
+
+        total_length = (
+            self._total_length
+            - sum(self._docs[key].length for key in remove)
+            + sum(length for _, _, _, length in add)
+        )
+        count = len(current)
+        avgdl = total_length / count if count else 0.0
+        rebuilt = None
+        if not self._avgdl or abs(avgdl - self._avgdl) > self._avgdl * AVGDL_DRIFT:
+            removed = set(remove)
+            rows = [
+                (key, doc.fingerprint, doc.terms, doc.length)
+                for key, doc in self._docs.items()
+                if key not in removed
+            ]
+            rebuilt = self._build(rows + add, avgdl)
+        return IndexDelta(snapshot.version, remove, tuple(add), rebuilt)
+
+    def stage(self, snapshot):
+        self._staged = self.prepare(snapshot)
+
+    def commit(self, snapshot):
+        """
+        Применяет дельту, подготовленную stage() для этого снимка
+        (или считает её сейчас, если stage не вызывали).
+        """
+        delta = self._staged
+        self._staged = None
+        if delta is None or delta.version != snapshot.version:
+            delta = self.prepare(snapshot)
+        self.apply(delta)
+
+    def apply(self, delta: IndexDelta):
+        if delta.rebuilt is not None:
+            state = delta.rebuilt
+            self._docs = state.docs
+            self._keys = state.keys
+            self._postings = state.postings
+            self._ranked = {}
+            self._next_doc = len(state.docs)
+            self._total_length = state.total_length
+            self._avgdl = state.avgdl
+            self.rebuilds += 1
+            return
+
+        touched = set()
+        for key in delta.remove:
+            doc = self._docs.pop(key, None)
+            if doc is None:
+                continue
+            del self._keys[doc.doc]
+            self._total_length -= doc.length
+            for term in doc.terms:
+                postings = self._postings[term]
+                del postings[doc.doc]
+                if not postings:
+                    del self._postings[term]
+                touched.add(term)
+
+        for key, fingerprint, terms, length in delta.add:
+            doc = _Doc(self._next_doc, fingerprint, terms, length)
+            self._next_doc += 1
+            self._docs[key] = doc
+            self._keys[doc.doc] = key
+            self._total_length += length
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc.doc] = _impact(tf, length, self._avgdl)
+                touched.add(term)
+
+        for term in touched:
+            self._ranked.pop(term, None)
+
+    @staticmethod
+    def _build(rows, avgdl: float) -> _State:
+        docs = {}
+        keys = {}
+        postings: dict[str, dict[int, float]] = {}
+        total_length = 0
+        for number, (key, fingerprint, terms, length) in enumerate(rows):
+            docs[key] = _Doc(number, fingerprint, terms, length)
+            keys[number] = key
+            total_length += length
+            for term, tf in terms.items():
+                postings.setdefault(term, {})[number] = _impact(tf, length, avgdl)
+        return _State(docs, keys, postings, total_length, avgdl)
+
+    # ---------- ПОИСК ----------
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT, kind: str | None = None) -> list[Hit]:
+        """
+        До limit лучших записей по BM25. kind — только вопросы или только задачи.
+        """
+        self.queries += 1
+        terms = set(tokenize(query))
+        if not terms or not self._docs:
+            return []
+
+        total = len(self._docs)
+        scores: dict[int, float] = {}
+        for term in terms:
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for impact, doc in self._top_postings(term, postings):
+                scores[doc] = scores.get(doc, 0.0) + idf * impact
+
+        keys = self._keys
+        candidates = scores.items()
+        if kind is not None:
+            candidates = [(doc, score) for doc, score in candidates if keys[doc][0] == kind]
+        best = heapq.nlargest(limit, candidates, key=lambda item: item[1])
+        return [Hit(keys[doc][0], keys[doc][1], score) for doc, score in best]
+
+    def _top_postings(self, term: str, postings: dict[int, float]):
+        if len(postings) <= MAX_POSTINGS_PER_TERM:
+            return ((impact, doc) for doc, impact in postings.items())
+        ranked = self._ranked.get(term)
+        if ranked is None:
+            ranked = heapq.nlargest(
+                MAX_POSTINGS_PER_TERM, ((impact, doc) for doc, impact in postings.items())
+            )
+            self._ranked[term] = ranked
+        return ranked
+
+    def stats(self) -> dict:
+        return {
+            "docs": len(self._docs),
+            "terms": len(self._postings),
+            "queries": self.queries,
+            "rebuilds": self.rebuilds,
+        }
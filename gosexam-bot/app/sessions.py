@@ -0,0 +1,345 @@
+import asyncio
+import json
+import sqlite3
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+
+# =========================
+#   ШАРД ВОРКЕРА
+# =========================
+
+class Shard(NamedTuple):
+    """
+    Доля пользователей воркера index из count: user_id % count == index —
+    так же фронт раскладывает апдейты (app/workers.py, shard_key).
+    Базы SQLite общие на всех воркеров, поэтому каждый читает и удаляет
+    только строки своих пользователей.
+    """
+    index: int
+    count: int
+
+    def owns(self, user_id: int) -> bool:
+        return user_id % self.count == self.index
+
+    def where(self, column: str = "user_id") -> tuple[str, tuple]:
+        """
+        Условие для SQL. Остаток в SQLite берёт знак делимого, в Python —
+        делителя: ((x % n) + n) % n совпадает с x % n из Python.
+        """
+        return f" WHERE (({column} % ?) + ?) % ? = ?", (self.count, self.count, self.count, self.index)
+
+
+# =========================
+#   СОСТОЯНИЕ ТЕСТА
+# =========================
+
+class QuizState:
+    """
+    Компактное состояние теста одного пользователя:
+    массив id вопросов + два маленьких счётчика и время последнего обращения.
+    __slots__ и array('i') вместо dict+list — в разы меньше памяти на пользователя.
+    """
+
+    __slots__ = ("ids", "index", "correct", "touched")
+
+    def __init__(self, ids, index: int = 0, correct: int = 0):
+        self.ids = array("i", ids)
+        self.index = index
+        self.correct = correct
+        self.touched = time.monotonic()
+
+    def to_json(self) -> str:
+        return json.dumps({"ids": self.ids.tolist(), "index": self.index, "correct": self.correct})
+
+    @classmethod
+    def from_json(cls, raw: str) -> "QuizState":
+        data = json.loads(raw)
+        return cls(data["ids"], data["index"], data["correct"])
+
+
+# =========================
+#   ХРАНИЛИЩЕ СЕССИЙ ТЕСТА
+# =========================
+
+class MemorySessionStore:
+    """
+    Состояния теста знаний в памяти процесса: { user_id: QuizState }.
+
+    Хранилище ограничено:
+    - ttl — сессия, к которой не обращались ttl секунд, считается брошенной
+      и удаляется (при обращении или фоновым sweeper'ом);
+    - max_sessions — при переполнении вытесняется самая давно тронутая (LRU).
+    Порядок в OrderedDict = порядок последнего обращения, поэтому и
+    вытеснение, и чистка просроченных идут с головы за O(удалённых).
+
+    После изменения состояния хендлер обязан вызвать set(),
+    чтобы долговременные хранилища узнали об изменении.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 6 * 3600,
+        max_sessions: int = 100_000,
+        sweep_interval: float = 60.0,
+    ):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sweep_interval = sweep_interval
+        self.expired = 0
+        self.evicted = 0
+        self._states: OrderedDict[int, QuizState] = OrderedDict()
+        self._sweeper: asyncio.Task | None = None
+
+    def get(self, user_id: int) -> QuizState | None:
+        state = self._states.get(user_id)
+        if state is None:
+            return None
+        now = time.monotonic()
+        if now - state.touched > self.ttl:
+            self._drop(user_id)
+            self.expired += 1
+            return None
+        state.touched = now
+        self._states.move_to_end(user_id)
+        return state
+
+    def set(self, user_id: int, state: QuizState):
+        state.touched = time.monotonic()
+        self._states[user_id] = state
+        self._states.move_to_end(user_id)
+        while len(self._states) > self.max_sessions:
+            oldest_id = next(iter(self._states))
+            self._drop(oldest_id)
+            self.evicted += 1
+
+    def pop(self, user_id: int) -> QuizState | None:
+        return self._states.pop(user_id, None)
+
+    def __len__(self):
+        return len(self._states)
+
+    def sweep(self) -> int:
+        """
+        Удаляет просроченные сессии. Возвращает, сколько удалено.
+        """
+        deadline = time.monotonic() - self.ttl
+        removed = 0
+        while self._states:
+            user_id, state = next(iter(self._states.items()))
+            if state.touched > deadline:
+                break
+            self._drop(user_id)
+            removed += 1
+        self.expired += removed
+        return removed
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self._states),
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
+
+    async def start(self):
+        if self._sweeper is None and self.sweep_interval > 0:
+            self._sweeper = asyncio.create_task(self._sweep_loop())
+
+    async def close(self):
+        if self._sweeper is not None:
+            self._sweeper.cancel()
+            try:
+                await self._sweeper
+            except asyncio.CancelledError:
+                pass
+            self._sweeper = None
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+
+    def _drop(self, user_id: int):
+        self._states.pop(user_id, None)
+
+
+class SqliteSessionStore(MemorySessionStore):
+    """
+    Сессии в памяти + запись в локальный SQLite «позади» (write-behind).
+
+    get/set/pop работают только с памятью и никогда не ждут диск.
+    Изменённые (и удалённые по TTL/LRU) user_id копятся в _dirty и раз
+    в flush_interval секунд одной транзакцией сбрасываются в базу
+    в отдельном потоке.
+    При старте сессии читаются из базы, при остановке — финальный сброс.
+    shard — в многопроцессном режиме: читаются и удаляются только строки
+    пользователей этого воркера.
+    """
+
+    def __init__(self, path: Path, flush_interval: float = 1.0, shard: Shard | None = None, **limits):
+        super().__init__(**limits)
+        self.path = path
+        self.shard = shard
+        self.flush_interval = flush_interval
+        self.flushes = 0
+        self.rows_written = 0
+        self._dirty: set[int] = set()
+        self._conn: sqlite3.Connection | None = None
+        self._task: asyncio.Task | None = None
+        self._flush_lock = asyncio.Lock()
+
+    def set(self, user_id: int, state: QuizState):
+        super().set(user_id, state)
+        self._dirty.add(user_id)
+
+    def pop(self, user_id: int) -> QuizState | None:
+        state = super().pop(user_id)
+        self._dirty.add(user_id)
+        return state
+
+    async def start(self):
+        self._conn = await asyncio.to_thread(self._open)
+        rows = await asyncio.to_thread(self._read_all)
+
+        now_wall = time.time()
+        now = time.monotonic()
+        # старые сверху, чтобы порядок OrderedDict совпал с порядком обращений
+        for user_id, raw, updated_at in sorted(rows, key=lambda row: row[2]):
+            idle = now_wall - updated_at
+            if idle > self.ttl:
+                self._dirty.add(user_id)
+                continue
+            try:
+                state = QuizState.from_json(raw)
+            except (ValueError, KeyError):
+                self._dirty.add(user_id)
+                continue
+            state.touched = now - idle
+            self._states[user_id] = state
+        while len(self._states) > self.max_sessions:
+            self._drop(next(iter(self._states)))
+
+        print(f"🧪 Восстановлено сессий теста: {len(self._states)}")
+        await super().start()
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        await super().close()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            await asyncio.to_thread(conn.close)
+
+    async def flush(self):
+        """
+        Сбрасывает накопленные изменения в базу.
+        """
+        async with self._flush_lock:
+            if not self._dirty or self._conn is None:
+                return
+            dirty, self._dirty = self._dirty, set()
+
+            now = time.time()
+            upserts = []
+            deletes = []
+            for user_id in dirty:
+                state = self._states.get(user_id)
+                if state is None:
+                    if self.shard is None or self.shard.owns(user_id):
+                        deletes.append((user_id,))
+                else:
+                    upserts.append((user_id, state.to_json(), now))
+
+            try:
+                await asyncio.to_thread(self._write, upserts, deletes)
+            except sqlite3.Error as e:
+                # вернём в очередь — попробуем на следующем сбросе
+                self._dirty |= dirty
+                print("⚠️ Не удалось сохранить сессии теста:", repr(e))
+                return
+
+            self.flushes += 1
+            self.rows_written += len(upserts) + len(deletes)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update(
+            {
+                "dirty": len(self._dirty),
+                "flushes": self.flushes,
+                "rows_written": self.rows_written,
+            }
+        )
+        return stats
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _drop(self, user_id: int):
+        super()._drop(user_id)
+        self._dirty.add(user_id)
+
+    # ---------- SQLITE (выполняется в потоке) ----------
+
+    def _open(self) -> sqlite3.Connection:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS quiz_sessions ("
+            " user_id INTEGER PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        conn.commit()
+        return conn
+
+    def _read_all(self):
+        where, params = self.shard.where() if self.shard is not None else ("", ())
+        return self._conn.execute(
+            "SELECT user_id, state, updated_at FROM quiz_sessions" + where, params
+        ).fetchall()
+
+    def _write(self, upserts, deletes):
+        with self._conn:
+            if upserts:
+                self._conn.executemany(
+                    "INSERT INTO quiz_sessions (user_id, state, updated_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT(user_id) DO UPDATE SET"
+                    " state = excluded.state, updated_at = excluded.updated_at",
+                    upserts,
+                )
+            if deletes:
+                self._conn.executemany("DELETE FROM quiz_sessions WHERE user_id = ?", deletes)
+
+
+def build_session_store(
+    kind: str,
+    db_path: Path,
+    flush_interval: float = 1.0,
+    shard: Shard | None = None,
+    **limits,
+) -> MemorySessionStore:
+    """
+    kind: "memory" (по умолчанию) или "sqlite".
+    shard — доля пользователей воркера (только для sqlite).
+    limits — ttl / max_sessions / sweep_interval для MemorySessionStore.
+    """
+    if kind == "sqlite":
+        return SqliteSessionStore(db_path, flush_interval=flush_interval, shard=shard, **limits)
+    if kind != "memory":
+        print(f"⚠️ Неизвестный QUIZ_STORE={kind!r}, используем memory")
+    return MemorySessionStore(**limits)
@@ -0,0 +1,178 @@
+import asyncio
+import secrets
+
+from aiohttp import web
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.methods import TelegramMethod
+from aiogram.webhook.aiohttp_server import setup_application
+
+
+class UpdateSlotsMiddleware(BaseMiddleware):
+    """
+    Outer-middleware диспетчера (dp.update): не больше max_in_flight
+    хендлеров одновременно, остальные ждут на семафоре.
+
+    Регистрируется после UserLaneMiddleware (register_handlers), поэтому
+    слот берётся уже внутри полосы пользователя: двойные тапы одного
+    человека ждут его полосу, не занимая слотов, и не задерживают
+    апдейты других пользователей.
+    """
+
+    def __init__(self, max_in_flight: int = 64):
+        self.max_in_flight = max_in_flight
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self._slots = asyncio.Semaphore(max_in_flight)
+
+    async def __call__(self, handler, event, data):
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                result = await handler(event, data)
+            except Exception:
+                self.failed += 1
+                raise
+            else:
+                self.processed += 1
+                return result
+            finally:
+                self.in_flight -= 1
+
+
+class WebhookHandler:
+    """
+    POST-обработчик вебхука: сразу отвечает Телеграму 200 и обрабатывает
+    апдейт в фоне через dp.feed_raw_update. Сколько хендлеров идёт
+    одновременно, ограничивает slots (UpdateSlotsMiddleware).
+
+    Если фоновых задач уже max_backlog (хендлеры не успевают), апдейт
+    не принимается: 503 с Retry-After, и Телеграм пришлёт его позже —
+    память не растёт без предела.
+    Секретный токен (X-Telegram-Bot-Api-Secret-Token) не совпал — 401.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        slots: UpdateSlotsMiddleware,
+        secret_token: str | None = None,
+        max_backlog: int = 1000,
+    ):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.slots = slots
+        self.secret_token = secret_token
+        self.max_backlog = max_backlog
+        self.received = 0
+        self.rejected = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret_token and not secrets.compare_digest(
+            request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), self.secret_token
+        ):
+            return web.Response(body="Unauthorized", status=401)
+        if len(self._tasks) >= self.max_backlog:
+            self.rejected += 1
+            return web.Response(body="Too many pending updates", status=503, headers={"Retry-After": "1"})
+
+        update = await request.json(loads=self.bot.session.json_loads)
+        self.received += 1
+        task = asyncio.create_task(self._feed(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({}, dumps=self.bot.session.json_dumps)
+
+    async def _feed(self, update: dict):
+        # ожидание полосы и слота — внутри диспетчера (outer-middleware)
+        try:
+            result = await self.dispatcher.feed_raw_update(self.bot, update)
+            if isinstance(result, TelegramMethod):
+                await self.dispatcher.silent_call_request(self.bot, result)
+        except Exception as e:
+            print("⚠️ Ошибка обработки апдейта:", repr(e))
+
+    async def close(self):
+        """
+        Дожидается апдейтов, уже принятых в обработку.
+        """
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        in_flight = self.slots.in_flight
+        return {
+            "received": self.received,
+            "rejected": self.rejected,
+            "in_flight": in_flight,
+            "queued": len(self._tasks) - in_flight,
+            "processed": self.slots.processed,
+            "failed": self.slots.failed,
+            "max_in_flight": self.slots.max_in_flight,
+            "max_backlog": self.max_backlog,
+        }
+
+
+def build_webhook_app(
+    bot: Bot,
+    dp: Dispatcher,
+    path: str,
+    secret_token: str | None = None,
+    max_in_flight: int = 64,
+    public_url: str | None = None,
+    max_backlog: int = 1000,
+) -> web.Application:
+    """
+    aiohttp-приложение с двумя маршрутами:
+    - POST path      — апдейты от Телеграма (или записанные JSON при локальной проверке)
+    - GET  /healthz  — статус и счётчики обработчика
+    Если задан public_url — при старте регистрирует вебхук в Телеграме.
+    Вызывать после register_handlers(dp): ограничитель слотов должен
+    встать внутрь полосы пользователя.
+    """
+    app = web.Application()
+    slots = UpdateSlotsMiddleware(max_in_flight)
+    dp.update.outer_middleware(slots)
+    handler = WebhookHandler(dp, bot, slots, secret_token=secret_token, max_backlog=max_backlog)
+    app.router.add_post(path, handler.handle)
+
+    async def health(request: web.Request) -> web.Response:
+        return web.json_response({"status": "ok", "webhook": handler.stats()})
+
+    app.router.add_get("/healthz", health)
+
+    if public_url:
+        async def on_startup(*args, **kwargs):
+            await bot.set_webhook(
+                url=public_url.rstrip("/") + path,
+                secret_token=secret_token,
+                allowed_updates=dp.resolve_used_update_types(),
+            )
+            print("🌐 Вебхук зарегистрирован:", public_url.rstrip("/") + path)
+
+        dp.startup.register(on_startup)
+
+    async def on_shutdown(app: web.Application):
+        await handler.close()
+
+    app.on_shutdown.append(on_shutdown)
+    setup_application(app, dp, bot=bot)
+    app["webhook_handler"] = handler
+    return app
+
+
+async def run_webhook(app: web.Application, host: str, port: int):
+    """
+    Поднимает сервер и ждёт до отмены задачи (Ctrl+C).
+    """
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, host=host, port=port)
+    await site.start()
+    print(f"🌐 Вебхук-сервер слушает http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
@@ -0,0 +1,315 @@
+"""
+Многопроцессный режим: фронт-процесс получает апдейты (polling или webhook)
+и раскладывает их по N воркерам по from_user.id.
+
+Все апдейты одного пользователя всегда попадают в один и тот же воркер,
+поэтому его сессия теста живёт только там, а порядок апдейтов сохраняется.
+Фронт не разбирает апдейты в pydantic-модели — работает с сырым JSON,
+модели строит уже воркер.
+"""
+import asyncio
+import multiprocessing
+import os
+import secrets
+import time
+from pathlib import Path
+
+from aiohttp import ClientError, ClientSession, ClientTimeout, web
+
+
+# Поля апдейта, в которых лежит объект с "from" / "chat"
+_UPDATE_KINDS = (
+    "message",
+    "edited_message",
+    "callback_query",
+    "inline_query",
+    "chosen_inline_result",
+    "my_chat_member",
+    "chat_member",
+)
+
+
+def shard_key(update: dict) -> int:
+    """
+    Ключ шардирования: id пользователя, иначе id чата, иначе update_id.
+    """
+    for kind in _UPDATE_KINDS:
+        obj = update.get(kind)
+        if not obj:
+            continue
+        user = obj.get("from")
+        if user and "id" in user:
+            return user["id"]
+        chat = obj.get("chat") or (obj.get("message") or {}).get("chat")
+        if chat and "id" in chat:
+            return chat["id"]
+    return update.get("update_id", 0)
+
+
+# =========================
+#   ВОРКЕР
+# =========================
+
+def worker_main(index: int, queue, results, token: str, api_base: str | None, options: dict):
+    """
+    Точка входа процесса-воркера (spawn).
+    """
+    asyncio.run(_worker(index, queue, results, token, api_base, options))
+
+
+async def _worker(index: int, queue, results, token: str, api_base: str | None, options: dict):
+    # импортируем здесь: в процессе-воркере, а не во фронте
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.telegram import TelegramAPIServer
+
+    from . import handlers
+    from .handlers import (
+        CALLBACKS,
+        content_watcher,
+        load_initial_content,
+        register_handlers,
+        set_edit_in_place,
+        set_quiz_options,
+        set_banks_budget,
+        set_cache_dir,
+        set_quiz_sessions,
+        set_review_store,
+        router,
+    )
+    from .metrics import install_metrics, start_metrics_server, watch_stats
+    from .review import build_review_store
+    from .keyboards import PreparedMarkupSession
+    from .outbox import OutboundMiddleware, OutboundScheduler
+    from .sessions import Shard, build_session_store
+
+    if api_base:
+        session = PreparedMarkupSession(api=TelegramAPIServer.from_base(api_base))
+    else:
+        session = PreparedMarkupSession()
+    bot = Bot(token=token, session=session)
+    outbound = OutboundScheduler(**options.get("outbound", {}))
+    bot.session.middleware(OutboundMiddleware(outbound, max_retries=options.get("outbound_retries", 3)))
+    dp = Dispatcher()
+    register_handlers(dp)
+    set_edit_in_place(options.get("edit_in_place", False))
+    set_quiz_options(*options.get("quiz", (5, 50)))
+    if "banks_budget" in options:
+        set_banks_budget(options["banks_budget"])
+    if "cache_dir" in options:
+        # нагрузочные тесты: кэши во временном каталоге, а не в боевом cache/
+        set_cache_dir(Path(options["cache_dir"]))
+    file_ids = handlers.FILE_IDS
+    metrics = None
+    metrics_host, metrics_port = options.get("metrics", ("127.0.0.1", 0))
+    if metrics_port:
+        install_metrics(dp, router, CALLBACKS, bot.session)
+        metrics = await start_metrics_server(metrics_host, metrics_port + index)
+
+    # базы общие: каждый воркер поднимает и чистит только своих пользователей
+    shard = Shard(index, options.get("workers", 1))
+    sessions = build_session_store(**options.get("sessions", {"kind": "memory", "db_path": None}), shard=shard)
+    reviews = build_review_store(**options.get("reviews", {"kind": "memory", "db_path": None}), shard=shard)
+    # контент грузится в потоке, пока открываются хранилища
+    await asyncio.gather(load_initial_content(), sessions.start(), reviews.start(), file_ids.start())
+    set_quiz_sessions(sessions)
+    set_review_store(reviews)
+    if metrics is not None:
+        watch_stats("outbound", "Очередь исходящих запросов", outbound.stats)
+        watch_stats("quiz_sessions", "Сессии теста знаний", sessions.stats)
+    # снимок контента у каждого воркера свой: перезагружает его сам воркер
+    watcher = None
+    reload_interval = options.get("content_reload_interval", 0)
+    if reload_interval > 0:
+        watcher = content_watcher(reload_interval)
+        watcher.start()
+
+    max_in_flight = options.get("max_in_flight", 32)
+    slots = asyncio.Semaphore(max_in_flight)
+    # последняя задача по каждому пользователю: следующая ждёт её завершения
+    lanes: dict[int, asyncio.Task] = {}
+    processed = 0
+    failed = 0
+
+    async def run(prev: asyncio.Task | None, update: dict):
+        nonlocal processed, failed
+        if prev is not None:
+            await asyncio.wait([prev])
+        async with slots:
+            try:
+                await dp.feed_raw_update(bot, update)
+            except Exception as e:
+                failed += 1
+                print(f"⚠️ [worker {index}] ошибка обработки апдейта:", repr(e))
+            else:
+                processed += 1
+
+    def release(key: int, task: asyncio.Task):
+        if lanes.get(key) is task:
+            del lanes[key]
+
+    results.put({"worker": index, "ready": True})
+    started = time.perf_counter()
+    while True:
+        update = await asyncio.to_thread(queue.get)
+        if update is None:
+            break
+        key = shard_key(update)
+        task = asyncio.create_task(run(lanes.get(key), update))
+        lanes[key] = task
+        task.add_done_callback(lambda t, k=key: release(k, t))
+
+    if lanes:
+        await asyncio.wait(list(lanes.values()))
+    elapsed = time.perf_counter() - started
+
+    if watcher is not None:
+        await watcher.stop()
+    await sessions.close()
+    await reviews.close()
+    await file_ids.close()
+    await outbound.close()
+    if metrics is not None:
+        await metrics.cleanup()
+    await bot.session.close()
+    results.put(
+        {
+            "worker": index,
+            "pid": os.getpid(),
+            "processed": processed,
+            "failed": failed,
+            "elapsed": elapsed,
+            "outbound": outbound.stats(),
+        }
+    )
+
+
+# =========================
+#   ФРОНТ / ПУЛ
+# =========================
+
+class WorkerPool:
+    """
+    Пул процессов-воркеров. dispatch(update) кладёт сырой апдейт
+    в очередь воркера shard_key(update) % workers.
+    """
+
+    def __init__(self, workers: int, token: str, api_base: str | None = None, options: dict | None = None):
+        self.workers = workers
+        self.token = token
+        self.api_base = api_base
+        self.options = {**(options or {}), "workers": workers}
+        self.dispatched = [0] * workers
+        ctx = multiprocessing.get_context("spawn")
+        self._results = ctx.Queue()
+        self._queues = [ctx.Queue() for _ in range(workers)]
+        self._processes = [
+            ctx.Process(
+                target=worker_main,
+                args=(i, self._queues[i], self._results, token, api_base, self.options),
+                name=f"bot-worker-{i}",
+                daemon=True,
+            )
+            for i in range(workers)
+        ]
+
+    def start(self):
+        for process in self._processes:
+            process.start()
+        print(f"🧵 Запущено воркеров: {self.workers}")
+
+    async def wait_ready(self, timeout: float = 120.0):
+        """
+        Ждёт, пока все воркеры загрузят контент и будут готовы принимать апдейты.
+        """
+        for _ in self._processes:
+            message = await asyncio.to_thread(self._results.get, True, timeout)
+            assert message.get("ready"), message
+
+    def dispatch(self, update: dict):
+        shard = shard_key(update) % self.workers
+        self._queues[shard].put(update)
+        self.dispatched[shard] += 1
+
+    async def stop(self, timeout: float = 30.0) -> list[dict]:
+        """
+        Просит воркеров доработать очередь и завершиться.
+        Возвращает их итоговую статистику.
+        """
+        for queue in self._queues:
+            queue.put(None)
+        results = []
+        for _ in self._processes:
+            try:
+                results.append(await asyncio.to_thread(self._results.get, True, timeout))
+            except Exception:
+                break
+        for process in self._processes:
+            await asyncio.to_thread(process.join, 5)
+            if process.is_alive():
+                process.terminate()
+        return sorted(results, key=lambda r: r["worker"])
+
+    # ---------- ИСТОЧНИКИ АПДЕЙТОВ ----------
+
+    async def run_polling(self, api_base: str | None = None, poll_timeout: int = 30):
+        """
+        Long polling getUpdates сырым HTTP без разбора в модели.
+        Сетевые ошибки, обрывы соединения и не-JSON ответы (502 от прокси)
+        не роняют цикл: пауза и следующий запрос.
+        """
+        base = (api_base or self.api_base or "https://api.telegram.org").rstrip("/")
+        url = f"{base}/bot{self.token}/getUpdates"
+        offset = None
+        async with ClientSession(timeout=ClientTimeout(total=poll_timeout + 10)) as http:
+            while True:
+                params = {"timeout": poll_timeout}
+                if offset is not None:
+                    params["offset"] = offset
+                try:
+                    async with http.get(url, params=params) as resp:
+                        data = await resp.json()
+                except (asyncio.TimeoutError, OSError, ClientError, ValueError) as e:
+                    # ClientError: обрыв соединения, ContentTypeError на HTML-странице 502;
+                    # ValueError: битый JSON
+                    print("⚠️ getUpdates:", repr(e))
+                    await asyncio.sleep(1)
+                    continue
+                if not isinstance(data, dict):
+                    print("⚠️ getUpdates: неожиданный ответ", repr(data)[:200])
+                    await asyncio.sleep(1)
+                    continue
+                if not data.get("ok"):
+                    retry_after = (data.get("parameters") or {}).get("retry_after", 1)
+                    print("⚠️ getUpdates:", data.get("description"))
+                    await asyncio.sleep(retry_after)
+                    continue
+                for update in data["result"]:
+                    self.dispatch(update)
+                    offset = update["update_id"] + 1
+
+    def webhook_app(self, path: str, secret_token: str | None = None) -> web.Application:
+        """
+        Вебхук-фронт: проверяет секрет и сразу раскладывает JSON по воркерам.
+        """
+        async def handle(request: web.Request) -> web.Response:
+            if secret_token and not secrets.compare_digest(
+                request.headers.get("X-Telegram-Bot-Api-Secret-Token", ""), secret_token
+            ):
+                return web.Response(body="Unauthorized", status=401)
+            self.dispatch(await request.json())
+            return web.json_response({})
+
+        async def health(request: web.Request) -> web.Response:
+            return web.json_response(
+                {
+                    "status": "ok",
+                    "workers": self.workers,
+                    "alive": sum(p.is_alive() for p in self._processes),
+                    "dispatched": self.dispatched,
+                }
+            )
+
+        app = web.Application()
+        app.router.add_post(path, handle)
+        app.router.add_get("/healthz", health)
+        return app
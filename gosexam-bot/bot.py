@@ -1,29 +1,240 @@
 import asyncio
 import os
+import time
 from pathlib import Path
 from aiogram import Bot, Dispatcher
 from dotenv import load_dotenv
-from app.handlers import register_handlers
+from app.handlers import (
+    register_handlers,
+    router,
+    CALLBACKS,
+    FILE_IDS,
+    IMAGES,
+    SEARCH,
+    INLINE_RESULTS,
+    QUIZ,
+    BANKS,
+    USER_LANES,
+    content_watcher,
+    load_initial_content,
+    set_quiz_sessions,
+    set_review_store,
+    set_edit_in_place,
+    set_quiz_options,
+    set_banks_budget,
+)
+from app.keyboards import KEYBOARDS, PreparedMarkupSession
+from app.metrics import install_metrics, start_metrics_server, watch_stats
+from app.outbox import OutboundMiddleware, OutboundScheduler
+from app.review import build_review_store
+from app.sessions import build_session_store
+from app.webhook import build_webhook_app, run_webhook
+from app.workers import WorkerPool
 
 ENV_PATH = Path(__file__).with_name(".env")
-loaded = load_dotenv(dotenv_path=ENV_PATH, override=True)
 
-# Fallback на случай скрытого BOM в ключе
-TOKEN = os.getenv("BOT_TOKEN") or os.environ.get("\ufeffBOT_TOKEN")
+# модуль config.py — импортируется в load_config(), после чтения .env
+config = None
+
+
+def load_config():
+    """
+    Читает .env рядом с bot.py (при запуске, не при импорте) и импортирует
+    config: его значения берутся из окружения, поэтому .env — раньше.
+    """
+    global config
+    load_dotenv(dotenv_path=ENV_PATH, override=True)
+    import config as loaded
+
+    config = loaded
+    return config
+
+
+def read_token() -> str | None:
+    """
+    BOT_TOKEN из окружения (после load_config() — и из .env).
+    """
+    # Fallback на случай скрытого BOM в ключе
+    return os.getenv("BOT_TOKEN") or os.environ.get("\ufeffBOT_TOKEN")
+
+
+def data_path(value: str) -> Path:
+    """
+    Относительные пути из config — от папки бота.
+    """
+    path = Path(value)
+    if not path.is_absolute():
+        path = Path(__file__).parent / path
+    return path
+
+
+def banks_budget() -> int:
+    return int(config.BANKS_MEMORY_MB * 1024 * 1024)
+
+
+def session_store_options() -> dict:
+    """
+    Параметры хранилища сессий теста из config (передаются и воркерам).
+    """
+    quiz_db_path = data_path(config.QUIZ_DB_PATH)
+    return {
+        "kind": config.QUIZ_STORE,
+        "db_path": quiz_db_path,
+        "flush_interval": config.QUIZ_FLUSH_INTERVAL,
+        "ttl": config.QUIZ_TTL,
+        "max_sessions": config.QUIZ_MAX_SESSIONS,
+        "sweep_interval": config.QUIZ_SWEEP_INTERVAL,
+    }
+
+
+def review_store_options() -> dict:
+    """
+    Параметры хранилища расписаний повторения (передаются и воркерам).
+    """
+    return {
+        "kind": config.REVIEW_STORE,
+        "db_path": data_path(config.REVIEW_DB_PATH),
+        "flush_interval": config.QUIZ_FLUSH_INTERVAL,
+        "ttl": config.REVIEW_TTL,
+        "max_users": config.REVIEW_MAX_USERS,
+        "sweep_interval": config.QUIZ_SWEEP_INTERVAL,
+    }
+
+
+def outbound_options(workers: int = 1) -> dict:
+    """
+    Лимиты исходящих сообщений из config. Общий лимит бота делится
+    между процессами-воркерами: у каждого свой планировщик.
+    """
+    return {
+        "global_rate": config.OUTBOUND_GLOBAL_RATE / max(workers, 1),
+        "chat_rate": config.OUTBOUND_CHAT_RATE,
+        "chat_burst": config.OUTBOUND_CHAT_BURST,
+        "group_rate": config.OUTBOUND_GROUP_PER_MINUTE / 60,
+    }
+
+
+async def run_worker_pool(bot: Bot):
+    """
+    Фронт многопроцессного режима: апдейты принимает этот процесс,
+    обрабатывают config.WORKERS процессов-воркеров.
+    """
+    pool = WorkerPool(
+        config.WORKERS,
+        token=bot.token,
+        options={
+            "sessions": session_store_options(),
+            "reviews": review_store_options(),
+            "max_in_flight": config.WORKER_MAX_IN_FLIGHT,
+            "outbound": outbound_options(config.WORKERS),
+            "outbound_retries": config.OUTBOUND_MAX_RETRIES,
+            "edit_in_place": config.NAV_EDIT_IN_PLACE,
+            "quiz": (config.QUIZ_LENGTH, config.QUIZ_AVOID_RECENT),
+            "banks_budget": banks_budget(),
+            "metrics": (config.METRICS_HOST, config.METRICS_PORT),
+            "content_reload_interval": config.CONTENT_RELOAD_INTERVAL,
+        },
+    )
+    pool.start()
+    await pool.wait_ready()
+    print("✅ Бот запущен. Нажми Ctrl+C для остановки.")
+    try:
+        if config.BOT_MODE == "webhook":
+            if config.WEBHOOK_URL:
+                await bot.set_webhook(
+                    url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+                    secret_token=config.WEBHOOK_SECRET or None,
+                )
+            app = pool.webhook_app(config.WEBHOOK_PATH, config.WEBHOOK_SECRET or None)
+            await run_webhook(app, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+        else:
+            await pool.run_polling()
+    finally:
+        for result in await pool.stop():
+            print("🧵 Воркер:", result)
+        await bot.session.close()
+
 
 async def main():
-    # Диагностика — временно
-    print("cwd:", os.getcwd())
-    print(".env path:", ENV_PATH)
-    print(".env exists:", ENV_PATH.exists())
-    print("dotenv loaded:", loaded)
-    print("TOKEN present:", bool(TOKEN))
-    assert TOKEN, "BOT_TOKEN не найден. Проверь .env рядом с bot.py"
-    bot = Bot(token=TOKEN)
+    started = time.perf_counter()
+    load_config()
+    token = read_token()
+    assert token, f"BOT_TOKEN не найден. Проверь {ENV_PATH}"
+    bot = Bot(token=token, session=PreparedMarkupSession())
+
+    if config.WORKERS > 0:
+        await run_worker_pool(bot)
+        return
+
+    outbound = OutboundScheduler(**outbound_options())
+    bot.session.middleware(OutboundMiddleware(outbound, max_retries=config.OUTBOUND_MAX_RETRIES))
+
     dp = Dispatcher()
     register_handlers(dp)
-    print("✅ Бот запущен. Нажми Ctrl+C для остановки.")
-    await dp.start_polling(bot)
+    set_edit_in_place(config.NAV_EDIT_IN_PLACE)
+    set_quiz_options(config.QUIZ_LENGTH, config.QUIZ_AVOID_RECENT)
+    set_banks_budget(banks_budget())
+
+    metrics = None
+    if config.METRICS_PORT:
+        install_metrics(dp, router, CALLBACKS, bot.session)
+        metrics = await start_metrics_server(config.METRICS_HOST, config.METRICS_PORT)
+
+    sessions = build_session_store(**session_store_options())
+    reviews = build_review_store(**review_store_options())
+
+    # Контент грузится в потоке, пока бот подключается к Телеграму
+    # (getMe, его же потом берёт dispatcher) и открываются хранилища.
+    me, *_ = await asyncio.gather(
+        bot.me(),
+        load_initial_content(),
+        sessions.start(),
+        reviews.start(),
+        FILE_IDS.start(),
+    )
+    set_quiz_sessions(sessions)
+    set_review_store(reviews)
+    if metrics is not None:
+        watch_stats("outbound", "Очередь исходящих запросов", outbound.stats)
+        watch_stats("quiz_sessions", "Сессии теста знаний", sessions.stats)
+
+    watcher = None
+    if config.CONTENT_RELOAD_INTERVAL > 0:
+        watcher = content_watcher(config.CONTENT_RELOAD_INTERVAL)
+        watcher.start()
+
+    print(f"✅ Бот @{me.username} запущен за {time.perf_counter() - started:.2f} с. Нажми Ctrl+C для остановки.")
+    try:
+        if config.BOT_MODE == "webhook":
+            app = build_webhook_app(
+                bot,
+                dp,
+                path=config.WEBHOOK_PATH,
+                secret_token=config.WEBHOOK_SECRET or None,
+                max_in_flight=config.WEBHOOK_MAX_IN_FLIGHT,
+                public_url=config.WEBHOOK_URL or None,
+                max_backlog=config.WEBHOOK_MAX_BACKLOG,
+            )
+            await run_webhook(app, config.WEBHOOK_HOST, config.WEBHOOK_PORT)
+        else:
+            await dp.start_polling(bot)
+    finally:
+        if watcher is not None:
+            await watcher.stop()
+        await sessions.close()
+        await reviews.close()
+        await FILE_IDS.close()
+        await outbound.close()
+        if metrics is not None:
+            await metrics.cleanup()
+        print("🧪 Сессии теста:", sessions.stats(), "подбор:", QUIZ.stats())
+        print("🔁 Повторение:", reviews.stats())
+        print("📤 Исходящие:", outbound.stats())
+        print("🖼 Кэш file_id:", FILE_IDS.stats(), "варианты:", IMAGES.stats())
+        print("⌨️ Клавиатуры:", KEYBOARDS.stats())
+        print("🔎 Поиск:", SEARCH.stats(), "inline:", INLINE_RESULTS.stats())
+        print("📚 Банки:", BANKS.stats())
+        print("🚦 Очереди пользователей:", USER_LANES.stats())
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
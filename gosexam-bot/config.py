@@ -1,5 +1,74 @@
-from dotenv import load_dotenv
 import os
 
-load_dotenv()
-API_TOKEN = os.getenv("API_TOKEN")
\ No newline at end of file
+# Значения берутся из окружения в момент импорта. .env сюда не читается:
+# его подгружает bot.load_config() перед импортом этого модуля.
+API_TOKEN = os.getenv("API_TOKEN")
+
+# Горячая перезагрузка data/*.txt: период опроса файлов в секундах (0 — выключено).
+# При WORKERS > 0 файлы опрашивает каждый воркер сам.
+CONTENT_RELOAD_INTERVAL = float(os.getenv("CONTENT_RELOAD_INTERVAL", "2"))
+
+# Хранилище сессий теста знаний: "memory" или "sqlite" (переживает рестарт)
+QUIZ_STORE = os.getenv("QUIZ_STORE", "memory")
+QUIZ_DB_PATH = os.getenv("QUIZ_DB_PATH", "cache/quiz_sessions.sqlite3")
+# Как часто (сек) сбрасывать изменения сессий в SQLite
+QUIZ_FLUSH_INTERVAL = float(os.getenv("QUIZ_FLUSH_INTERVAL", "1"))
+# Брошенные тесты: через сколько секунд простоя сессия удаляется,
+# максимум живых сессий (LRU) и период фоновой чистки
+QUIZ_TTL = float(os.getenv("QUIZ_TTL", str(6 * 3600)))
+QUIZ_MAX_SESSIONS = int(os.getenv("QUIZ_MAX_SESSIONS", "100000"))
+QUIZ_SWEEP_INTERVAL = float(os.getenv("QUIZ_SWEEP_INTERVAL", "60"))
+# Длина теста и сколько последних показанных элементов не повторять в новом тесте
+QUIZ_LENGTH = int(os.getenv("QUIZ_LENGTH", "5"))
+QUIZ_AVOID_RECENT = int(os.getenv("QUIZ_AVOID_RECENT", "50"))
+
+# Интервальное повторение: где хранить расписания — "sqlite" (переживает
+# рестарт) или "memory"; сбрасываются на диск с тем же QUIZ_FLUSH_INTERVAL
+REVIEW_STORE = os.getenv("REVIEW_STORE", "sqlite")
+REVIEW_DB_PATH = os.getenv("REVIEW_DB_PATH", "cache/review.sqlite3")
+# Сколько секунд простоя держать расписание пользователя в памяти и максимум
+# пользователей в памяти (LRU). В sqlite выгруженное читается из базы заново,
+# в memory — теряется. Чистка идёт с периодом QUIZ_SWEEP_INTERVAL
+REVIEW_TTL = float(os.getenv("REVIEW_TTL", str(24 * 3600)))
+REVIEW_MAX_USERS = int(os.getenv("REVIEW_MAX_USERS", "100000"))
+
+# Банки по предметам (data/<предмет>/questions.txt, tasks.txt): сколько МБ
+# файлов банков держать загруженными, сверх — выгружаются давно не открытые
+BANKS_MEMORY_MB = float(os.getenv("BANKS_MEMORY_MB", "64"))
+
+# Режим получения апдейтов: "polling" (по умолчанию) или "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+# Вебхук: где слушать, по какому пути, публичный адрес для setWebhook
+# (пустой WEBHOOK_URL — вебхук не регистрируется, удобно для локальной проверки)
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+# Сколько апдейтов обрабатывается одновременно
+WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "64"))
+# Сколько принятых апдейтов может ждать обработки; сверх — 503, Телеграм повторит позже
+WEBHOOK_MAX_BACKLOG = int(os.getenv("WEBHOOK_MAX_BACKLOG", "1000"))
+
+# Многопроцессный режим: число процессов-воркеров (0 — всё в одном процессе)
+# и сколько апдейтов каждый воркер обрабатывает одновременно
+WORKERS = int(os.getenv("WORKERS", "0"))
+WORKER_MAX_IN_FLIGHT = int(os.getenv("WORKER_MAX_IN_FLIGHT", "32"))
+
+# Навигация по вопросам/задачам редактированием сообщения вместо новых
+# (1 — включено): текстовая запись = один вызов API вместо двух
+NAV_EDIT_IN_PLACE = os.getenv("NAV_EDIT_IN_PLACE", "0") == "1"
+
+# Исходящие сообщения (лимиты Telegram): всего в секунду на бота,
+# в секунду на личный чат и запас на короткий всплеск, в минуту на группу.
+# Сколько раз повторять запрос после 429 (retry_after)
+OUTBOUND_GLOBAL_RATE = float(os.getenv("OUTBOUND_GLOBAL_RATE", "30"))
+OUTBOUND_CHAT_RATE = float(os.getenv("OUTBOUND_CHAT_RATE", "1"))
+OUTBOUND_CHAT_BURST = float(os.getenv("OUTBOUND_CHAT_BURST", "3"))
+OUTBOUND_GROUP_PER_MINUTE = float(os.getenv("OUTBOUND_GROUP_PER_MINUTE", "20"))
+OUTBOUND_MAX_RETRIES = int(os.getenv("OUTBOUND_MAX_RETRIES", "3"))
+
+# Метрики Prometheus: GET /metrics на METRICS_HOST:METRICS_PORT (0 — выключено).
+# В многопроцессном режиме воркер i слушает METRICS_PORT + i
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
\ No newline at end of file
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# тесты запускаются из папки бота: python -m pytest
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
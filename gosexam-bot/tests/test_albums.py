@@ -0,0 +1,134 @@
+import asyncio
+import datetime
+import itertools
+
+from aiogram import Bot
+from aiogram.client.session.base import BaseSession
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendMediaGroup, SendMessage, SendPhoto
+from aiogram.types import Chat, FSInputFile, Message, PhotoSize
+
+from app import handlers
+from app.file_cache import FileIdCache
+from app.images import ImageVariants
+from app.render import MAX_TG_CAPTION, build_plan
+
+
+_ids = itertools.count(1)
+
+
+def sent_message(text=None, photo=False) -> Message:
+    message_id = next(_ids)
+    return Message(
+        message_id=message_id,
+        date=datetime.datetime.now(),
+        chat=Chat(id=7, type="private"),
+        text=text,
+        photo=[PhotoSize(file_id=f"F{message_id}", file_unique_id="u", width=1, height=1)] if photo else None,
+    )
+
+
+class RecordingSession(BaseSession):
+    """
+    Вместо Bot API: записывает методы и отвечает как Телеграм.
+    reject_file_ids — альбом, где есть уже известный file_id, отвергается.
+    """
+
+    def __init__(self, reject_file_ids=False):
+        super().__init__()
+        self.calls = []
+        self.reject_file_ids = reject_file_ids
+
+    async def close(self):
+        pass
+
+    async def stream_content(self, *args, **kwargs):
+        yield b""
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls.append(method)
+        if isinstance(method, SendMediaGroup):
+            if self.reject_file_ids and any(isinstance(m.media, str) for m in method.media):
+                raise TelegramBadRequest(method, "wrong file identifier")
+            return [sent_message(photo=True) for _ in method.media]
+        if isinstance(method, SendPhoto):
+            return sent_message(photo=True)
+        return sent_message(text=getattr(method, "text", None))
+
+
+def make_images(tmp_path, count):
+    images = []
+    for i in range(count):
+        path = tmp_path / "data" / f"table_{i:02}.png"
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"png %d" % i)
+        images.append(path)
+    return tuple(images)
+
+
+def isolate_caches(monkeypatch, tmp_path):
+    monkeypatch.setattr(handlers, "FILE_IDS", FileIdCache(tmp_path / "file_ids.json", tmp_path / "data"))
+    monkeypatch.setattr(handlers, "IMAGES", ImageVariants(tmp_path / "images", base_dir=tmp_path / "data"))
+
+
+def send_photos(session, images, caption=None):
+    async def scenario():
+        bot = Bot("42:TEST", session=session)
+        await handlers.send_photos(sent_message().as_(bot), images, caption=caption)
+
+    asyncio.run(scenario())
+    return session.calls
+
+
+def shape(calls):
+    result = []
+    for method in calls:
+        if isinstance(method, SendMediaGroup):
+            result.append(("album", len(method.media), method.media[0].caption))
+        elif isinstance(method, SendPhoto):
+            result.append(("photo",))
+        elif isinstance(method, SendMessage):
+            result.append(("text", method.text))
+    return result
+
+
+def test_caption_goes_with_the_album_only_when_it_fits():
+    images = (handlers.DATA_DIR / "a.png", handlers.DATA_DIR / "b.png")
+    plan = build_plan("Вопрос 1:", "Текст", images)
+    assert (plan.chunks, plan.caption) == ((), "Вопрос 1:\n\nТекст")
+
+    # одна картинка — не альбом: текст отдельным сообщением
+    plan = build_plan("Вопрос 1:", "Текст", images[:1])
+    assert (plan.chunks, plan.caption) == (("Вопрос 1:\n\nТекст",), None)
+
+    long_text = "x" * MAX_TG_CAPTION
+    plan = build_plan("Вопрос 1:", long_text, images)
+    assert plan.caption is None and plan.chunks == (f"Вопрос 1:\n\n{long_text}",)
+
+
+def test_images_are_split_into_albums_of_ten(monkeypatch, tmp_path):
+    isolate_caches(monkeypatch, tmp_path)
+    calls = send_photos(RecordingSession(), make_images(tmp_path, 21), caption="Подпись")
+
+    # хвост из одной картинки — обычным sendPhoto; подпись только у первого альбома
+    assert shape(calls) == [("album", 10, "Подпись"), ("album", 10, None), ("photo",)]
+    assert handlers.FILE_IDS.stats()["entries"] == 21
+
+
+def test_lone_image_with_caption_is_sent_after_the_text(monkeypatch, tmp_path):
+    isolate_caches(monkeypatch, tmp_path)
+    calls = send_photos(RecordingSession(), make_images(tmp_path, 1), caption="Подпись")
+    assert shape(calls) == [("text", "Подпись"), ("photo",)]
+
+
+def test_rejected_album_falls_back_to_single_photos(monkeypatch, tmp_path):
+    isolate_caches(monkeypatch, tmp_path)
+    images = make_images(tmp_path, 3)
+    send_photos(RecordingSession(), images)  # file_id запомнены
+
+    session = RecordingSession(reject_file_ids=True)
+    calls = send_photos(session, images, caption="Подпись")
+
+    assert shape(calls) == [("album", 3, "Подпись"), ("text", "Подпись"), ("photo",), ("photo",), ("photo",)]
+    # забытые file_id не переиспользуются: картинки загружаются с диска заново
+    assert all(isinstance(method.photo, FSInputFile) for method in calls[2:])
@@ -0,0 +1,120 @@
+import asyncio
+
+from app.banks import BankRegistry
+from app.content import ContentSnapshot
+
+
+def no_compilers(number):
+    return None, None
+
+
+def make_bank(data_dir, slug, count=1, title=None):
+    path = data_dir / slug
+    path.mkdir(parents=True, exist_ok=True)
+    lines = [f"{i}|Вопрос {i} {slug}|Ответ {i}" for i in range(1, count + 1)]
+    (path / "questions.txt").write_text("\n".join(lines) + "\n", encoding="utf-8")
+    if title:
+        (path / "title.txt").write_text(title + "\n", encoding="utf-8")
+    return path
+
+
+def test_numbers_survive_restart_and_are_not_reused(tmp_path):
+    data_dir = tmp_path / "data"
+    numbers_path = tmp_path / "cache" / "banks.json"
+    make_bank(data_dir, "econ", title="Экономика")
+    make_bank(data_dir, "law")
+
+    first = BankRegistry(data_dir, no_compilers, numbers_path=numbers_path)
+    first.discover()
+    numbers = {info.slug: info.number for info in first.banks()}
+    assert sorted(numbers.values()) == [1, 2]
+    assert first.info(numbers["econ"]).title == "Экономика"
+
+    # после рестарта: econ удалён, добавлен hist — law сохраняет номер, номер econ не переиспользуется
+    for name in ("questions.txt", "title.txt"):
+        (data_dir / "econ" / name).unlink()
+    (data_dir / "econ").rmdir()
+    make_bank(data_dir, "hist")
+    second = BankRegistry(data_dir, no_compilers, numbers_path=numbers_path)
+    second.discover()
+
+    assert second.find("law").number == numbers["law"]
+    assert second.find("hist").number == 3
+    assert second.find("econ") is None
+    assert second.info(numbers["econ"]) is None
+
+
+def test_stage_does_not_touch_the_list_until_commit(tmp_path):
+    data_dir = tmp_path / "data"
+    registry = BankRegistry(data_dir, no_compilers)
+    registry.discover()
+    assert registry.menu() == ()
+
+    make_bank(data_dir, "econ")
+    snapshot = ContentSnapshot(2, None, None)
+    registry.stage(snapshot)
+    assert registry.menu() == ()
+    registry.commit(snapshot)
+    assert registry.menu() == ((1, "econ"),)
+
+
+def test_menu_skips_empty_banks(tmp_path):
+    data_dir = tmp_path / "data"
+    make_bank(data_dir, "econ")
+    (data_dir / "empty").mkdir()
+    (data_dir / "empty" / "tasks.txt").write_text("", encoding="utf-8")
+
+    registry = BankRegistry(data_dir, no_compilers)
+    registry.discover()
+
+    assert [info.slug for info in registry.banks()] == ["econ", "empty"]
+    assert registry.menu() == ((registry.find("econ").number, "econ"),)
+
+
+def test_least_recently_opened_bank_is_unloaded_over_budget(tmp_path):
+    data_dir = tmp_path / "data"
+    for slug in ("a", "b", "c"):
+        make_bank(data_dir, slug, count=20)
+    registry = BankRegistry(data_dir, no_compilers)
+    registry.discover()
+    a, b, c = (registry.find(slug).number for slug in ("a", "b", "c"))
+    weight = (data_dir / "a" / "questions.txt").stat().st_size
+    # помещаются два банка из трёх
+    registry.budget_bytes = 2 * weight + weight // 2
+
+    async def scenario():
+        await registry.get(a)
+        await registry.get(b)
+        await registry.get(a)  # теперь b — давнее всех
+        await registry.get(c)
+        assert registry.stats()["evictions"] == 1
+        assert registry.stats()["resident"] == 2
+
+        loads = registry.loads
+        assert len((await registry.get(a)).questions) == 20
+        assert registry.loads == loads  # a остался в памяти
+        await registry.get(b)
+        assert registry.loads == loads + 1  # b выгружался — загружен заново
+
+        # последний открытый банк остаётся, даже если он один больше бюджета
+        registry.budget_bytes = 0
+        await registry.get(c)
+        assert registry.stats()["resident"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_changed_bank_is_reloaded_after_verify_interval(tmp_path):
+    data_dir = tmp_path / "data"
+    make_bank(data_dir, "econ", count=1)
+    registry = BankRegistry(data_dir, no_compilers, verify_interval=0)
+    registry.discover()
+    number = registry.find("econ").number
+
+    async def scenario():
+        assert len((await registry.get(number)).questions) == 1
+        make_bank(data_dir, "econ", count=3)
+        assert len((await registry.get(number)).questions) == 3
+
+    asyncio.run(scenario())
+    assert registry.loads == 2
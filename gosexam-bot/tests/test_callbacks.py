@@ -0,0 +1,84 @@
+import pytest
+
+from app import callbacks as cb
+from app.callbacks import BANK_STRIDE, CallbackTable, bank_ref, decode, encode, split_bank_ref
+
+
+def action_constants():
+    return {
+        name: value
+        for name, value in vars(cb).items()
+        if name.isupper() and isinstance(value, str) and len(value) == 1 and value != cb.CODEC_VERSION
+    }
+
+
+def test_action_codes_are_unique_and_registered():
+    codes = action_constants()
+    assert len(set(codes.values())) == len(codes)
+    assert set(codes.values()) == cb.ACTIONS
+
+
+@pytest.mark.parametrize("arg", [None, 0, 1, 35, 36, 100, 12345, -7, -1296])
+def test_encode_decode_round_trip(arg):
+    for action in cb.ACTIONS:
+        data = encode(action, arg)
+        assert decode(data) == (action, arg)
+        assert len(data.encode("utf-8")) <= 64
+
+
+def test_encode_is_compact():
+    assert encode(cb.QUESTION_OPEN, 100) == "1o2s"
+    assert encode(cb.QUIZ_START) == "1z"
+
+
+@pytest.mark.parametrize(
+    "data, expected",
+    [
+        ("section_management", (cb.MANAGEMENT_MENU, None)),
+        ("questions_list", (cb.QUESTIONS_PAGE, 0)),
+        ("tasks_jump", (cb.TASKS_JUMP, None)),
+        ("quiz_cancel", (cb.QUIZ_CANCEL, None)),
+        ("q_open_5", (cb.QUESTION_OPEN, 5)),
+        ("questions_page_3", (cb.QUESTIONS_PAGE, 3)),
+        ("task_7", (cb.TASK_OPEN, 7)),
+        ("task_answer_12", (cb.TASK_ANSWER, 12)),
+        ("task_next_41", (cb.TASK_NEXT, 41)),
+        ("quiz_show_9", (cb.QUIZ_SHOW, 9)),
+    ],
+)
+def test_decode_legacy(data, expected):
+    assert decode(data) == expected
+
+
+@pytest.mark.parametrize("data", [None, "", "1", "1?", "1o!", "2o5", "q_open_x", "q_open_-1", "unknown_5", "task_"])
+def test_decode_rejects_garbage(data):
+    assert decode(data) is None
+
+
+@pytest.mark.parametrize("bank, value", [(0, 0), (0, 17), (1, 0), (3, 17), (250, BANK_STRIDE - 1)])
+def test_bank_ref_round_trip(bank, value):
+    ref = bank_ref(bank, value)
+    assert split_bank_ref(ref) == (bank, value)
+    assert decode(encode(cb.BANK_QUESTION_OPEN, ref)) == (cb.BANK_QUESTION_OPEN, ref)
+
+
+def test_split_bank_ref_of_missing_arg():
+    assert split_bank_ref(None) == (0, 0)
+
+
+def test_table_rejects_duplicate_handler():
+    table = CallbackTable()
+
+    @table.on(cb.QUIZ_START)
+    async def first(call, arg):
+        pass
+
+    assert table.handler_for(cb.QUIZ_START) is first
+    with pytest.raises(ValueError):
+        table.on(cb.QUIZ_START)(first)
+
+
+def test_every_action_has_a_handler():
+    from app.handlers import CALLBACKS
+
+    assert {action for action in cb.ACTIONS if CALLBACKS.handler_for(action) is None} == set()
@@ -0,0 +1,46 @@
+from app.content import ContentStore
+
+
+def entry(entry_id, text="", answer=""):
+    return {"id": entry_id, "text": text or f"Запись {entry_id}", "answer": answer}
+
+
+def test_entries_are_indexed_by_id_in_ascending_order():
+    store = ContentStore([entry(5), entry(2), entry(9)])
+    assert store.ids == (2, 5, 9)
+    assert [e["id"] for e in store] == [2, 5, 9]
+    assert store.by_id[5] is store.get(5)
+    assert store.get(3) is None
+
+
+def test_first_duplicate_wins():
+    store = ContentStore([entry(1, "первая"), entry(1, "вторая"), entry(2)])
+    assert len(store) == 2
+    assert store.get(1)["text"] == "первая"
+
+
+def test_next_cycles_in_id_order():
+    store = ContentStore([entry(3), entry(1), entry(7)])
+    assert store.next(1)["id"] == 3
+    assert store.next(3)["id"] == 7
+    assert store.next(7)["id"] == 1
+    # начало обхода и неизвестный id — первая запись
+    assert store.next()["id"] == 1
+    assert store.next(4)["id"] == 1
+
+
+def test_empty_store():
+    store = ContentStore([])
+    assert not store
+    assert store.next() is None
+    assert store.get(1) is None
+
+
+def test_answer_comes_from_entry_or_answer_source():
+    class Answers:
+        def answer(self, entry_id):
+            return f"из пакета {entry_id}"
+
+    assert ContentStore([entry(1, answer="42")]).answer(1) == "42"
+    assert ContentStore([entry(1)]).answer(2) is None
+    assert ContentStore([entry(1)], answers=Answers()).answer(1) == "из пакета 1"
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import multiprocessing
+import os
+
+import pytest
+
+from app.file_cache import FileIdCache, fcntl
+
+
+def make_images(base_dir, count):
+    base_dir.mkdir(parents=True, exist_ok=True)
+    images = []
+    for i in range(count):
+        path = base_dir / f"table_{i:02}.png"
+        path.write_bytes(b"png %d" % i)
+        images.append(path)
+    return images
+
+
+def test_changed_file_is_invalidated_by_sha1(tmp_path):
+    base_dir = tmp_path / "data"
+    (image,) = make_images(base_dir, 1)
+    cache = FileIdCache(tmp_path / "file_ids.json", base_dir, verify_interval=0)
+
+    async def scenario():
+        await cache.put(image, "id-1")
+        assert await cache.get(image) == "id-1"
+
+        # то же содержимое с новым mtime — запись остаётся, отпечаток обновляется
+        st = image.stat()
+        os.utime(image, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        assert await cache.get(image) == "id-1"
+        assert cache._entries[image.name]["mtime_ns"] == st.st_mtime_ns + 10**9
+
+        image.write_bytes(b"another png")
+        assert await cache.get(image) is None
+        assert await cache.get(image) is None
+        await cache.close()
+
+    asyncio.run(scenario())
+    assert cache.stats()["invalidations"] == 1
+    assert json.loads(cache.path.read_text(encoding="utf-8")) == {}
+
+
+def test_workers_merge_their_changes_into_one_file(tmp_path):
+    base_dir = tmp_path / "data"
+    first_image, second_image = make_images(base_dir, 2)
+    path = tmp_path / "file_ids.json"
+
+    async def scenario():
+        first = FileIdCache(path, base_dir)
+        second = FileIdCache(path, base_dir)
+        await first.put(first_image, "first")
+        await second.put(second_image, "second")
+        await first.flush()
+        await second.flush()
+        # второй воркер подхватил чужую запись при сохранении
+        assert await second.get(first_image) == "first"
+
+        first.forget(first_image)
+        await first.close()
+        await second.close()
+
+    asyncio.run(scenario())
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert {key: entry["file_id"] for key, entry in data.items()} == {second_image.name: "second"}
+
+
+def put_many(path, base_dir, image, worker):
+    async def scenario():
+        cache = FileIdCache(path, base_dir)
+        for i in range(20):
+            await cache.put(image, f"{worker}-{i}")
+            await cache.flush()
+        await cache.close()
+
+    asyncio.run(scenario())
+
+
+@pytest.mark.skipif(
+    fcntl is None or "fork" not in multiprocessing.get_all_start_methods(),
+    reason="нужны flock и fork",
+)
+def test_parallel_processes_do_not_lose_entries(tmp_path):
+    base_dir = tmp_path / "data"
+    images = make_images(base_dir, 4)
+    path = tmp_path / "file_ids.json"
+    context = multiprocessing.get_context("fork")
+    processes = [
+        context.Process(target=put_many, args=(path, base_dir, image, worker))
+        for worker, image in enumerate(images)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+    assert [process.exitcode for process in processes] == [0] * len(images)
+    data = json.loads(path.read_text(encoding="utf-8"))
+    assert {key: entry["file_id"] for key, entry in data.items()} == {
+        image.name: f"{worker}-19" for worker, image in enumerate(images)
+    }
@@ -0,0 +1,165 @@
+import struct
+import zlib
+
+import pytest
+
+from app.content import DATA_DIR
+from app.images import encode, optimize_png
+
+
+SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+# Эталонный декодер — по спецификации PNG, без кода app.images: проверка
+# внутри optimize_png пользуется decode_rgba самого модуля и общую с encode
+# ошибку не заметила бы.
+def reference_chunks(data: bytes) -> list[tuple[bytes, bytes]]:
+    assert data[:8] == SIGNATURE
+    chunks = []
+    pos = 8
+    while pos < len(data):
+        (length,) = struct.unpack(">I", data[pos : pos + 4])
+        kind = data[pos + 4 : pos + 8]
+        body = data[pos + 8 : pos + 8 + length]
+        (crc,) = struct.unpack(">I", data[pos + 8 + length : pos + 12 + length])
+        assert crc == zlib.crc32(kind + body), kind
+        chunks.append((kind, body))
+        pos += 12 + length
+    assert chunks[0][0] == b"IHDR" and chunks[-1] == (b"IEND", b"")
+    return chunks
+
+
+def reference_decode(data: bytes) -> list[list[tuple[int, int, int, int]]]:
+    """
+    Строки пикселей (r, g, b, a) любого неинтерлейсного PNG глубиной до 8 бит.
+    """
+    chunks = reference_chunks(data)
+    width, height, depth, color, _, _, interlace = struct.unpack(">IIBBBBB", chunks[0][1])
+    assert interlace == 0 and depth <= 8
+    samples = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}[color]
+    palette = b"".join(body for kind, body in chunks if kind == b"PLTE")
+    alphas = b"".join(body for kind, body in chunks if kind == b"tRNS")
+    raw = zlib.decompress(b"".join(body for kind, body in chunks if kind == b"IDAT"))
+
+    stride = (width * samples * depth + 7) // 8
+    bpp = max(1, samples * depth // 8)
+    prev = [0] * stride
+    pixels = []
+    for y in range(height):
+        line = raw[y * (stride + 1) : (y + 1) * (stride + 1)]
+        kind, cur = line[0], list(line[1:])
+        for i in range(stride):
+            a = cur[i - bpp] if i >= bpp else 0
+            b = prev[i]
+            c = prev[i - bpp] if i >= bpp else 0
+            if kind == 1:
+                cur[i] = (cur[i] + a) % 256
+            elif kind == 2:
+                cur[i] = (cur[i] + b) % 256
+            elif kind == 3:
+                cur[i] = (cur[i] + (a + b) // 2) % 256
+            elif kind == 4:
+                p = a + b - c
+                pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+                cur[i] = (cur[i] + (a if pa <= pb and pa <= pc else b if pb <= pc else c)) % 256
+            else:
+                assert kind == 0
+        prev = cur
+
+        bits = "".join(f"{byte:08b}" for byte in cur)
+        values = [int(bits[i : i + depth], 2) for i in range(0, width * samples * depth, depth)]
+        row = []
+        for x in range(width):
+            v = values[x * samples : (x + 1) * samples]
+            if color == 0:
+                row.append((v[0], v[0], v[0], 255))
+            elif color == 4:
+                row.append((v[0], v[0], v[0], v[1]))
+            elif color == 2:
+                row.append((*v, 255))
+            elif color == 6:
+                row.append(tuple(v))
+            else:
+                index = v[0]
+                alpha = alphas[index] if index < len(alphas) else 255
+                row.append((*palette[index * 3 : index * 3 + 3], alpha))
+        pixels.append(row)
+    return pixels
+
+
+def rgba_rows(pixels) -> list[bytes]:
+    return [bytes(channel for pixel in row for channel in pixel) for row in pixels]
+
+
+def plain_png(pixels, extra=()) -> bytes:
+    """
+    Неоптимизированный RGBA PNG, как его сохраняют редакторы.
+    """
+    def chunk(kind, body):
+        return struct.pack(">I", len(body)) + kind + body + struct.pack(">I", zlib.crc32(kind + body))
+
+    header = struct.pack(">IIBBBBB", len(pixels[0]), len(pixels), 8, 6, 0, 0, 0)
+    idat = zlib.compress(b"".join(b"\x00" + row for row in rgba_rows(pixels)))
+    return b"".join(
+        [SIGNATURE, chunk(b"IHDR", header), *(chunk(k, b) for k, b in extra), chunk(b"IDAT", idat), chunk(b"IEND", b"")]
+    )
+
+
+def image(width, height, pixel):
+    return [[pixel(x, y) for x in range(width)] for y in range(height)]
+
+
+CASES = {
+    "palette 1 bit": image(13, 5, lambda x, y: (0, 0, 0, 255) if (x + y) % 3 else (255, 255, 255, 255)),
+    "palette 2 bit": image(7, 4, lambda x, y: (x % 3 * 60, 0, 0, 255)),
+    "palette 4 bit, transparent": image(9, 6, lambda x, y: (x % 4 * 60, 0, 0, 0 if x == 0 else 255)),
+    "palette 8 bit": image(20, 20, lambda x, y: (x * 10, y * 10, 7, 255)),
+    "gray": image(20, 20, lambda x, y: (x * 12 + y, x * 12 + y, x * 12 + y, 255)),
+    "gray + alpha": image(20, 20, lambda x, y: (x * 12 + y, x * 12 + y, x * 12 + y, y * 12)),
+    "rgb": image(20, 20, lambda x, y: (x * 12, y * 12, (x * y) % 256, 255)),
+    "rgba": image(20, 20, lambda x, y: (x * 12, y * 12, (x * y) % 256, (x + y) * 6)),
+}
+
+
+@pytest.mark.parametrize("name", CASES)
+def test_encoded_pixels_match_reference_decoder(name):
+    pixels = CASES[name]
+    data = encode(len(pixels[0]), len(pixels), rgba_rows(pixels))
+    assert reference_decode(data) == pixels
+
+
+def test_palette_and_gray_are_chosen_when_possible():
+    def color_type(pixels):
+        data = encode(len(pixels[0]), len(pixels), rgba_rows(pixels))
+        ihdr = reference_chunks(data)[0][1]
+        return ihdr[8], ihdr[9]  # глубина, цветовой тип
+
+    assert color_type(CASES["palette 1 bit"]) == (1, 3)
+    assert color_type(CASES["palette 4 bit, transparent"]) == (4, 3)
+    # непрозрачный серый всегда влезает в палитру; с альфой — уже нет
+    assert color_type(CASES["gray + alpha"]) == (8, 4)
+    assert color_type(CASES["rgb"]) == (8, 2)
+
+
+def test_optimize_keeps_pixels_and_color_chunks_only():
+    pixels = CASES["palette 2 bit"]
+    srgb = (b"sRGB", b"\x00")
+    original = plain_png(pixels, extra=[srgb, (b"tEXt", b"Software\x00editor"), (b"pHYs", bytes(9))])
+
+    optimized = optimize_png(original)
+    assert optimized is not None and len(optimized) < len(original)
+    assert reference_decode(optimized) == pixels
+    kinds = [kind for kind, body in reference_chunks(optimized)]
+    assert b"sRGB" in kinds and b"tEXt" not in kinds and b"pHYs" not in kinds
+
+
+def test_real_table_round_trip():
+    # самая маленькая из таблиц: чистый Python на больших картинках медленный
+    tables = sorted((DATA_DIR / "tables").glob("*.png"), key=lambda p: p.stat().st_size)
+    if not tables:
+        pytest.skip("нет data/tables")
+    original = tables[0].read_bytes()
+    optimized = optimize_png(original)
+    if optimized is None:
+        pytest.skip("уже не сжимается")
+    assert reference_decode(optimized) == reference_decode(original)
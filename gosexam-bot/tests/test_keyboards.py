@@ -0,0 +1,113 @@
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.methods import EditMessageText, SendMessage
+
+from app import callbacks as cb
+from app.callbacks import bank_ref, decode
+from app.keyboards import (
+    MAX_JUMP_BUTTONS,
+    PreparedMarkupSession,
+    bank_list_pages,
+    main_menu_reply_keyboard,
+    question_actions_keyboard,
+    questions_list_pages,
+    start_keyboard,
+)
+
+
+def texts(markup):
+    return [[button.text for button in row] for row in markup.inline_keyboard]
+
+
+def actions(markup):
+    return [[decode(button.callback_data) for button in row] for row in markup.inline_keyboard]
+
+
+def test_pages_split_ids_and_navigate():
+    pages = questions_list_pages(range(1, 46))  # 45 вопросов: 20 + 20 + 5
+    assert pages.pages == 3
+    assert pages.caption(1) == "Список вопросов (стр. 2 из 3):"
+
+    first = pages.page(0)
+    assert texts(first)[0] == ["Вопрос 1", "Вопрос 2"]
+    assert texts(first)[-2] == ["1/3", "▶️", "⏭"]
+    assert actions(first)[-2] == [(cb.QUESTIONS_JUMP, None), (cb.QUESTIONS_PAGE, 1), (cb.QUESTIONS_PAGE, 2)]
+    assert actions(first)[-1] == [(cb.QUESTIONS_MENU, None)]
+
+    last = pages.page(2)
+    assert sum(len(row) for row in texts(last)[:-2]) == 5
+    assert texts(last)[-2] == ["⏮", "◀️", "3/3"]
+    assert actions(last)[0][0] == (cb.QUESTION_OPEN, 41)
+
+    # разметка строится один раз; номер страницы вне диапазона прижимается к краю
+    assert pages.page(0) is first
+    assert pages.page(99) is last
+    assert pages.page(-1) is first
+
+
+def test_single_page_has_no_navigation():
+    pages = questions_list_pages([1, 2, 3])
+    assert pages.pages == 1
+    assert pages.caption(0) == "Список вопросов:"
+    assert texts(pages.page(0)) == [["Вопрос 1", "Вопрос 2"], ["Вопрос 3"], ["⬅️ Назад"]]
+
+
+def test_page_of_entry():
+    pages = questions_list_pages([2, 4, 6] + list(range(10, 80)))
+    assert pages.page_of(2) == 0
+    assert pages.page_of(26) == 0  # 20-й по счёту
+    assert pages.page_of(27) == 1
+    assert pages.page_of(79) == 3
+    assert pages.page_of(5) == 0  # такого id нет
+    assert pages.page_of(1000) == 0
+
+
+def test_jump_screen_lists_pages_and_returns_to_list():
+    pages = questions_list_pages(range(1, 101))  # 5 страниц
+    jump = pages.jump()
+    assert texts(jump) == [["1", "2", "3", "4", "5"], ["⬅️ К списку"]]
+    assert actions(jump)[0][4] == (cb.QUESTIONS_PAGE, 4)
+    assert actions(jump)[-1] == [(cb.QUESTIONS_PAGE, 0)]
+    assert pages.jump() is jump
+
+
+def test_jump_screen_thins_out_many_pages_but_keeps_the_last():
+    pages = questions_list_pages(range(1, 20 * 150 + 2))  # 151 страница
+    numbers = [text for row in texts(pages.jump())[:-1] for text in row]
+    assert len(numbers) <= MAX_JUMP_BUTTONS + 1
+    assert numbers[0] == "1" and numbers[-1] == "151"
+    assert numbers[1] == "4"  # шаг ceil(151 / 60) = 3
+
+
+def test_bank_pages_carry_bank_number():
+    pages = bank_list_pages(3, "tasks", range(1, 30))
+    first = actions(pages.page(0))
+    assert first[0][0] == (cb.BANK_TASK_OPEN, bank_ref(3, 1))
+    assert first[-2][0] == (cb.BANK_TASKS_JUMP, bank_ref(3))
+    assert first[-2][1] == (cb.BANK_TASKS_PAGE, bank_ref(3, 1))
+    assert first[-1] == [(cb.BANK_MENU, 3)]
+    assert pages.page_of(25) == 1
+
+
+def form_fields(session, bot, method):
+    form = session.build_form_data(bot, method)
+    return [(options["name"], value) for options, headers, value in form._fields]
+
+
+def test_prepared_json_matches_what_aiogram_sends():
+    bot = Bot("42:TEST")
+    prepared = PreparedMarkupSession()
+    plain = AiohttpSession()
+    methods = [
+        SendMessage(chat_id=7, text="Вопрос 5", reply_markup=question_actions_keyboard(5)),
+        SendMessage(chat_id=7, text="Меню", reply_markup=main_menu_reply_keyboard()),
+        EditMessageText(chat_id=7, message_id=3, text="Выбери раздел:", reply_markup=start_keyboard(((1, "Право"),))),
+    ]
+    for method in methods:
+        assert prepared.registry.serialized(method.reply_markup) is not None
+        assert form_fields(prepared, bot, method) == form_fields(plain, bot, method)
+
+    # клавиатура не из реестра — обычный путь aiogram
+    method = SendMessage(chat_id=7, text="x", reply_markup=question_actions_keyboard.__wrapped__(5))
+    assert prepared.registry.serialized(method.reply_markup) is None
+    assert form_fields(prepared, bot, method) == form_fields(plain, bot, method)
@@ -0,0 +1,135 @@
+import asyncio
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import AnswerCallbackQuery, SendMediaGroup, SendMessage
+from aiogram.types import InputMediaPhoto
+
+from app.outbox import BULK, INTERACTIVE, OutboundMiddleware, OutboundScheduler, TokenBucket, outbound_priority
+
+
+def test_bucket_refills_at_rate_up_to_capacity():
+    bucket = TokenBucket(rate=2.0, capacity=3, now=0.0)
+    for _ in range(3):
+        assert bucket.wait_time(0.0) == 0
+        bucket.consume()
+    assert bucket.wait_time(0.0) == pytest.approx(0.5)
+    assert bucket.wait_time(0.5) == 0
+    assert bucket.wait_time(100.0) == 0 and bucket.tokens == 3
+
+
+def test_bucket_cost_over_capacity_goes_into_debt():
+    bucket = TokenBucket(rate=1.0, capacity=3, now=0.0)
+    # альбом из 10 картинок ждёт полного бакета, а не 10 токенов, которых не бывает
+    assert bucket.wait_time(0.0, cost=10) == 0
+    bucket.consume(10)
+    assert bucket.tokens == -7
+    assert bucket.wait_time(0.0) == pytest.approx(8.0)
+
+
+def test_bucket_block_waits_until_retry_after():
+    bucket = TokenBucket(rate=1.0, capacity=3, now=0.0)
+    bucket.block(5.0)
+    assert bucket.wait_time(1.0) == pytest.approx(4.0)
+    # после блокировки — одно сообщение, токены за время блокировки не накопились
+    assert bucket.wait_time(5.0) == 0
+    bucket.consume()
+    assert bucket.wait_time(5.0) == pytest.approx(1.0)
+
+
+def test_interactive_requests_overtake_queued_bulk():
+    async def scenario():
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=50, chat_burst=1)
+        order = []
+
+        async def send(chat_id, name, priority):
+            await scheduler.acquire(chat_id, priority)
+            order.append(name)
+
+        await scheduler.acquire(1)  # бакет чата 1 пуст — следующие ждут
+        tasks = [asyncio.create_task(send(1, f"bulk{i}", BULK)) for i in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(send(1, "reply", INTERACTIVE)))
+        await asyncio.gather(*tasks)
+        await scheduler.close()
+        return order, scheduler.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["reply", "bulk0", "bulk1", "bulk2"]
+    assert stats["granted"] == 5 and stats["queued"] == 4
+
+
+def test_per_chat_budget_does_not_hold_other_chats():
+    async def scenario():
+        scheduler = OutboundScheduler(global_rate=1000, chat_rate=0.5, chat_burst=1)
+        await scheduler.acquire(1)
+        waiting = asyncio.create_task(scheduler.acquire(1))
+        await asyncio.wait_for(scheduler.acquire(2), timeout=0.5)
+        assert not waiting.done()
+        assert scheduler.depth()[INTERACTIVE] == 1
+        waiting.cancel()
+        await scheduler.close()
+
+    asyncio.run(scenario())
+
+
+def media_group(count: int) -> SendMediaGroup:
+    return SendMediaGroup(chat_id=7, media=[InputMediaPhoto(media=f"file{i}") for i in range(count)])
+
+
+def test_middleware_charges_media_groups_per_photo_with_context_priority():
+    calls = []
+
+    class Recorder(OutboundScheduler):
+        async def acquire(self, chat_id, priority=INTERACTIVE, cost=1):
+            calls.append((chat_id, priority, cost))
+
+    async def make_request(bot, method):
+        return "ok"
+
+    async def scenario():
+        middleware = OutboundMiddleware(Recorder())
+        await middleware(make_request, None, SendMessage(chat_id=7, text="a"))
+        with outbound_priority(BULK):
+            await middleware(make_request, None, media_group(4))
+        # ответ на колбэк — не сообщение в чат, не лимитируется
+        await middleware(make_request, None, AnswerCallbackQuery(callback_query_id="1"))
+
+    asyncio.run(scenario())
+    assert calls == [(7, INTERACTIVE, 1), (7, BULK, 4)]
+
+
+def test_middleware_retries_after_telegram_retry_after():
+    async def scenario(failures: int):
+        scheduler = OutboundScheduler()
+        middleware = OutboundMiddleware(scheduler, max_retries=2)
+        method = SendMessage(chat_id=7, text="a")
+        attempts = 0
+
+        async def make_request(bot, method):
+            nonlocal attempts
+            attempts += 1
+            if attempts <= failures:
+                raise TelegramRetryAfter(method, "Flood control", retry_after=0)
+            return "sent"
+
+        try:
+            return await middleware(make_request, None, method), attempts, scheduler.stats()
+        finally:
+            await scheduler.close()
+
+    result, attempts, stats = asyncio.run(scenario(failures=2))
+    assert (result, attempts, stats["retry_after"]) == ("sent", 3, 2)
+
+    with pytest.raises(TelegramRetryAfter):
+        asyncio.run(scenario(failures=3))
+
+
+def test_retry_after_blocks_the_chat():
+    scheduler = OutboundScheduler()
+    scheduler.on_retry_after(7, 30)
+    assert scheduler._chat(7, 0).blocked_until > 0
+    assert scheduler._global.blocked_until == 0
+
+    scheduler.on_retry_after(None, 30)
+    assert scheduler._global.blocked_until > 0
@@ -0,0 +1,102 @@
+import pytest
+
+from app.content import load_entries, load_store
+from app.pack import ContentPack, PackError, compile_pack, open_fresh_pack, pack_path_for, parse_source
+
+
+def write(path, lines):
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return path
+
+
+def test_parse_source_sorts_and_strips(tmp_path):
+    source = write(tmp_path / "questions.txt", ["3| третий | ответ 3", "", "1|первый|ответ | с чертой"])
+
+    assert parse_source(source) == [(1, "первый", "ответ | с чертой"), (3, "третий", "ответ 3")]
+
+
+BAD_LINES = ["1|первый|ответ", "без полей", "x|текст|ответ", "1|дубль|ответ", "2|второй|ответ"]
+
+
+def test_parse_source_skips_bad_lines_like_load_entries(tmp_path, capsys):
+    source = write(tmp_path / "questions.txt", BAD_LINES)
+
+    assert parse_source(source) == [(1, "первый", "ответ"), (2, "второй", "ответ")]
+    assert "questions.txt:3: id не число" in capsys.readouterr().out
+    assert load_store(source).ids == (1, 2)
+    assert load_store(source).get(1)["text"] == "первый"
+
+
+def test_parse_source_strict_reports_every_bad_line(tmp_path):
+    source = write(tmp_path / "questions.txt", BAD_LINES)
+
+    with pytest.raises(PackError) as info:
+        parse_source(source, strict=True)
+
+    errors = info.value.errors
+    assert len(errors) == 3
+    assert errors[0].startswith("questions.txt:2: ожидалось 3 поля")
+    assert errors[1].startswith("questions.txt:3: id не число")
+    assert errors[2] == "questions.txt:4: id 1 уже был в строке 1"
+
+
+def test_compile_pack_round_trip(tmp_path):
+    source = write(tmp_path / "tasks.txt", ["10|Задача img:tables/t.png|Решение ✅", "2|Вторая|", "7|Ёж|ответ"])
+
+    path = compile_pack(source)
+    assert path == pack_path_for(source)
+
+    pack = ContentPack(path)
+    try:
+        assert pack.count == 3
+        assert pack.is_fresh_for(source)
+        assert pack.entries() == [
+            {"id": 2, "text": "Вторая"},
+            {"id": 7, "text": "Ёж"},
+            {"id": 10, "text": "Задача img:tables/t.png"},
+        ]
+        assert [pack.answer(i) for i in (2, 7, 10)] == ["", "ответ", "Решение ✅"]
+        assert pack.answer(99) is None
+    finally:
+        pack.close()
+
+
+def test_store_from_pack_matches_txt(tmp_path):
+    lines = [f"{i}|Вопрос {i}|Ответ {i}" for i in (5, 1, 3)]
+    source = write(tmp_path / "questions.txt", lines)
+    from_txt = load_store(source)
+    compile_pack(source)
+    from_pack = load_store(source)
+
+    assert from_pack.answers is not None
+    assert from_pack.ids == from_txt.ids == (1, 3, 5)
+    for entry in load_entries(source):
+        assert from_pack.get(entry["id"])["text"] == entry["text"]
+        assert from_pack.answer(entry["id"]) == entry["answer"]
+
+
+def test_stale_or_broken_pack_is_ignored(tmp_path):
+    source = write(tmp_path / "questions.txt", ["1|Вопрос|Ответ"])
+    compile_pack(source)
+    write(source, ["1|Вопрос|Новый ответ", "2|Ещё|Ответ"])
+    assert open_fresh_pack(source) is None
+
+    pack_path_for(source).write_bytes(b"GXPK")
+    assert open_fresh_pack(source) is None
+    with pytest.raises(PackError):
+        ContentPack(pack_path_for(source))
+
+    pack_path_for(source).write_bytes(b"")
+    assert open_fresh_pack(source) is None
+
+
+def test_pack_with_offsets_past_the_end_is_rejected(tmp_path):
+    source = write(tmp_path / "questions.txt", ["1|Вопрос|Ответ"])
+    path = compile_pack(source)
+    data = path.read_bytes()
+    # обрезаем данные: индекс цел, но ответ указывает за конец файла
+    path.write_bytes(data[:-3])
+
+    with pytest.raises(PackError, match="за пределы"):
+        ContentPack(path)
+    assert open_fresh_pack(source) is None
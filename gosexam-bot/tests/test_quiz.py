@@ -0,0 +1,72 @@
+import random
+from collections import Counter
+
+import pytest
+
+from app.content import ContentSnapshot, ContentStore
+from app.quiz import POOL_MIXED, POOL_QUESTIONS, POOL_TASKS, QuizEngine, is_task, sample
+
+
+@pytest.mark.parametrize("n, k", [(0, 5), (1, 5), (5, 5), (10, 3), (1000, 50)])
+def test_sample_returns_distinct_items_of_pool(n, k):
+    pool = tuple(range(100, 100 + n))
+    rng = random.Random(n * 31 + k)
+    for _ in range(50):
+        items = sample(pool, k, rng)
+        assert len(items) == min(k, n)
+        assert len(set(items)) == len(items)
+        assert set(items) <= set(pool)
+
+
+def test_sample_is_roughly_uniform():
+    pool = tuple(range(10))
+    rng = random.Random(1)
+    counts = Counter(item for _ in range(5000) for item in sample(pool, 3, rng))
+    # каждый элемент ожидается 1500 раз
+    assert all(1300 < count < 1700 for count in counts.values())
+    assert set(counts) == set(pool)
+
+
+def test_sample_postpones_avoided_items():
+    pool = tuple(range(10))
+    rng = random.Random(2)
+    avoid = {0, 1, 2, 3, 4, 5, 6}
+    for _ in range(50):
+        assert set(sample(pool, 3, rng, avoid)) == {7, 8, 9}
+        items = sample(pool, 5, rng, avoid)
+        assert {7, 8, 9} <= set(items) and len(set(items)) == 5
+
+
+def snapshot(version=1, questions=20):
+    def store(ids):
+        return ContentStore([{"id": i, "text": str(i), "answer": ""} for i in ids])
+
+    return ContentSnapshot(version, store(range(1, questions + 1)), store(range(1, 6)))
+
+
+def test_engine_pools_and_recent_items():
+    engine = QuizEngine(length=5, avoid_recent=10, rng=random.Random(3))
+    content = snapshot()
+
+    assert not any(is_task(item) for item in engine.start(1, content, POOL_QUESTIONS))
+    assert all(is_task(item) for item in engine.start(2, content, POOL_TASKS))
+    assert len(engine.pool(content, POOL_MIXED)) == 25
+
+    first = engine.start(3, content)
+    second = engine.start(3, content)
+    assert not set(first) & set(second)
+
+
+def test_staged_pools_are_swapped_in_on_commit():
+    engine = QuizEngine()
+    old, new = snapshot(1, questions=20), snapshot(2, questions=30)
+    engine.commit(old)
+    current = engine.pool(old, POOL_QUESTIONS)
+
+    engine.stage(new)
+    # до публикации хендлеры со старым снимком получают прежний пул, без пересборки
+    assert engine.pool(old, POOL_QUESTIONS) is current
+
+    engine.commit(new)
+    assert len(engine.pool(new, POOL_QUESTIONS)) == 30
+    assert engine.pool(new, POOL_QUESTIONS) is engine.pool(new, POOL_QUESTIONS)
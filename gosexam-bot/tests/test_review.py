@@ -0,0 +1,144 @@
+import asyncio
+
+import pytest
+
+from app.content import ContentStore
+from app.review import (
+    DAY,
+    MIN_EASE,
+    QUALITY_RIGHT,
+    QUALITY_WRONG,
+    RELEARN_DELAY,
+    START_EASE,
+    Card,
+    MemoryReviewStore,
+    SqliteReviewStore,
+)
+
+
+NOW = 1_700_000_000.0
+
+
+def test_correct_answers_follow_sm2_intervals():
+    card = Card(NOW)
+    intervals = []
+    for _ in range(4):
+        card.grade(5, NOW)
+        intervals.append(card.interval)
+
+    assert intervals[:2] == [1.0, 6.0]
+    assert intervals[2] == round(6.0 * (START_EASE + 0.2), 2)
+    assert intervals[3] == round(intervals[2] * (START_EASE + 0.3), 2)
+    assert card.reps == 4
+    assert card.due == NOW + intervals[3] * DAY
+
+
+def test_quality_changes_ease_by_sm2_formula():
+    for quality, delta in ((5, 0.1), (4, 0.0), (3, -0.14)):
+        card = Card(NOW)
+        card.grade(quality, NOW)
+        assert card.ease == pytest.approx(START_EASE + delta)
+
+
+def test_wrong_answer_resets_and_relearns_soon():
+    card = Card(NOW, interval=15.0, ease=2.0, reps=3)
+    card.grade(QUALITY_WRONG, NOW)
+
+    assert (card.reps, card.interval) == (0, 0.0)
+    assert card.due == NOW + RELEARN_DELAY
+    assert card.ease == pytest.approx(2.0 - 0.32)
+
+    card.grade(QUALITY_RIGHT, NOW)
+    assert card.interval == 1.0
+
+
+def test_ease_never_drops_below_minimum():
+    card = Card(NOW)
+    for _ in range(20):
+        card.grade(0, NOW)
+    assert card.ease == MIN_EASE
+
+
+def questions(*ids):
+    return ContentStore([{"id": i, "text": f"Вопрос {i}", "answer": ""} for i in ids])
+
+
+def test_next_card_prefers_due_then_new_questions():
+    store = MemoryReviewStore()
+    bank = questions(1, 2, 3)
+
+    assert store.next_card(7, bank, NOW) == (1, None)
+    store.grade(7, 1, True, NOW)
+    assert store.next_card(7, bank, NOW) == (2, None)
+    store.grade(7, 2, False, NOW)
+    assert store.next_card(7, bank, NOW + RELEARN_DELAY) == (2, None)
+    store.grade(7, 3, True, NOW)
+    store.grade(7, 2, True, NOW)
+
+    # всё изучено — ничего не показываем до ближайшего срока
+    assert store.next_card(7, bank, NOW) == (None, NOW + DAY)
+    assert store.next_card(7, bank, NOW + DAY) in ((1, None), (2, None), (3, None))
+
+
+def test_next_card_drops_removed_questions_and_sees_new_ones():
+    store = MemoryReviewStore()
+    for question_id in (1, 2):
+        store.grade(7, question_id, True, NOW)
+
+    assert store.next_card(7, questions(2, 5), NOW + 2 * DAY) == (2, None)
+    assert set(store.schedule(7).cards) == {2}
+    store.grade(7, 2, True, NOW + 2 * DAY)
+    assert store.next_card(7, questions(2, 5), NOW + 2 * DAY) == (5, None)
+
+
+def test_least_recently_used_schedules_are_unloaded():
+    store = MemoryReviewStore(max_users=2)
+    for user_id in (1, 2):
+        store.grade(user_id, 10, True, NOW)
+    store.schedule(1)  # теперь 2 — давнее всех
+    store.grade(3, 10, True, NOW)
+
+    assert store.stats()["users"] == 2 and store.stats()["evicted"] == 1
+    assert store.schedule(1).cards and not store.schedule(2).cards
+
+
+def test_idle_schedules_expire_on_sweep():
+    store = MemoryReviewStore(ttl=0)
+    store.grade(1, 10, True, NOW)
+    assert store.sweep() == 1
+    assert store.stats()["users"] == 0
+
+
+def test_sqlite_store_reloads_unloaded_users(tmp_path):
+    path = tmp_path / "review.sqlite3"
+
+    async def scenario():
+        store = SqliteReviewStore(path, flush_interval=3600, max_users=1, sweep_interval=0)
+        await store.start()
+        store.grade(1, 10, True, NOW)
+        store.grade(1, 11, False, NOW)
+        # пользователь 1 вытеснен до сброса — изменения ждут в памяти
+        await store.load(2)
+        store.grade(2, 10, True, NOW)
+        assert store.stats()["unsaved_users"] == 1
+
+        await store.load(1)
+        assert set(store.schedule(1).cards) == {10, 11}
+        assert store.loads == 1  # 1 взят из памяти, в базу ходили только за 2
+
+        await store.flush()
+        await store.load(2)
+        await store.load(1)
+        assert store.loads == 3  # после сброса оба читаются из базы
+        assert store.next_card(1, questions(10, 11), NOW + RELEARN_DELAY) == (11, None)
+        await store.close()
+
+        reopened = SqliteReviewStore(path, sweep_interval=0)
+        await reopened.start()
+        await reopened.load(2)
+        card = reopened.schedule(2).cards[10]
+        await reopened.close()
+        return card
+
+    card = asyncio.run(scenario())
+    assert (card.due, card.interval, card.reps) == (NOW + DAY, 1.0, 1)
@@ -0,0 +1,102 @@
+import pytest
+
+from app.content import ContentSnapshot, ContentStore
+from app.search import QUESTION, TASK, SearchIndex, stem, tokenize
+
+
+QUESTIONS = [
+    {"id": 1, "text": "Бережливое производство и потери", "answer": "Семь видов потерь: ожидание, запасы"},
+    {"id": 2, "text": "Логистика запасов", "answer": "Точка заказа и страховой запас"},
+    {"id": 3, "text": "Такт линии", "answer": "Время такта = фонд времени / спрос"},
+    {"id": 4, "text": "Канбан", "answer": "Карточки канбан ограничивают незавершённое производство"},
+]
+TASKS = [
+    {"id": 1, "text": "Рассчитайте такт линии img:tables/table_01.png", "answer": "Такт 2 минуты"},
+    {"id": 2, "text": "Определите точку заказа", "answer": "Запас на время поставки"},
+]
+
+QUERIES = ["такт", "запасы производство", "точка заказа", "канбан карточки", "потери ожидание", "минуты"]
+
+
+def snapshot(version, questions=QUESTIONS, tasks=TASKS):
+    return ContentSnapshot(version, ContentStore(questions), ContentStore(tasks))
+
+
+def fresh(snap) -> SearchIndex:
+    index = SearchIndex()
+    index.commit(snap)
+    return index
+
+
+def results(index: SearchIndex) -> dict:
+    return {
+        query: {(hit.kind, hit.id): hit.score for hit in index.search(query, limit=100)}
+        for query in QUERIES
+    }
+
+
+def assert_same(left: SearchIndex, right: SearchIndex, scores: bool = True):
+    assert len(left) == len(right)
+    expected = results(right)
+    for query, hits in results(left).items():
+        assert hits.keys() == expected[query].keys(), query
+        if not scores:
+            continue
+        for key, score in hits.items():
+            assert score == pytest.approx(expected[query][key]), (query, key)
+
+
+def test_tokenize_normalizes_and_drops_noise():
+    assert tokenize("Ёлки и ПАЛКИ img:tables/x.png") == [stem("елки"), stem("палки")]
+    assert stem("запасов") == stem("запасы")
+
+
+def test_search_finds_both_kinds():
+    index = fresh(snapshot(1))
+
+    keys = [(hit.kind, hit.id) for hit in index.search("такт", limit=10)]
+    assert set(keys) == {(QUESTION, 3), (TASK, 1)}
+    assert [hit.id for hit in index.search("такт", kind=TASK)] == [1]
+    assert index.search("и или но") == []
+
+
+def test_incremental_update_matches_full_rebuild():
+    index = fresh(snapshot(1))
+    # правка одного ответа без изменения длины документа, удаление и добавление
+    # записи той же длины: средняя длина не меняется, индекс не пересобирается
+    questions = [dict(q) for q in QUESTIONS if q["id"] != 4]
+    questions[2]["answer"] = "Время такта = фонд времени / запас"
+    questions.append({"id": 5, "text": "Канбан", "answer": "Карточки канбан ограничивают незавершённое ожидание"})
+    new = snapshot(2, questions)
+
+    index.stage(new)
+    rebuilds = index.stats()["rebuilds"]
+    index.commit(new)
+
+    assert index.stats()["rebuilds"] == rebuilds
+    assert_same(index, fresh(new))
+    assert (QUESTION, 4) not in results(index)["канбан карточки"]
+
+
+def test_large_drift_rebuilds_and_matches():
+    index = fresh(snapshot(1))
+    long_answer = " ".join(["поставка запасов по точке заказа"] * 20)
+    new = snapshot(2, QUESTIONS + [{"id": 9, "text": "Длинный вопрос", "answer": long_answer}])
+
+    rebuilds = index.stats()["rebuilds"]
+    index.stage(new)
+    index.commit(new)
+
+    assert index.stats()["rebuilds"] == rebuilds + 1
+    assert_same(index, fresh(new))
+
+
+def test_commit_ignores_delta_staged_for_another_version():
+    index = fresh(snapshot(1))
+    index.stage(snapshot(2, QUESTIONS[:1]))
+    target = snapshot(3, QUESTIONS[:2], TASKS[:1])
+    index.commit(target)
+
+    # средняя длина сдвинулась меньше AVGDL_DRIFT: вклады посчитаны со старой,
+    # поэтому сравниваем только состав выдачи
+    assert_same(index, fresh(target), scores=False)
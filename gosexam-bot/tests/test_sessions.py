@@ -0,0 +1,156 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from app import sessions
+from app.sessions import MemorySessionStore, QuizState, Shard, SqliteSessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions.time, "monotonic", clock)
+    return clock
+
+
+def test_get_expires_idle_session(clock):
+    store = MemorySessionStore(ttl=60)
+    store.set(1, QuizState([1, 2, 3]))
+
+    clock.now += 59
+    assert store.get(1) is not None
+    clock.now += 59                      # get() продлил сессию
+    assert store.get(1) is not None
+    clock.now += 61
+    assert store.get(1) is None
+    assert len(store) == 0
+    assert store.stats()["expired"] == 1
+
+
+def test_sweep_removes_only_expired(clock):
+    store = MemorySessionStore(ttl=60)
+    for user_id in (1, 2, 3):
+        store.set(user_id, QuizState([user_id]))
+        clock.now += 20
+    store.get(1)                         # 1 снова свежая, в конце порядка
+
+    clock.now += 10                      # 2 и 3 простояли 50 и 30 с, 1 — 10 с
+    assert store.sweep() == 0
+    clock.now += 15                      # 2 — 65 с
+    assert store.sweep() == 1
+    assert store.get(2) is None
+    assert store.get(1) is not None and store.get(3) is not None
+
+
+def test_lru_evicts_least_recently_touched(clock):
+    store = MemorySessionStore(max_sessions=3)
+    for user_id in (1, 2, 3):
+        store.set(user_id, QuizState([user_id]))
+        clock.now += 1
+    store.get(1)
+    store.set(4, QuizState([4]))
+
+    assert store.get(2) is None
+    assert [user_id for user_id in (1, 3, 4) if store.get(user_id) is not None] == [1, 3, 4]
+    assert store.stats() == {"sessions": 3, "expired": 0, "evicted": 1}
+
+
+def test_quiz_state_json_round_trip():
+    state = QuizState([5, -3, 7], index=2, correct=1)
+    restored = QuizState.from_json(state.to_json())
+
+    assert list(restored.ids) == [5, -3, 7]
+    assert (restored.index, restored.correct) == (2, 1)
+
+
+def rows(path):
+    with sqlite3.connect(path) as conn:
+        return dict(conn.execute("SELECT user_id, state FROM quiz_sessions").fetchall())
+
+
+def test_sqlite_store_writes_behind_and_restores(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+
+    async def scenario():
+        store = SqliteSessionStore(path, flush_interval=3600, sweep_interval=0)
+        await store.start()
+        store.set(1, QuizState([1, 2, 3], index=1, correct=1))
+        store.set(2, QuizState([4]))
+        # в базу — только при сбросе
+        assert rows(path) == {}
+        await store.flush()
+        assert set(rows(path)) == {1, 2}
+
+        store.pop(2)
+        store.set(3, QuizState([5, 6]))
+        await store.close()  # финальный сброс
+        assert set(rows(path)) == {1, 3}
+
+        restored = SqliteSessionStore(path, sweep_interval=0)
+        await restored.start()
+        state = restored.get(1)
+        await restored.close()
+        return state, restored.stats()
+
+    state, stats = asyncio.run(scenario())
+    assert (list(state.ids), state.index, state.correct) == ([1, 2, 3], 1, 1)
+    assert stats["sessions"] == 2 and stats["flushes"] == 0
+
+
+def test_sqlite_store_drops_expired_rows_on_start(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+
+    async def scenario():
+        store = SqliteSessionStore(path, sweep_interval=0)
+        await store.start()
+        for user_id in (1, 2):
+            store.set(user_id, QuizState([user_id]))
+        await store.close()
+        with sqlite3.connect(path) as conn:
+            conn.execute("UPDATE quiz_sessions SET updated_at = ? WHERE user_id = 1", (time.time() - 120,))
+
+        restored = SqliteSessionStore(path, ttl=60, sweep_interval=0)
+        await restored.start()
+        alive = [user_id for user_id in (1, 2) if restored.get(user_id) is not None]
+        await restored.close()
+        return alive
+
+    assert asyncio.run(scenario()) == [2]
+    assert set(rows(path)) == {2}
+
+
+def test_shards_read_and_delete_only_their_users(tmp_path):
+    path = tmp_path / "sessions.sqlite3"
+    user_ids = (-3, -2, 1, 2, 5, 8)
+
+    async def scenario():
+        store = SqliteSessionStore(path, sweep_interval=0)
+        await store.start()
+        for user_id in user_ids:
+            store.set(user_id, QuizState([user_id]))
+        await store.close()
+
+        restored = {}
+        for index in (0, 1):
+            shard = SqliteSessionStore(path, sweep_interval=0, shard=Shard(index, 2))
+            await shard.start()
+            restored[index] = sorted(user_id for user_id in user_ids if shard.get(user_id) is not None)
+            if index == 0:
+                # своя сессия удаляется из базы, чужая (5 — у шарда 1) остаётся
+                shard.pop(2)
+                shard.pop(5)
+            await shard.close()
+        return restored
+
+    assert asyncio.run(scenario()) == {0: [-2, 2, 8], 1: [-3, 1, 5]}
+    assert set(rows(path)) == {-3, -2, 1, 5, 8}
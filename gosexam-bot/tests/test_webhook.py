@@ -0,0 +1,128 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher, Router
+from aiohttp.test_utils import TestClient, TestServer
+
+from app.lanes import UserLaneMiddleware, UserLanes
+from app.webhook import build_webhook_app
+
+
+def message_update(update_id: int, user_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+            "text": text,
+        },
+    }
+
+
+async def until(condition, timeout: float = 2.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, "условие не выполнилось"
+        await asyncio.sleep(0.01)
+
+
+def blocking_dispatcher(events: list, gates: dict) -> Dispatcher:
+    """
+    Диспетчер как в register_handlers: полосы пользователей, затем хендлер,
+    который ждёт, пока тест не откроет его gate.
+    """
+    router = Router()
+
+    @router.message()
+    async def handle(message):
+        events.append(("start", message.text))
+        await gates[message.text].wait()
+        events.append(("end", message.text))
+
+    dp = Dispatcher()
+    dp.update.outer_middleware(UserLaneMiddleware(UserLanes()))
+    dp.include_router(router)
+    return dp
+
+
+async def serve(app, bot: Bot, gates: dict, scenario):
+    """
+    Прогоняет scenario(client) на тестовом сервере. Хендлеры в конце
+    отпускаются всегда: при упавшей проверке сервер иначе ждал бы их вечно.
+    """
+    try:
+        async with TestClient(TestServer(app)) as client:
+            try:
+                await scenario(client)
+            finally:
+                for gate in gates.values():
+                    gate.set()
+    finally:
+        await bot.session.close()
+
+
+def test_waiting_double_tap_does_not_hold_a_webhook_slot():
+    events = []
+    gates = {text: asyncio.Event() for text in ("a1", "a2", "b")}
+    started = lambda: [text for kind, text in events if kind == "start"]
+
+    async def scenario(client):
+        for update_id, (user_id, text) in enumerate([(1, "a1"), (1, "a2"), (2, "b")]):
+            resp = await client.post("/webhook", json=message_update(update_id, user_id, text))
+            assert resp.status == 200
+
+        # a2 ждёт полосу пользователя 1, не занимая слот: второй слот достаётся b
+        await until(lambda: len(started()) == 2)
+        assert started() == ["a1", "b"]
+
+        gates["b"].set()
+        await until(lambda: ("end", "b") in events)
+        assert "a2" not in started()
+
+        gates["a1"].set()
+        await until(lambda: "a2" in started())
+        assert events.index(("end", "a1")) < events.index(("start", "a2"))
+        gates["a2"].set()
+        await until(lambda: ("end", "a2") in events)
+        assert client.app["webhook_handler"].stats()["processed"] == 3
+
+    async def main():
+        bot = Bot("42:TEST")
+        app = build_webhook_app(bot, blocking_dispatcher(events, gates), "/webhook", max_in_flight=2)
+        await serve(app, bot, gates, scenario)
+
+    asyncio.run(main())
+
+
+def test_webhook_rejects_updates_over_backlog():
+    events = []
+    gates = {text: asyncio.Event() for text in ("a", "b")}
+    headers = {"X-Telegram-Bot-Api-Secret-Token": "s"}
+
+    async def scenario(client):
+        resp = await client.post("/webhook", json=message_update(1, 1, "a"))
+        assert resp.status == 401
+
+        resp = await client.post("/webhook", json=message_update(1, 1, "a"), headers=headers)
+        assert resp.status == 200
+        resp = await client.post("/webhook", json=message_update(2, 2, "b"), headers=headers)
+        assert resp.status == 503
+        assert resp.headers["Retry-After"] == "1"
+
+        gates["a"].set()
+        await until(lambda: client.app["webhook_handler"].stats()["queued"] == 0)
+        resp = await client.post("/webhook", json=message_update(2, 2, "b"), headers=headers)
+        assert resp.status == 200
+
+        stats = client.app["webhook_handler"].stats()
+        assert stats["received"] == 2 and stats["rejected"] == 1
+
+    async def main():
+        bot = Bot("42:TEST")
+        dp = blocking_dispatcher(events, gates)
+        app = build_webhook_app(bot, dp, "/webhook", secret_token="s", max_backlog=1)
+        await serve(app, bot, gates, scenario)
+
+    asyncio.run(main())
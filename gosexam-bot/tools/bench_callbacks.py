@@ -0,0 +1,180 @@
+"""
+Сколько стоит маршрутизация callback-апдейта: старая цепочка фильтров
+(F.data == ... / startswith / regexp на каждую кнопку) против одного
+хендлера с разбором компактной callback_data и переходом по таблице.
+
+Обработчики пустые — меряется только путь апдейта через aiogram до хендлера.
+
+    python tools/bench_callbacks.py --updates 20000
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from aiogram import Bot, Dispatcher, F, Router  # noqa: E402
+from aiogram.types import Update  # noqa: E402
+
+from app import callbacks as cb  # noqa: E402
+from app.callbacks import CallbackTable, decode, encode  # noqa: E402
+
+
+# Фильтры в том порядке, в каком они стояли в handlers.py до единого диспетчера
+LEGACY_FILTERS = [
+    F.data == "section_management",
+    F.data == "section_op",
+    F.data == "mgmt_questions",
+    F.data == "back_questions_menu",
+    F.data == "questions_list",
+    F.data.startswith("questions_page_"),
+    F.data == "questions_jump",
+    F.data == "quiz_start",
+    F.data.startswith("quiz_show_"),
+    F.data == "quiz_right",
+    F.data == "quiz_wrong",
+    F.data == "quiz_cancel",
+    F.data.startswith("q_open_"),
+    F.data.startswith("q_answer_"),
+    F.data.startswith("q_next_"),
+    F.data == "mgmt_tasks",
+    F.data == "back_to_management",
+    F.data == "back_tasks_menu",
+    F.data == "tasks_list",
+    F.data.startswith("tasks_page_"),
+    F.data == "tasks_jump",
+    F.data.regexp(r"^task_\d+$"),
+    F.data.startswith("task_answer_"),
+    F.data.startswith("task_next_"),
+]
+
+# Реальная смесь нажатий: в основном открыть/ответ/следующий
+LEGACY_MIX = [
+    ("q_open_{}", 20), ("q_answer_{}", 20), ("q_next_{}", 15),
+    ("task_{}", 10), ("task_answer_{}", 10), ("task_next_{}", 8),
+    ("quiz_show_{}", 5), ("quiz_right", 3), ("quiz_wrong", 2),
+    ("questions_list", 3), ("tasks_list", 2), ("section_management", 2),
+]
+
+
+def legacy_router(hits: list) -> Router:
+    router = Router()
+
+    def make_handler(index: int):
+        async def handler(call):
+            hits[index] += 1
+        return handler
+
+    for index, flt in enumerate(LEGACY_FILTERS):
+        router.callback_query.register(make_handler(index), flt)
+    return router
+
+
+def table_router(hits: list) -> Router:
+    router = Router()
+    table = CallbackTable()
+
+    async def handler(call, arg):
+        hits[0] += 1
+
+    for action in cb.ACTIONS:
+        table.on(action)(handler)
+
+    @router.callback_query(F.data)
+    async def dispatch(call):
+        await table.dispatch(call)
+
+    return router
+
+
+def make_data(count: int, seed: int = 1) -> list[str]:
+    rnd = random.Random(seed)
+    patterns = [p for p, weight in LEGACY_MIX for _ in range(weight)]
+    return [rnd.choice(patterns).format(rnd.randint(1, 80)) for _ in range(count)]
+
+
+def to_compact(data: str) -> str:
+    action, arg = decode(data)
+    return encode(action, arg)
+
+
+def make_update(update_id: int, data: str) -> Update:
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "chat_instance": "1",
+                "from": {"id": 1, "is_bot": False, "first_name": "u"},
+                "message": {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}},
+                "data": data,
+            },
+        }
+    )
+
+
+async def feed(router: Router, updates: list[Update]) -> float:
+    dp = Dispatcher()
+    dp.include_router(router)
+    bot = Bot("123456:BENCH")
+    for update in updates[:200]:  # прогрев
+        await dp.feed_update(bot, update)
+    started = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    elapsed = time.perf_counter() - started
+    await bot.session.close()
+    return elapsed / len(updates) * 1e6
+
+
+def parse_cost(fn, data: list[str]) -> float:
+    started = time.perf_counter()
+    for item in data:
+        fn(item)
+    return (time.perf_counter() - started) / len(data) * 1e6
+
+
+class _Call:
+    __slots__ = ("data",)
+
+
+def legacy_match(data: str, _call=_Call()):
+    # та же логика, что у цепочки фильтров, без aiogram: первый подходящий + split("_")
+    _call.data = data
+    for index, flt in enumerate(LEGACY_FILTERS):
+        if flt.resolve(_call):
+            return index, data.split("_")
+    return None
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20000)
+    args = parser.parse_args()
+
+    legacy_data = make_data(args.updates)
+    compact_data = [to_compact(d) for d in legacy_data]
+
+    legacy_hits = [0] * len(LEGACY_FILTERS)
+    table_hits = [0]
+    legacy_us = await feed(legacy_router(legacy_hits), [make_update(i, d) for i, d in enumerate(legacy_data)])
+    table_us = await feed(table_router(table_hits), [make_update(i, d) for i, d in enumerate(compact_data)])
+    assert sum(legacy_hits) == table_hits[0], (sum(legacy_hits), table_hits[0])
+
+    print(f"апдейтов: {args.updates}")
+    print(f"{'':24} {'мкс/апдейт':>11}")
+    print(f"{'цепочка фильтров':24} {legacy_us:>11.1f}")
+    print(f"{'таблица + кодек':24} {table_us:>11.1f}")
+    print(f"{'выигрыш':24} {legacy_us / table_us:>10.2f}x")
+    print()
+    print("только разбор callback_data:")
+    print(f"{'фильтры + split':24} {parse_cost(legacy_match, legacy_data):>11.2f}")
+    print(f"{'decode (новый)':24} {parse_cost(decode, compact_data):>11.2f}")
+    print(f"{'decode (старые кнопки)':24} {parse_cost(decode, legacy_data):>11.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
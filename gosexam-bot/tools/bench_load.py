@@ -0,0 +1,278 @@
+"""
+Нагрузочный тест бота целиком: настоящий Bot + Dispatcher с хендлерами
+из app/handlers.py против локального фейкового Bot API (tools/fake_api.py).
+
+Бот получает апдейты через getUpdates (обычный polling), ответы уходят
+в фейковый API. Каждый тестовый пользователь проходит сценарий
+    /start → Менеджмент → Вопросы → список → открыть вопрос → ответ →
+    следующий → ответ → «Меню» → … → Задачи → список → открыть задачу →
+    решение → задачи с картинками → «Меню» → … → тест знаний до конца
+и «нажимает» кнопки из последней клавиатуры, которую бот прислал в его чат
+(как живой человек), с паузой на раздумье между шагами.
+
+Задачи с картинками гоняют sendPhoto / sendMediaGroup и кэш file_id:
+первый показ загружает файл, следующие идут по file_id. Кэши бот на время
+теста держит во временном каталоге (handlers.set_cache_dir), боевой
+cache/ фейковыми file_id не засоряется.
+
+Отчёт: апдейтов в секунду, p50/p95/p99 времени хендлера (outer-middleware
+диспетчера) и полного пути (апдейт поставлен в getUpdates → обработан),
+запросов к API на апдейт с разбивкой по методам.
+
+    python tools/bench_load.py --users 2000 --think 0.05
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from aiogram import BaseMiddleware, Bot, Dispatcher  # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer  # noqa: E402
+
+from app import callbacks as cb  # noqa: E402
+from app import handlers  # noqa: E402
+from app.callbacks import decode  # noqa: E402
+from app.keyboards import PreparedMarkupSession  # noqa: E402
+from app.outbox import OutboundMiddleware, OutboundScheduler  # noqa: E402
+from tools.fake_api import FakeBotAPI  # noqa: E402
+
+
+# ("text", текст сообщения), ("tap", код действия кнопки)
+# или ("open", (код действия, id)) — кнопка «по памяти», например сохранённая ссылка
+SCENARIO = (
+    ("text", "/start"),
+    ("tap", cb.MANAGEMENT_MENU),
+    ("tap", cb.QUESTIONS_MENU),
+    ("tap", cb.QUESTIONS_PAGE),
+    ("tap", cb.QUESTION_OPEN),
+    ("tap", cb.QUESTION_ANSWER),
+    ("tap", cb.QUESTION_NEXT),
+    ("tap", cb.QUESTION_ANSWER),
+    ("text", "Меню"),
+    ("tap", cb.MANAGEMENT_MENU),
+    ("tap", cb.TASKS_MENU),
+    ("tap", cb.TASKS_PAGE),
+    ("tap", cb.TASK_OPEN),
+    ("tap", cb.TASK_ANSWER),
+    ("open", (cb.TASK_OPEN, 10)),     # картинка в условии и в решении (sendPhoto)
+    ("tap", cb.TASK_ANSWER),
+    ("open", (cb.TASK_OPEN, 5)),      # две картинки в решении (sendMediaGroup)
+    ("tap", cb.TASK_ANSWER),
+    ("text", "Меню"),
+    ("tap", cb.MANAGEMENT_MENU),
+    ("tap", cb.QUESTIONS_MENU),
+    ("tap", cb.QUIZ_START),
+    ("quiz", None),
+)
+
+# вызовы, которые делает сам polling, а не хендлеры
+SERVICE_METHODS = ("getUpdates", "getMe", "deleteWebhook")
+
+
+class Recorder(BaseMiddleware):
+    """
+    Outer-middleware dp.update: время обработки каждого апдейта
+    и сигнал пользователю, что бот ответил.
+    """
+
+    def __init__(self):
+        self.handler_latency: list[float] = []
+        self.total_latency: list[float] = []
+        self.errors = 0
+        self.enqueued: dict[int, float] = {}
+        self.waiters: dict[int, asyncio.Future] = {}
+
+    async def __call__(self, handler, event, data):
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            done = time.perf_counter()
+            self.handler_latency.append(done - started)
+            update_id = event.update_id
+            self.total_latency.append(done - self.enqueued.pop(update_id, started))
+            waiter = self.waiters.pop(update_id, None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(None)
+
+
+class Users:
+    def __init__(self, api: FakeBotAPI, recorder: Recorder, think: float, seed: int):
+        self.api = api
+        self.recorder = recorder
+        self.think = think
+        self.rnd = random.Random(seed)
+        self.update_ids = iter(range(1, 1 << 62))
+        self.misses = 0
+
+    async def run(self, user_id: int):
+        for kind, arg in SCENARIO:
+            if kind == "text":
+                await self.send(self.message(user_id, arg))
+            elif kind == "tap":
+                await self.tap(user_id, arg)
+            elif kind == "open":
+                await self.send(self.callback(user_id, cb.encode(*arg)))
+            else:
+                await self.quiz(user_id)
+            if self.think:
+                await asyncio.sleep(self.rnd.uniform(0, self.think))
+
+    async def quiz(self, user_id: int):
+        while self.button(user_id, cb.QUIZ_SHOW) is not None:
+            await self.tap(user_id, cb.QUIZ_SHOW)
+            await self.tap(user_id, self.rnd.choice((cb.QUIZ_RIGHT, cb.QUIZ_WRONG)))
+
+    async def tap(self, user_id: int, action: str):
+        data = self.button(user_id, action)
+        if data is None:
+            # кнопки нет в последней клавиатуре — жмём «по памяти»
+            self.misses += 1
+            data = cb.encode(action, 0 if action in (cb.QUESTIONS_PAGE, cb.TASKS_PAGE) else None)
+        await self.send(self.callback(user_id, data))
+
+    def button(self, user_id: int, action: str) -> str | None:
+        raw = self.api.markups.get(user_id)
+        if not raw:
+            return None
+        markup = json.loads(raw) if isinstance(raw, str) else raw
+        found = [
+            button["callback_data"]
+            for row in markup.get("inline_keyboard", ())
+            for button in row
+            if "callback_data" in button and (decode(button["callback_data"]) or ("",))[0] == action
+        ]
+        return self.rnd.choice(found) if found else None
+
+    async def send(self, update: dict):
+        waiter = asyncio.get_running_loop().create_future()
+        self.recorder.waiters[update["update_id"]] = waiter
+        self.recorder.enqueued[update["update_id"]] = time.perf_counter()
+        self.api.updates.put_nowait(update)
+        await waiter
+
+    def message(self, user_id: int, text: str) -> dict:
+        update_id = next(self.update_ids)
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+                "text": text,
+            },
+        }
+
+    def callback(self, user_id: int, data: str) -> dict:
+        update_id = next(self.update_ids)
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "chat_instance": "1",
+                "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": user_id, "type": "private"},
+                    "text": "…",
+                },
+                "data": data,
+            },
+        }
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000, help="одновременных пользователей")
+    parser.add_argument("--ramp", type=float, default=1.0, help="за сколько секунд подключаются все пользователи")
+    parser.add_argument("--think", type=float, default=0.05, help="макс. пауза между шагами, сек")
+    parser.add_argument("--latency", type=float, default=0.0, help="искусственная задержка API, сек")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--real-limits", action="store_true", help="лимиты исходящих из config, а не без ограничений")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    api = FakeBotAPI(latency=args.latency)
+    api_base = await api.start(port=args.port)
+
+    session = PreparedMarkupSession(api=TelegramAPIServer.from_base(api_base))
+    bot = Bot(token="123456:LOAD", session=session)
+    if args.real_limits:
+        import bot as bot_module
+
+        bot_module.load_config()
+        outbound = OutboundScheduler(**bot_module.outbound_options())
+    else:
+        outbound = OutboundScheduler(global_rate=1e9, chat_rate=1e9, chat_burst=1e9, group_rate=1e9)
+    bot.session.middleware(OutboundMiddleware(outbound))
+
+    cache_dir = tempfile.TemporaryDirectory(prefix="gosexam-bench-")
+    handlers.set_cache_dir(Path(cache_dir.name))
+
+    dp = Dispatcher()
+    recorder = Recorder()
+    dp.update.outer_middleware(recorder)
+    handlers.register_handlers(dp)
+    await asyncio.gather(handlers.load_initial_content(), handlers.FILE_IDS.start())
+
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=1))
+    await asyncio.sleep(0.2)
+    api.calls.clear()
+
+    users = Users(api, recorder, args.think, args.seed)
+
+    async def user(index: int):
+        await asyncio.sleep(args.ramp * index / max(args.users, 1))
+        await users.run(100_000 + index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(args.users)))
+    elapsed = time.perf_counter() - started
+
+    await dp.stop_polling()
+    await polling
+    await handlers.FILE_IDS.close()
+    await outbound.close()
+    await bot.session.close()
+    await api.stop()
+    file_ids = handlers.FILE_IDS.stats()
+    cache_dir.cleanup()
+
+    processed = len(recorder.handler_latency)
+    api_calls = {m: n for m, n in api.calls.items() if m not in SERVICE_METHODS}
+    outbound_total = sum(api_calls.values())
+
+    print(f"Пользователей: {args.users}, апдейтов: {processed}, ошибок: {recorder.errors}, промахов по кнопкам: {users.misses}")
+    print(f"Время: {elapsed:.2f} с, {processed / elapsed if elapsed else 0:.1f} апдейтов/с")
+    for title, values in (("хендлер", recorder.handler_latency), ("полный путь", recorder.total_latency)):
+        print(
+            f"  {title:12} p50 {percentile(values, 0.50) * 1000:7.2f} мс"
+            f"  p95 {percentile(values, 0.95) * 1000:7.2f} мс"
+            f"  p99 {percentile(values, 0.99) * 1000:7.2f} мс"
+        )
+    print(f"Запросов к API на апдейт: {outbound_total / processed if processed else 0:.2f}")
+    for method, count in sorted(api_calls.items(), key=lambda item: -item[1]):
+        print(f"  {method:22} {count / processed if processed else 0:6.2f}")
+    print(f"Кэш file_id: попаданий {file_ids['hits']}, промахов {file_ids['misses']}, записей {file_ids['entries']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
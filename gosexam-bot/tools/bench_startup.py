@@ -0,0 +1,97 @@
+"""
+Сколько стоит холодный старт бота.
+
+Каждый прогон — отдельный процесс (как настоящий рестарт или новый
+воркер). Внутри замеряются этапы:
+- import  — импорт bot.py со всеми модулями (контент при этом не читается);
+- parse   — чтение data/*.txt или .pack, сортировка, планы отправки;
+- index   — поисковый индекс и пулы теста (build_content целиком минус parse);
+- ready   — от старта процесса до готовности принимать апдейты
+            (load_initial_content() завершён).
+Снаружи — полное время процесса вместе с запуском интерпретатора.
+
+    python tools/bench_startup.py --runs 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+STAGES = ("import", "parse", "index", "ready", "process")
+
+
+def child() -> dict:
+    started = time.perf_counter()
+    sys.path.insert(0, str(ROOT))
+
+    import asyncio
+
+    import bot  # noqa: F401
+    from app import content, handlers
+
+    imported = time.perf_counter()
+
+    # parse отдельно считаем, подменив load_content обёрткой с таймером
+    parse = []
+    load_content = handlers.load_content
+
+    def timed_load_content(*args, **kwargs):
+        t = time.perf_counter()
+        try:
+            return load_content(*args, **kwargs)
+        finally:
+            parse.append(time.perf_counter() - t)
+
+    handlers.load_content = timed_load_content
+    t = time.perf_counter()
+    asyncio.run(handlers.load_initial_content())
+    loaded = time.perf_counter()
+    assert isinstance(handlers.CONTENT, content.ContentSnapshot)
+
+    return {
+        "import": imported - started,
+        "parse": parse[0],
+        "index": loaded - t - parse[0],
+        "ready": loaded - started,
+    }
+
+
+def run_once() -> dict:
+    t = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, str(Path(__file__).resolve()), "--child"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    process = time.perf_counter() - t
+    result = json.loads(out.strip().splitlines()[-1])
+    result["process"] = process
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(child()))
+        return
+
+    results = [run_once() for _ in range(args.runs)]
+    print(f"Холодный старт, {args.runs} прогонов (медиана / мин / макс, мс):")
+    for stage in STAGES:
+        values = [r[stage] * 1000 for r in results]
+        print(f"  {stage:8} {statistics.median(values):8.1f} {min(values):8.1f} {max(values):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Как масштабируется пропускная способность с числом воркеров.
+
+Поднимает локальный фейковый Bot API (tools/fake_api.py, в отдельных процессах),
+запускает WorkerPool с 1, 2, 4 … воркерами и прогоняет через него одинаковый
+поток callback-апдейтов (открыть вопрос / показать ответ / следующий вопрос)
+от множества пользователей. Время считается с момента готовности воркеров.
+
+Кэши (file_id, варианты картинок, номера банков) и SQLite-хранилища сессий
+теста и повторения у каждого прогона свои, во временном каталоге: боевой
+cache/ фейковыми file_id не засоряется, а прогоны не делят прогретый кэш.
+
+    python tools/bench_workers.py --updates 5000 --users 500 --workers 1 2 4
+"""
+import argparse
+import asyncio
+import multiprocessing
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.workers import WorkerPool  # noqa: E402
+from tools.fake_api import serve_forever  # noqa: E402
+
+
+def make_updates(count: int, users: int, question_ids: list[int], seed: int = 1) -> list[dict]:
+    rnd = random.Random(seed)
+    actions = ("q_open_{}", "q_answer_{}", "q_next_{}")
+    updates = []
+    for update_id in range(1, count + 1):
+        user_id = 10_000 + rnd.randrange(users)
+        data = rnd.choice(actions).format(rnd.choice(question_ids))
+        updates.append(
+            {
+                "update_id": update_id,
+                "callback_query": {
+                    "id": str(update_id),
+                    "chat_instance": "1",
+                    "from": {"id": user_id, "is_bot": False, "first_name": "u"},
+                    "message": {
+                        "message_id": update_id,
+                        "date": 0,
+                        "chat": {"id": user_id, "type": "private"},
+                    },
+                    "data": data,
+                },
+            }
+        )
+    return updates
+
+
+def bench_options(cache_dir: Path) -> dict:
+    # меряем обработку, а не лимиты Telegram — планировщик исходящих не ограничивает
+    unlimited = {"global_rate": 1e9, "chat_rate": 1e9, "chat_burst": 1e9, "group_rate": 1e9}
+    return {
+        "outbound": unlimited,
+        "cache_dir": cache_dir,
+        "sessions": {"kind": "sqlite", "db_path": cache_dir / "quiz_sessions.sqlite3"},
+        "reviews": {"kind": "sqlite", "db_path": cache_dir / "review.sqlite3"},
+    }
+
+
+async def run(workers: int, updates: list[dict], api_base: str) -> dict:
+    with tempfile.TemporaryDirectory(prefix="gosexam-bench-") as cache_dir:
+        return await run_in(Path(cache_dir), workers, updates, api_base)
+
+
+async def run_in(cache_dir: Path, workers: int, updates: list[dict], api_base: str) -> dict:
+    pool = WorkerPool(workers, token="123456:BENCH", api_base=api_base, options=bench_options(cache_dir))
+    pool.start()
+    await pool.wait_ready()
+    started = time.perf_counter()
+    for update in updates:
+        pool.dispatch(update)
+    results = await pool.stop(timeout=600)
+    elapsed = time.perf_counter() - started
+    processed = sum(r["processed"] for r in results)
+    return {
+        "workers": workers,
+        "processed": processed,
+        "failed": sum(r["failed"] for r in results),
+        "elapsed": elapsed,
+        "rate": processed / elapsed if elapsed else 0.0,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--latency", type=float, default=0.0, help="искусственная задержка API, сек")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--api-procs", type=int, default=2, help="процессов фейкового API")
+    args = parser.parse_args()
+
+    from app.content import QUESTIONS_FILE, load_entries
+
+    question_ids = [e["id"] for e in load_entries(QUESTIONS_FILE)] or [1]
+    updates = make_updates(args.updates, args.users, question_ids)
+
+    ctx = multiprocessing.get_context("spawn")
+    api_procs = [
+        ctx.Process(target=serve_forever, args=(args.port, args.latency), daemon=True)
+        for _ in range(args.api_procs)
+    ]
+    for process in api_procs:
+        process.start()
+    api_base = f"http://127.0.0.1:{args.port}"
+    await asyncio.sleep(1.0)
+
+    baseline = None
+    print(f"{'workers':>7} {'updates':>8} {'failed':>6} {'sec':>8} {'upd/s':>9} {'scale':>6}")
+    for workers in args.workers:
+        result = await run(workers, updates, api_base)
+        baseline = baseline or result["rate"]
+        print(
+            f"{result['workers']:>7} {result['processed']:>8} {result['failed']:>6} "
+            f"{result['elapsed']:>8.2f} {result['rate']:>9.1f} {result['rate'] / baseline:>6.2f}"
+        )
+    for process in api_procs:
+        process.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,141 @@
+"""
+Локальный фейковый Telegram Bot API для бенчмарков.
+
+Отвечает на методы, которые вызывает бот, правдоподобными результатами
+(Message с photo для sendPhoto, список Message для sendMediaGroup и т.д.)
+и считает вызовы. Бота направляют сюда через
+    AiohttpSession(api=TelegramAPIServer.from_base("http://127.0.0.1:PORT"))
+"""
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+
+from aiohttp import web
+
+
+_MARKUP_METHODS = ("sendmessage", "editmessagetext", "sendphoto")
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self.bytes_in = 0
+        self.updates: asyncio.Queue[dict] = asyncio.Queue()
+        # последняя inline-клавиатура (JSON) в каждом чате — по ней «нажимают» тестовые пользователи
+        self.markups: dict[int, str | None] = {}
+        self._ids = itertools.count(1)
+        self._runner: web.AppRunner | None = None
+
+    def app(self) -> web.Application:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        app.router.add_get("/bot{token}/{method}", self._handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081, reuse_port: bool = False) -> str:
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host=host, port=port, reuse_port=reuse_port)
+        await site.start()
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # ---------- ОБРАБОТКА ----------
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        self.bytes_in += request.content_length or 0
+        params = await self._params(request)
+
+        if method.lower() == "getupdates":
+            return self._ok(await self._get_updates(params))
+        if method.lower() in _MARKUP_METHODS:
+            self.markups[_int(params.get("chat_id"), 1)] = params.get("reply_markup")
+
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return self._ok(self._result(method.lower(), params))
+
+    async def _params(self, request: web.Request) -> dict:
+        if request.method == "GET":
+            return dict(request.query)
+        if request.content_type == "application/json":
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            params[key] = value if isinstance(value, str) else "<file>"
+        return params
+
+    async def _get_updates(self, params: dict) -> list[dict]:
+        timeout = float(params.get("timeout") or 0)
+        limit = int(params.get("limit") or 100)
+        batch = []
+        try:
+            batch.append(await asyncio.wait_for(self.updates.get(), timeout=max(timeout, 0.01)))
+        except asyncio.TimeoutError:
+            return batch
+        while len(batch) < limit and not self.updates.empty():
+            batch.append(self.updates.get_nowait())
+        return batch
+
+    def _result(self, method: str, params: dict):
+        chat_id = _int(params.get("chat_id"), 1)
+        if method == "sendmediagroup":
+            media = params.get("media")
+            count = len(json.loads(media)) if isinstance(media, str) else 2
+            return [self._message(chat_id, photo=True) for _ in range(count)]
+        if method == "sendphoto":
+            return self._message(chat_id, photo=True)
+        if method in ("sendmessage", "editmessagetext"):
+            return self._message(chat_id, text=params.get("text", ""))
+        if method == "getme":
+            return {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+        return True
+
+    def _message(self, chat_id: int, text: str | None = None, photo: bool = False) -> dict:
+        message_id = next(self._ids)
+        message = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+        }
+        if text is not None:
+            message["text"] = text
+        if photo:
+            message["photo"] = [
+                {"file_id": f"fake-{message_id}", "file_unique_id": f"u{message_id}", "width": 1, "height": 1}
+            ]
+        return message
+
+    @staticmethod
+    def _ok(result) -> web.Response:
+        return web.json_response({"ok": True, "result": result})
+
+
+def serve_forever(port: int, latency: float = 0.0):
+    """
+    Точка входа для отдельного процесса с фейковым API
+    (несколько таких процессов могут делить порт через SO_REUSEPORT),
+    чтобы сам API не был узким местом бенчмарка.
+    """
+    async def run():
+        api = FakeBotAPI(latency=latency)
+        await api.start(port=port, reuse_port=True)
+        await asyncio.Event().wait()
+
+    asyncio.run(run())
+
+
+def _int(value, default: int) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return default
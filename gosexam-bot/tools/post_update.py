@@ -0,0 +1,55 @@
+"""
+Локальная проверка вебхук-режима: отправляет записанные апдейты (JSON)
+на запущенный бот так же, как это делает Телеграм.
+
+    BOT_MODE=webhook python bot.py
+    python tools/post_update.py tools/updates/start.json tools/updates/q_open.json \
+        --url http://127.0.0.1:8080/webhook --secret <WEBHOOK_SECRET>
+
+Файл может содержать один апдейт или список апдейтов.
+Флаг --chat-id подставляет свой chat/user id, чтобы ответы бота пришли вам.
+"""
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+from aiohttp import ClientSession
+
+
+def _patch_ids(update: dict, chat_id: int):
+    for key in ("message", "callback_query"):
+        obj = update.get(key)
+        if not obj:
+            continue
+        obj.setdefault("from", {})["id"] = chat_id
+        message = obj if key == "message" else obj.get("message")
+        if message:
+            message.setdefault("chat", {})["id"] = chat_id
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("files", nargs="+", type=Path)
+    parser.add_argument("--url", default="http://127.0.0.1:8080/webhook")
+    parser.add_argument("--secret", default="")
+    parser.add_argument("--chat-id", type=int)
+    args = parser.parse_args()
+
+    headers = {}
+    if args.secret:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = args.secret
+
+    async with ClientSession() as session:
+        for path in args.files:
+            data = json.loads(path.read_text(encoding="utf-8"))
+            updates = data if isinstance(data, list) else [data]
+            for update in updates:
+                if args.chat_id:
+                    _patch_ids(update, args.chat_id)
+                async with session.post(args.url, json=update, headers=headers) as resp:
+                    print(f"{path.name} #{update.get('update_id')}: HTTP {resp.status}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())